@@ -1,7 +1,8 @@
 from flask import Flask
 from app.config import Config
 from app.extensions import jwt, cors
-from app.utils.db import init_db
+from app.utils.db import init_pool, db_connection
+from app.utils.migrations import ensure_schema
 
 def create_app(config_class=Config):
     app = Flask(__name__)
@@ -11,16 +12,22 @@ def create_app(config_class=Config):
     cors.init_app(app)
     jwt.init_app(app)
     
-    # Initialize database 
-    init_db()
+    # Initialize the connection pool and check the schema version (migrating if needed)
+    init_pool(config_class)
+    with db_connection() as conn:
+        ensure_schema(conn, config_class.DB_AUTO_MIGRATE)
     
     # Register blueprints
     from app.routes.auth import auth_bp
     from app.routes.stock_report import stock_report_bp
     from app.routes.stock import stock_bp
+    from app.routes.metrics import metrics_bp
+    from app.routes.jobs import jobs_bp
 
     app.register_blueprint(auth_bp)
     app.register_blueprint(stock_report_bp, url_prefix='/api/stock_report')
     app.register_blueprint(stock_bp, url_prefix='/api/stock')
+    app.register_blueprint(metrics_bp, url_prefix='/api/metrics')
+    app.register_blueprint(jobs_bp, url_prefix='/api/jobs')
     
     return app
\ No newline at end of file
@@ -0,0 +1,83 @@
+from app import create_app
+from app.config import Config
+from app.utils.async_db import init_async_pool, close_async_pool
+from app.utils.offload import get_blocking_executor
+
+
+def create_async_app(config_class=Config):
+    """
+    Quart app with the async handlers from app.routes.async_stock. Needs the optional
+    dependencies in requirements-async.txt; the sync Flask app doesn't.
+    """
+    try:
+        from quart import Quart
+    except ImportError as e:
+        raise RuntimeError("The async serving mode needs Quart (pip install -r requirements-async.txt)") from e
+    from app.routes.async_stock import async_stock_bp
+
+    app = Quart(__name__)
+    app.config.from_object(config_class)
+    app.register_blueprint(async_stock_bp, url_prefix='/api/stock')
+
+    @app.before_serving
+    async def open_resources():
+        get_blocking_executor(config_class)
+        await init_async_pool(config_class)
+
+    @app.after_serving
+    async def close_resources():
+        await close_async_pool()
+
+    @app.after_request
+    async def add_cors_headers(response):
+        # Same policy as app.extensions.cors; preflight requests are answered by the Flask app
+        response.headers.setdefault("Access-Control-Allow-Origin", "*")
+        return response
+
+    return app
+
+
+def wsgi_to_asgi(wsgi_app, config_class=Config):
+    """
+    Wrap a WSGI app so its requests run concurrently on ASYNC_WSGI_WORKERS threads. (asgiref's
+    WsgiToAsgi would run every request on one shared thread, one at a time.)
+    """
+    try:
+        from a2wsgi import WSGIMiddleware
+    except ImportError as e:
+        raise RuntimeError("The async serving mode needs a2wsgi (pip install -r requirements-async.txt)") from e
+    return WSGIMiddleware(wsgi_app, workers=config_class.ASYNC_WSGI_WORKERS)
+
+
+def create_asgi_app(config_class=Config):
+    """
+    ASGI entry point for the async serving mode. Requests for a route defined in
+    app.routes.async_stock go to the Quart app; everything else (and CORS preflight) goes
+    to the unchanged Flask app through wsgi_to_asgi.
+    """
+    from werkzeug.exceptions import MethodNotAllowed, NotFound
+
+    async_app = create_async_app(config_class)
+    sync_app = wsgi_to_asgi(create_app(config_class), config_class)
+    routes = async_app.url_map.bind("")
+
+    def is_async_route(scope):
+        if scope["method"] == "OPTIONS":
+            return False
+        try:
+            routes.match(scope["path"], method=scope["method"])
+        except (NotFound, MethodNotAllowed):
+            return False
+        except Exception:
+            # e.g. a trailing-slash redirect; let Quart answer it
+            return True
+        return True
+
+    async def dispatch(scope, receive, send):
+        if scope["type"] == "http" and not is_async_route(scope):
+            await sync_app(scope, receive, send)
+        else:
+            # Async routes, plus lifespan events so the asyncpg pool opens and closes
+            await async_app(scope, receive, send)
+
+    return dispatch
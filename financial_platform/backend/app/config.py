@@ -1,4 +1,5 @@
 import os
+import tempfile
 from datetime import timedelta
 from dotenv import load_dotenv
 
@@ -10,4 +11,77 @@ class Config:
     JWT_SECRET_KEY = os.environ.get("JWT_SECRET_KEY", "fallback-secret-key")
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=1)
     DATABASE_URL = os.environ.get("DATABASE_URL")
-    DEBUG = os.environ.get("FLASK_ENV") == "development"
\ No newline at end of file
+    DEBUG = os.environ.get("FLASK_ENV") == "development"
+
+    # Password hashing (see app.utils.passwords): bcrypt cost, the threads allowed to hash at once
+    # (kept below the core count so logins can't starve other routes) and how many may queue
+    BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", 12))
+    BCRYPT_WORKERS = int(os.environ.get("BCRYPT_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+    BCRYPT_MAX_PENDING = int(os.environ.get("BCRYPT_MAX_PENDING", 64))
+    # Seconds between batched last_login writes (see app.models.user.LastLoginWriter)
+    LAST_LOGIN_FLUSH_INTERVAL = float(os.environ.get("LAST_LOGIN_FLUSH_INTERVAL", 5))
+    # Login/register throttling before any hashing (see app.utils.ratelimit); a rate of 0 disables a limit
+    AUTH_RATE_LIMIT_IP_PER_MINUTE = float(os.environ.get("AUTH_RATE_LIMIT_IP_PER_MINUTE", 30))
+    AUTH_RATE_LIMIT_IP_BURST = int(os.environ.get("AUTH_RATE_LIMIT_IP_BURST", 10))
+    AUTH_RATE_LIMIT_USERNAME_PER_MINUTE = float(os.environ.get("AUTH_RATE_LIMIT_USERNAME_PER_MINUTE", 10))
+    AUTH_RATE_LIMIT_USERNAME_BURST = int(os.environ.get("AUTH_RATE_LIMIT_USERNAME_BURST", 5))
+    AUTH_RATE_LIMIT_MAX_KEYS = int(os.environ.get("AUTH_RATE_LIMIT_MAX_KEYS", 100000))
+    # Profiles for tokens without profile claims (see app.models.user.user_cache)
+    USER_CACHE_TTL = float(os.environ.get("USER_CACHE_TTL", 300))
+    USER_CACHE_MAX_ENTRIES = int(os.environ.get("USER_CACHE_MAX_ENTRIES", 10000))
+
+    # Connection pool (see app.utils.db)
+    DB_POOL_MIN_CONN = int(os.environ.get("DB_POOL_MIN_CONN", 1))
+    DB_POOL_MAX_CONN = int(os.environ.get("DB_POOL_MAX_CONN", 10))
+    DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", 10))
+    DB_POOL_HEALTHCHECK_INTERVAL = float(os.environ.get("DB_POOL_HEALTHCHECK_INTERVAL", 30))
+    # Apply pending schema migrations at startup (see app.utils.migrations); with false, run
+    # `python -m app.utils.migrations` before deploying and workers refuse to start on an old schema
+    DB_AUTO_MIGRATE = os.environ.get("DB_AUTO_MIGRATE", "true").lower() == "true"
+
+    # Where quotes, bars and metadata come from (see app.services.market_data): yfinance,
+    # synthetic (offline generated data, SYNTHETIC_LATENCY seconds per request), replay (served
+    # from the MARKET_DATA_FIXTURE JSON file) or record (yfinance, saved into that file)
+    MARKET_DATA_PROVIDER = os.environ.get("MARKET_DATA_PROVIDER", "yfinance")
+    MARKET_DATA_FIXTURE = os.environ.get("MARKET_DATA_FIXTURE")
+    SYNTHETIC_LATENCY = float(os.environ.get("SYNTHETIC_LATENCY", 0))
+
+    # Market-data fetching (see app.utils.fetch)
+    FETCH_MAX_WORKERS = int(os.environ.get("FETCH_MAX_WORKERS", 8))
+    FETCH_RATE_PER_SECOND = float(os.environ.get("FETCH_RATE_PER_SECOND", 5))
+    FETCH_BURST = int(os.environ.get("FETCH_BURST", 10))
+    FETCH_MAX_RETRIES = int(os.environ.get("FETCH_MAX_RETRIES", 4))
+    FETCH_BACKOFF_BASE = float(os.environ.get("FETCH_BACKOFF_BASE", 0.5))
+    FETCH_BACKOFF_MAX = float(os.environ.get("FETCH_BACKOFF_MAX", 30))
+
+    # Quote cache in front of StockService.get_stock_info (see app.utils.cache)
+    QUOTE_CACHE_TTL = float(os.environ.get("QUOTE_CACHE_TTL", 60))
+    QUOTE_CACHE_STALE_TTL = float(os.environ.get("QUOTE_CACHE_STALE_TTL", 240))
+    QUOTE_CACHE_MAX_ENTRIES = int(os.environ.get("QUOTE_CACHE_MAX_ENTRIES", 1000))
+
+    # Stock history cache (see app.utils.cache.VersionedCache); an empty path disables the shared tier
+    HISTORY_CACHE_TTL = float(os.environ.get("HISTORY_CACHE_TTL", 3600))
+    HISTORY_CACHE_MAX_ENTRIES = int(os.environ.get("HISTORY_CACHE_MAX_ENTRIES", 500))
+    HISTORY_CACHE_PATH = os.environ.get(
+        "HISTORY_CACHE_PATH", os.path.join(tempfile.gettempdir(), "financial_platform_history_cache.sqlite3")
+    )
+
+    # Background jobs for ingest and backfills (see app.utils.jobs): worker threads per process,
+    # finished jobs kept for lookups, and how often running jobs heartbeat / when a job without
+    # a heartbeat counts as failed
+    JOB_MAX_WORKERS = int(os.environ.get("JOB_MAX_WORKERS", 2))
+    JOB_HISTORY_MAX = int(os.environ.get("JOB_HISTORY_MAX", 200))
+    JOB_HEARTBEAT_INTERVAL = float(os.environ.get("JOB_HEARTBEAT_INTERVAL", 2))
+    JOB_STALE_AFTER = float(os.environ.get("JOB_STALE_AFTER", 60))
+    # Daily bars are final after the close; before it, the last session is the previous weekday
+    MARKET_TIMEZONE = os.environ.get("MARKET_TIMEZONE", "America/New_York")
+    MARKET_CLOSE_HOUR = int(os.environ.get("MARKET_CLOSE_HOUR", 16))
+
+    # Async serving mode (see app.async_app): threads for blocking provider/service calls,
+    # how many of those calls may be queued before requests get a 503, the asyncpg pool, and
+    # the threads that run requests for the sync Flask routes
+    ASYNC_BLOCKING_WORKERS = int(os.environ.get("ASYNC_BLOCKING_WORKERS", 64))
+    ASYNC_MAX_PENDING = int(os.environ.get("ASYNC_MAX_PENDING", 512))
+    ASYNC_DB_POOL_MIN_CONN = int(os.environ.get("ASYNC_DB_POOL_MIN_CONN", 1))
+    ASYNC_DB_POOL_MAX_CONN = int(os.environ.get("ASYNC_DB_POOL_MAX_CONN", 10))
+    ASYNC_WSGI_WORKERS = int(os.environ.get("ASYNC_WSGI_WORKERS", 16))
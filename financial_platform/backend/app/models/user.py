@@ -1,58 +1,174 @@
-import bcrypt
-from app.utils.db import get_db_connection
+import atexit
+import threading
+import time
+from datetime import datetime, timezone
+from psycopg2.extras import execute_values
+from app.config import Config
+from app.utils.db import db_connection
+from app.utils.cache import TTLCache
+from app.utils.passwords import get_password_hasher
+
+
+class LastLoginWriter:
+    """
+    Buffers last_login timestamps in memory and writes them with one UPDATE every
+    `interval` seconds from a background thread, so a login doesn't need a second
+    connection and write on the request path. Only the latest login per user is kept
+    between flushes; anything still buffered is written at interpreter exit.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._recorded = 0
+        self._flushes = 0
+        self._written = 0
+        self._errors = 0
+
+    def record(self, user_id):
+        with self._lock:
+            self._pending[user_id] = datetime.now(timezone.utc)
+            self._recorded += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="last-login-writer", daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.flush()
+
+    def flush(self):
+        """Write every buffered timestamp now. Returns the number of users updated."""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return 0
+            try:
+                with db_connection() as conn:
+                    cur = conn.cursor()
+                    execute_values(cur, """
+                        UPDATE users SET last_login = v.last_login
+                        FROM (VALUES %s) AS v (id, last_login)
+                        WHERE users.id = v.id
+                          AND (users.last_login IS NULL OR users.last_login < v.last_login)
+                    """, list(pending.items()), page_size=len(pending))
+                    conn.commit()
+                    cur.close()
+            except Exception as e:
+                print(f"Error writing last_login for {len(pending)} users: {e}")
+                with self._lock:
+                    self._errors += 1
+                    # Put them back unless a newer login was recorded meanwhile
+                    for user_id, logged_in_at in pending.items():
+                        self._pending.setdefault(user_id, logged_in_at)
+                return 0
+            with self._lock:
+                self._flushes += 1
+                self._written += len(pending)
+            return len(pending)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "interval": self.interval,
+                "pending": len(self._pending),
+                "recorded": self._recorded,
+                "flushes": self._flushes,
+                "written": self._written,
+                "errors": self._errors,
+            }
+
+
+last_login_writer = LastLoginWriter(interval=Config.LAST_LOGIN_FLUSH_INTERVAL)
+
+# Profile dicts (never password hashes) by username, for tokens issued without profile claims
+user_cache = TTLCache(max_entries=Config.USER_CACHE_MAX_ENTRIES, ttl=Config.USER_CACHE_TTL)
+
 
 class User:
     @staticmethod
     def find_by_username(username):
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
-        cur.execute("SELECT id, username, email, password_hash, created_at FROM users WHERE username = %s", (username,))
-        user = cur.fetchone()
-        
-        cur.close()
-        conn.close()
-        
+        with db_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT id, username, email, password_hash, created_at FROM users WHERE username = %s", (username,))
+            user = cur.fetchone()
+            cur.close()
+
         return user
-    
+
     @staticmethod
     def create(username, email, password):
-        password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-        
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
-        # Check if username or email already exists
-        cur.execute("SELECT * FROM users WHERE username = %s OR email = %s", (username, email))
-        if cur.fetchone():
+        password_hash = get_password_hasher().hash(password)
+
+        with db_connection() as conn:
+            cur = conn.cursor()
+
+            # Check if username or email already exists
+            cur.execute("SELECT * FROM users WHERE username = %s OR email = %s", (username, email))
+            if cur.fetchone():
+                cur.close()
+                return None, "Username or email already exists"
+
+            # Insert new user
+            cur.execute(
+                "INSERT INTO users (username, email, password_hash) VALUES (%s, %s, %s)"
+                " RETURNING id, username, email, password_hash, created_at",
+                (username, email, password_hash)
+            )
+            user = cur.fetchone()
+            conn.commit()
             cur.close()
-            conn.close()
-            return None, "Username or email already exists"
-        
-        # Insert new user
-        cur.execute(
-            "INSERT INTO users (username, email, password_hash) VALUES (%s, %s, %s) RETURNING id",
-            (username, email, password_hash)
-        )
-        user_id = cur.fetchone()[0]
-        conn.commit()
-        
-        cur.close()
-        conn.close()
-        
-        return user_id, None
-    
+
+        # A lookup before registering may have cached "no such user"
+        User.invalidate(username)
+        return user, None
+
     @staticmethod
     def verify_password(stored_hash, password):
-        return bcrypt.checkpw(password.encode('utf-8'), stored_hash.encode('utf-8'))
-    
+        return get_password_hasher().verify(stored_hash, password)
+
     @staticmethod
     def update_last_login(user_id):
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
-        cur.execute("UPDATE users SET last_login = CURRENT_TIMESTAMP WHERE id = %s", (user_id,))
-        conn.commit()
-        
-        cur.close()
-        conn.close()
\ No newline at end of file
+        # Written in batches by last_login_writer
+        last_login_writer.record(user_id)
+
+    @staticmethod
+    def profile(user):
+        """The stable profile fields of a users row as returned by find_by_username."""
+        return {"id": user[0], "username": user[1], "email": user[2], "created_at": user[4]}
+
+    @staticmethod
+    def token_claims(user):
+        """Profile fields embedded in access tokens so routes can skip the users lookup."""
+        return {"uid": user[0], "email": user[2], "created_at": user[4].isoformat()}
+
+    @staticmethod
+    def profile_for_token(identity, claims):
+        """
+        Resolve the profile of a token's user: from its claims when it carries them, otherwise
+        from user_cache (one users lookup per TTL). Returns None for an unknown user.
+        """
+        if "uid" in claims:
+            return {
+                "id": claims["uid"],
+                "username": identity,
+                "email": claims["email"],
+                "created_at": datetime.fromisoformat(claims["created_at"]),
+            }
+
+        def load():
+            user = User.find_by_username(identity)
+            return User.profile(user) if user else None
+
+        return user_cache.get_or_load(identity, load)
+
+    @staticmethod
+    def invalidate(username):
+        """Drop a cached profile; call whenever a user's profile fields change."""
+        user_cache.invalidate(username)
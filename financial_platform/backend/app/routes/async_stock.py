@@ -0,0 +1,92 @@
+from quart import Blueprint, jsonify, request
+from datetime import date
+from app.services.stock_service import StockService
+from app.services.stock_data import HistoricalStockService
+from app.services.async_stock_service import AsyncStockService
+from app.services.ingest_jobs import IngestJobs
+from app.utils.offload import ExecutorSaturated, run_blocking
+
+# Async versions of the /api/stock routes that wait on yfinance (run on the bounded blocking
+# executor, so a slow upstream no longer pins a server thread) plus the cheap DB-only reads
+# (asyncpg). Responses match app.routes.stock; every other route is served by the Flask app.
+async_stock_bp = Blueprint('async_stock', __name__)
+
+def _saturated(e):
+    response = jsonify({"error": str(e)})
+    response.headers["Retry-After"] = "1"
+    return response, 503
+
+@async_stock_bp.route('/getStockInfo', methods=['GET'])
+async def get_stock_info():
+    symbol = request.args.get('symbol', '').strip().upper()
+    if not symbol:
+        return jsonify({"error": "Stock symbol is required"}), 400
+    try:
+        stock_data, error = await run_blocking(StockService.get_stock_info, symbol)
+        if error:
+            return jsonify({"error": error}), 500
+        return jsonify(stock_data)
+    except ExecutorSaturated as e:
+        return _saturated(e)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@async_stock_bp.route('/stocks/history/update', methods=['POST'])
+async def update_historical_data():
+    # Submitting writes the job row, so it runs on the blocking executor like the other routes
+    try:
+        data = await request.get_json() or {}
+        symbols = data.get("symbols", [])
+        if not symbols:
+            return jsonify({"error": "No stock symbols provided"}), 400
+        try:
+            trading_date = date.fromisoformat(data["date"]) if data.get("date") else None
+        except ValueError:
+            return jsonify({"error": "Invalid date. Use YYYY-MM-DD."}), 400
+        job, coalesced = await run_blocking(IngestJobs.submit_ingest, symbols, trading_date)
+        response = jsonify({
+            "message": "Market pulse and stock data update submitted.",
+            "job": job.to_dict(),
+            "coalesced": coalesced
+        })
+        response.headers["Location"] = f"/api/jobs/{job.id}"
+        return response, 202
+    except ExecutorSaturated as e:
+        return _saturated(e)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@async_stock_bp.route('/stocks/52week/<symbol>', methods=['GET'])
+async def get_52week_data(symbol):
+    try:
+        symbol = symbol.strip().upper()
+        high_52week, low_52week = await run_blocking(HistoricalStockService.get_52week_high_low, symbol)
+        return jsonify({
+            "symbol": symbol,
+            "high_52week": float(high_52week),
+            "low_52week": float(low_52week)
+        })
+    except ExecutorSaturated as e:
+        return _saturated(e)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@async_stock_bp.route('/movement-counters', methods=['GET'])
+async def get_movement_counters():
+    counters, error = await AsyncStockService.get_stock_movement_counters()
+    if error:
+        return jsonify({"error": error}), 500
+    return jsonify(counters), 200
+
+@async_stock_bp.route('/new-highs-lows', methods=['GET'])
+async def get_new_highs_lows():
+    as_of = request.args.get('date')
+    if as_of:
+        try:
+            as_of = date.fromisoformat(as_of)
+        except ValueError:
+            return jsonify({"error": "Invalid date. Use YYYY-MM-DD."}), 400
+    data, error = await AsyncStockService.get_new_highs_lows(as_of or None)
+    if error:
+        return jsonify({"error": error}), 500
+    return jsonify(data), 200
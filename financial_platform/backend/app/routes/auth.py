@@ -1,9 +1,21 @@
 from flask import Blueprint, jsonify, request
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
+from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity, get_jwt
 from app.models.user import User
+from app.utils.offload import ExecutorSaturated
+from app.utils.ratelimit import get_auth_rate_limiter
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/api')
 
+def _throttled(username):
+    """429 response if this client or username is over its auth rate limit, else None."""
+    retry_after = get_auth_rate_limiter().check(request.remote_addr, username)
+    if retry_after is None:
+        return None
+    response = jsonify({"error": "Too many attempts, try again later"})
+    response.status_code = 429
+    response.headers["Retry-After"] = str(retry_after)
+    return response
+
 @auth_bp.route('/register', methods=['POST'])
 def register():
     data = request.get_json()
@@ -14,20 +26,27 @@ def register():
     if not username or not email or not password:
         return jsonify({"error": "Username, email, and password are required"}), 400
     
+    # Checked before any password hashing
+    throttled = _throttled(username)
+    if throttled:
+        return throttled
+    
     try:
-        user_id, error = User.create(username, email, password)
+        user, error = User.create(username, email, password)
         
         if error:
             return jsonify({"error": error}), 409
         
-        # Create access token
-        access_token = create_access_token(identity=username)
+        # Create access token carrying the profile, so /api/user needs no lookup
+        access_token = create_access_token(identity=username, additional_claims=User.token_claims(user))
         
         return jsonify({
             "message": "User registered successfully",
-            "user_id": user_id,
+            "user_id": user[0],
             "access_token": access_token
         }), 201
+    except ExecutorSaturated as e:
+        return jsonify({"error": str(e)}), 503
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -40,17 +59,22 @@ def login():
     if not username or not password:
         return jsonify({"error": "Username and password are required"}), 400
     
+    # Checked before any password hashing
+    throttled = _throttled(username)
+    if throttled:
+        return throttled
+    
     try:
         user = User.find_by_username(username)
         
         if not user or not User.verify_password(user[3], password):
             return jsonify({"error": "Invalid username or password"}), 401
         
-        # Update last login time
+        # Update last login time (buffered, written in the background)
         User.update_last_login(user[0])
         
-        # Create access token
-        access_token = create_access_token(identity=username)
+        # Create access token carrying the profile, so /api/user needs no lookup
+        access_token = create_access_token(identity=username, additional_claims=User.token_claims(user))
         
         return jsonify({
             "message": "Login successful",
@@ -58,6 +82,8 @@ def login():
             "username": user[1],
             "access_token": access_token
         })
+    except ExecutorSaturated as e:
+        return jsonify({"error": str(e)}), 503
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -67,17 +93,13 @@ def get_user():
     current_user = get_jwt_identity()
     
     try:
-        user = User.find_by_username(current_user)
+        # From the token's claims, or the user cache for tokens issued without them
+        user = User.profile_for_token(current_user, get_jwt())
         
         if not user:
             return jsonify({"error": "User not found"}), 404
         
-        return jsonify({
-            "id": user[0],
-            "username": user[1],
-            "email": user[2],
-            "created_at": user[4]
-        })
+        return jsonify(user)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
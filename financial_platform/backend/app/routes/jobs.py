@@ -0,0 +1,80 @@
+from flask import Blueprint, jsonify, request
+from datetime import date
+from app.services.ingest_jobs import IngestJobs
+from app.utils.jobs import get_job_runner
+
+jobs_bp = Blueprint('jobs', __name__)
+
+def _parse_date(value, name):
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid {name}. Use YYYY-MM-DD.")
+
+def submitted(job, coalesced, message):
+    """202 response for a newly submitted (or coalesced) job."""
+    response = jsonify({"message": message, "job": job.to_dict(), "coalesced": coalesced})
+    response.headers["Location"] = f"/api/jobs/{job.id}"
+    return response, 202
+
+@jobs_bp.route('', methods=['GET'])
+def list_jobs():
+    return jsonify([job.to_dict() for job in get_job_runner().list()])
+
+@jobs_bp.route('/ingest', methods=['POST'])
+def submit_ingest():
+    data = request.get_json() or {}
+    symbols = data.get("symbols", [])
+    if not symbols:
+        return jsonify({"error": "No stock symbols provided"}), 400
+    try:
+        trading_date = _parse_date(data["date"], "date") if data.get("date") else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    job, coalesced = IngestJobs.submit_ingest(symbols, trading_date)
+    return submitted(job, coalesced, "Ingest job submitted")
+
+@jobs_bp.route('/backfill/bars', methods=['POST'])
+@jobs_bp.route('/backfill/market-pulse', methods=['POST'])
+def submit_backfill():
+    data = request.get_json() or {}
+    symbols = data.get("symbols", [])
+    if not symbols:
+        return jsonify({"error": "No stock symbols provided"}), 400
+    try:
+        start_date = _parse_date(data.get("start_date"), "start_date")
+        end_date = _parse_date(data.get("end_date"), "end_date")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if start_date > end_date:
+        return jsonify({"error": "start_date must not be after end_date"}), 400
+    if request.path.endswith('/bars'):
+        job, coalesced = IngestJobs.submit_backfill_bars(symbols, start_date, end_date)
+    else:
+        job, coalesced = IngestJobs.submit_backfill_market_pulse(symbols, start_date, end_date)
+    return submitted(job, coalesced, "Backfill job submitted")
+
+@jobs_bp.route('/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = get_job_runner().get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job.to_dict())
+
+@jobs_bp.route('/<job_id>/result', methods=['GET'])
+def get_job_result(job_id):
+    job = get_job_runner().get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    if not job.finished:
+        return jsonify({"job": job.to_dict()}), 202
+    if job.status != "succeeded":
+        return jsonify({"error": job.error or f"Job was {job.status}", "job": job.to_dict()}), 409
+    return jsonify({"job": job.to_dict(), "result": job.result})
+
+@jobs_bp.route('/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    job = get_job_runner().cancel(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job.to_dict())
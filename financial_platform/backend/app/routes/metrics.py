@@ -0,0 +1,58 @@
+from flask import Blueprint, jsonify
+from app.utils.db import get_pool_stats
+from app.utils.fetch import get_fetch_stats
+from app.services.stock_service import quote_cache
+from app.services.stock_data import history_cache
+from app.utils.async_db import get_async_pool_stats
+from app.utils.offload import get_blocking_stats
+from app.utils.jobs import get_job_stats
+from app.utils.passwords import get_password_stats
+from app.utils.ratelimit import get_auth_rate_limit_stats
+from app.models.user import last_login_writer, user_cache
+
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route('/db-pool', methods=['GET'])
+def get_db_pool_metrics():
+    stats = get_pool_stats()
+    if stats is None:
+        return jsonify({"error": "Connection pool is not initialized"}), 503
+    return jsonify(stats)
+
+@metrics_bp.route('/fetch', methods=['GET'])
+def get_fetch_metrics():
+    stats = get_fetch_stats()
+    if stats is None:
+        return jsonify({"error": "Fetch executor has not been used yet"}), 503
+    return jsonify(stats)
+
+@metrics_bp.route('/quote-cache', methods=['GET'])
+def get_quote_cache_metrics():
+    return jsonify(quote_cache.stats())
+
+@metrics_bp.route('/history-cache', methods=['GET'])
+def get_history_cache_metrics():
+    return jsonify(history_cache.stats())
+
+@metrics_bp.route('/async', methods=['GET'])
+def get_async_metrics():
+    stats = get_blocking_stats()
+    if stats is None:
+        return jsonify({"error": "Async serving mode is not running"}), 503
+    return jsonify({"blocking_executor": stats, "db_pool": get_async_pool_stats()})
+
+@metrics_bp.route('/jobs', methods=['GET'])
+def get_job_metrics():
+    stats = get_job_stats()
+    if stats is None:
+        return jsonify({"error": "No jobs have been submitted yet"}), 503
+    return jsonify(stats)
+
+@metrics_bp.route('/auth', methods=['GET'])
+def get_auth_metrics():
+    return jsonify({
+        "password_hasher": get_password_stats(),
+        "last_login_writer": last_login_writer.stats(),
+        "user_cache": user_cache.stats(),
+        "rate_limiter": get_auth_rate_limit_stats(),
+    })
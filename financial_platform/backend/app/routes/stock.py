@@ -1,8 +1,15 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, jsonify, request, stream_with_context
 from app.services.stock_service import StockService
 from app.services.stock_data import HistoricalStockService
-from datetime import datetime, timedelta
-from app.utils.db import get_db_connection
+from app.services.ingest_jobs import IngestJobs
+from app.routes.jobs import submitted
+import calendar
+import json
+import numpy as np
+from datetime import date, timedelta
+from app.utils.db import db_connection
+from app.utils.downsample import lttb_indices
+from app.utils.columnar import ROWS, columnar_response, negotiate_format, rows_response, rows_to_columns
 
 stock_bp = Blueprint('stock', __name__)
 @stock_bp.route('/getStockInfo', methods=['GET'])
@@ -23,43 +30,159 @@ def add_stocks():
         symbols = request.json.get("symbols", [])
         if not symbols:
             return jsonify({"error": "No stock symbols provided"}), 400
-        added_symbols, error = StockService.add_stocks(symbols)
+        result, error = StockService.add_stocks(symbols)
         if error:
             return jsonify({"error": error}), 500
         return jsonify({
             "message": "Stocks added successfully",
-            "stocks": added_symbols
+            "stocks": result["added"],
+            "failed": result["failed"]
         })
     except Exception as e:
         return jsonify({"error": str(e)}), 500
     
 @stock_bp.route('/stocks/history/update', methods=['POST'])
 def update_historical_data():
+    """
+    Submit the daily ingest as a background job (see /api/jobs) for the optional "date"
+    (YYYY-MM-DD, default: the last closed session). Answers 202 with the job; re-submitting
+    while the same ingest is queued or running returns that job.
+    """
     try:
-        symbols = request.json.get("symbols", [])
+        data = request.get_json() or {}
+        symbols = data.get("symbols", [])
         if not symbols:
             return jsonify({"error": "No stock symbols provided"}), 400
-        result = HistoricalStockService.insert_current_day_data_with_movement(symbols)
-        return jsonify({
-            "message": "Today's market pulse and current day stock data updated successfully.",
-            "market_pulse": result
-        })
+        try:
+            trading_date = date.fromisoformat(data["date"]) if data.get("date") else None
+        except ValueError:
+            return jsonify({"error": "Invalid date. Use YYYY-MM-DD."}), 400
+        job, coalesced = IngestJobs.submit_ingest(symbols, trading_date)
+        return submitted(job, coalesced, "Market pulse and stock data update submitted.")
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+# Rows fetched per round trip by the server-side cursor used for streamed histories
+HISTORY_STREAM_ITERSIZE = 2000
+# Rows serialized per chunk written to the client
+HISTORY_STREAM_CHUNK_ROWS = 500
+# Packed column types for ?format=binary (float64 keeps every DECIMAL(10, 2) price exact)
+HISTORY_TYPES = {
+    "date": "date", "closing_price": "float64", "high_52week": "float64", "low_52week": "float64",
+    "open": "float64", "high": "float64", "low": "float64", "volume": "float64"
+}
+
+def _format_history_row(row):
+    return {
+        "date": row[0].isoformat(),
+        "closing_price": float(row[1]),
+        "high_52week": float(row[2]),
+        "low_52week": float(row[3]),
+        "open": float(row[4]) if row[4] is not None else None,
+        "high": float(row[5]) if row[5] is not None else None,
+        "low": float(row[6]) if row[6] is not None else None,
+        "volume": row[7]
+    }
+
+def _get_company_info(cur, symbol):
+    try:
+        cur.execute('''
+            SELECT company_name, sector, industry
+            FROM stocks2
+            WHERE stock_symbol = %s
+        ''', (symbol,))
+        company_data = cur.fetchone()
+        if company_data:
+            return {
+                "company_name": company_data[0],
+                "sector": company_data[1],
+                "industry": company_data[2]
+            }
+    except Exception:
+        # Continue even if company info can't be retrieved
+        pass
+    return {}
+
+def _stream_history(symbol, query, params, fmt):
+    """
+    Yield the rows of a history query as NDJSON lines or as one chunked JSON document,
+    reading them through a server-side cursor so memory stays flat for any history length.
+    The pooled connection is held until the stream finishes (or the client goes away).
+    """
+    with db_connection() as conn:
+        cur = conn.cursor()
+        company_info = _get_company_info(cur, symbol) if fmt == "json" else None
+        cur.close()
+
+        cur = conn.cursor(name="stock_history_stream")
+        cur.itersize = HISTORY_STREAM_ITERSIZE
+        cur.execute(query, params)
+        if fmt == "json":
+            yield '{"symbol":%s,"company_info":%s,"historical_data":[' % (
+                json.dumps(symbol), json.dumps(company_info))
+        else:
+            yield ""
+
+        count = 0
+        chunk = []
+        for row in cur:
+            chunk.append(json.dumps(_format_history_row(row)))
+            count += 1
+            if len(chunk) >= HISTORY_STREAM_CHUNK_ROWS:
+                yield _join_history_chunk(chunk, fmt, count - len(chunk))
+                chunk = []
+        if chunk:
+            yield _join_history_chunk(chunk, fmt, count - len(chunk))
+        cur.close()
+        if fmt == "json":
+            yield '],"count":%d}' % count
+
+def _join_history_chunk(lines, fmt, rows_before):
+    if fmt == "ndjson":
+        return "\n".join(lines) + "\n"
+    return ("," if rows_before else "") + ",".join(lines)
+
 @stock_bp.route('/stocks/history/<symbol>', methods=['GET'])
 def get_historical_data(symbol):
+    """
+    Stored daily history for a symbol, oldest first.
+
+    Query parameters:
+      - start_date, end_date: optional inclusive date range
+      - after, limit: keyset pagination; returns rows dated after `after`, at most `limit` of
+        them, plus a `next_cursor` to pass back as `after` (null on the last page)
+      - stream: 'ndjson' (one row object per line) or 'json' (the usual document, chunked);
+        streamed responses are read through a server-side cursor and honor the same filters
+      - format: 'json', 'columnar' or 'binary' (see app.utils.columnar; also negotiable through
+        the Accept header) for non-streamed responses
+    """
     try:
         symbol = symbol.strip().upper()
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
+        after = request.args.get('after')
+        limit = request.args.get('limit', type=int)
+        stream = request.args.get('stream')
+        if stream is not None and stream not in ("ndjson", "json"):
+            return jsonify({"error": "Invalid stream format. Use 'ndjson' or 'json'."}), 400
+        if limit is not None and limit < 1:
+            return jsonify({"error": "limit must be a positive integer"}), 400
+        try:
+            fmt = negotiate_format(request)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        if stream and request.args.get('format', ROWS) != ROWS:
+            return jsonify({"error": "format cannot be combined with stream"}), 400
+        if after:
+            try:
+                after = date.fromisoformat(after)
+            except ValueError:
+                return jsonify({"error": "Invalid cursor. Pass the next_cursor of the previous page."}), 400
+
         # Query the stock_data table for the specified range
-        from app.utils.db import get_db_connection
-        conn = get_db_connection()
-        cur = conn.cursor()
         query = '''
-            SELECT date, closing_price, high_52week, low_52week
+            SELECT date, closing_price, high_52week, low_52week, open_price, high_price, low_price, volume
             FROM stock_data
             WHERE stock_symbol = %s
         '''
@@ -70,45 +193,57 @@ def get_historical_data(symbol):
         if end_date:
             query += ' AND date <= %s'
             params.append(end_date)
+        if after:
+            query += ' AND date > %s'
+            params.append(after)
         query += ' ORDER BY date ASC'
-        cur.execute(query, params)
-        results = []
-        for row in cur.fetchall():
-            results.append({
-                "date": row[0].isoformat(),
-                "closing_price": float(row[1]),
-                "high_52week": float(row[2]),
-                "low_52week": float(row[3])
-            })
-        cur.close()
-        conn.close()
-        # Get company information
-        company_info = {}
-        try:
-            conn = get_db_connection()
+
+        if stream:
+            if limit is not None:
+                query += ' LIMIT %s'
+                params.append(limit)
+            chunks = _stream_history(symbol, query, params, stream)
+            # Run the query now so that connection and SQL errors still get a 500
+            first = next(chunks)
+
+            def generate():
+                try:
+                    if first:
+                        yield first
+                    yield from chunks
+                finally:
+                    chunks.close()
+
+            mimetype = "application/x-ndjson" if stream == "ndjson" else "application/json"
+            return Response(stream_with_context(generate()), mimetype=mimetype)
+
+        if limit is not None:
+            # One extra row tells us whether there is another page
+            query += ' LIMIT %s'
+            params.append(limit + 1)
+        with db_connection() as conn:
             cur = conn.cursor()
-            cur.execute('''
-                SELECT company_name, sector, industry
-                FROM stocks2
-                WHERE stock_symbol = %s
-            ''', (symbol,))
-            company_data = cur.fetchone()
-            if company_data:
-                company_info = {
-                    "company_name": company_data[0],
-                    "sector": company_data[1],
-                    "industry": company_data[2]
-                }
+            cur.execute(query, params)
+            rows = cur.fetchall()
+            next_cursor = None
+            if limit is not None and len(rows) > limit:
+                rows = rows[:limit]
+                next_cursor = rows[-1][0].isoformat()
+            results = [_format_history_row(row) for row in rows]
+            # Get company information on the same connection
+            company_info = _get_company_info(cur, symbol)
             cur.close()
-            conn.close()
-        except Exception:
-            # Continue even if company info can't be retrieved
-            pass
-        return jsonify({
+        if fmt != ROWS:
+            return columnar_response(
+                rows_to_columns(results, HISTORY_TYPES), HISTORY_TYPES, fmt,
+                meta={"symbol": symbol, "company_info": company_info, "next_cursor": next_cursor}
+            )
+        return rows_response({
             "symbol": symbol,
             "company_info": company_info,
             "historical_data": results,
-            "count": len(results)
+            "count": len(results),
+            "next_cursor": next_cursor
         })
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -134,15 +269,53 @@ def get_movement_counters():
 
 @stock_bp.route('/new-highs-lows', methods=['GET'])
 def get_new_highs_lows():
-    data, error = StockService.get_new_highs_lows()
+    as_of = request.args.get('date')
+    if as_of:
+        try:
+            as_of = date.fromisoformat(as_of)
+        except ValueError:
+            return jsonify({"error": "Invalid date. Use YYYY-MM-DD."}), 400
+    data, error = StockService.get_new_highs_lows(as_of or None)
     if error:
         return jsonify({"error": error}), 500
     return jsonify(data), 200
 
+# Start of each market-pulse range, relative to today (None = all history)
+def _market_pulse_start_date(time_range, today):
+    if time_range == "1W":
+        return today - timedelta(days=7)
+    if time_range in ("1M", "3M", "1Y"):
+        months = {"1M": 1, "3M": 3, "1Y": 12}[time_range]
+        year, month = divmod(today.year * 12 + today.month - 1 - months, 12)
+        month += 1
+        return date(year, month, min(today.day, calendar.monthrange(year, month)[1]))
+    if time_range == "YTD":
+        return date(today.year, 1, 1)
+    if time_range == "ALL":
+        return None
+    raise ValueError("Invalid range. Use '1W', '1M', '3M', 'YTD', '1Y' or 'ALL'.")
+
+MARKET_PULSE_TYPES = {
+    "date": "date", "newHighs": "int32", "newLows": "int32", "advanced": "int32", "declined": "int32",
+    "unchanged": "int32", "adSpread": "int32", "cumulativeADLine": "int32",
+    "newHighRateOfChange": "float32", "newLowRateOfChange": "float32", "acceleration": "int32"
+}
+
+MARKET_PULSE_FIELDS = (
+    "date", "newHighs", "newLows", "advanced", "declined", "unchanged", "adSpread",
+    "cumulativeADLine", "newHighRateOfChange", "newLowRateOfChange", "acceleration"
+)
+
 @stock_bp.route("/api/market-pulse", methods=["GET"])
 def get_market_pulse_data():
     """
     Returns market pulse data from the database in the format expected by the frontend.
+
+    Query parameters:
+      - range: 1W, 1M (default), 3M, YTD, 1Y or ALL; filtered in SQL on the date primary key
+      - max_points: optional; longer ranges are downsampled (LTTB on the cumulative A/D line)
+      - format: 'json' (default), 'columnar' or 'binary' (see app.utils.columnar; also
+        negotiable through the Accept header)
     
     Expected DB Columns from market_pulse:
       - date
@@ -152,6 +325,9 @@ def get_market_pulse_data():
       - declined
       - unchanged
       - ad_spread
+      - cumulative_ad_line, new_high_roc, new_low_roc, acceleration (materialized at ingest time,
+        see HistoricalStockService.refresh_market_pulse_metrics, so the A/D line already carries
+        the rows before the window)
     
     Transforms each row to include:
       - date (ISO string)
@@ -160,87 +336,52 @@ def get_market_pulse_data():
       - newHighRateOfChange, newLowRateOfChange: daily % change compared to previous day
       - acceleration: change difference in newHighs (custom metric)
     """
-    # Optionally, you can get the time range parameter if you want to filter the rows.
-    time_range = request.args.get("range", "1M")
-    
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT date, new_highs, new_lows, advanced, declined, unchanged, ad_spread 
+    time_range = request.args.get("range", "1M").upper()
+    max_points = request.args.get("max_points", type=int)
+    try:
+        start_date = _market_pulse_start_date(time_range, date.today())
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if max_points is not None and max_points < 3:
+        return jsonify({"error": "max_points must be at least 3"}), 400
+    try:
+        fmt = negotiate_format(request)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    query = """
+        SELECT date, new_highs, new_lows, advanced, declined, unchanged, ad_spread,
+               cumulative_ad_line, new_high_roc, new_low_roc, acceleration
         FROM market_pulse
+        WHERE date >= %s
         ORDER BY date ASC
-    """)
-    rows = cur.fetchall()
-    # print(rows)
-    cur.close()
-    conn.close()
-
-    market_data = []
-    cumulative_advanced = 0
-    cumulative_declined = 0
-    
-    # These variables will hold the previous day's new_highs/new_lows for rate-of-change/acceleration calculations
-    prev_newHighs = None
-    prev_newLows = None
-    prev_diff = None
-
-    for row in rows:
-        # Unpack each row; the order is assumed to be:
-        # (date, new_highs, new_lows, advanced, declined, unchanged, ad_spread)
-        date_val, new_highs, new_lows, advanced, declined, unchanged, ad_spread = row
-        print(date_val, new_highs, new_lows, advanced, declined, unchanged, ad_spread)
-        # Convert the date to an ISO string if needed.
-        if isinstance(date_val, datetime):
-            date_str = date_val.date().isoformat()
-        else:
-            date_str = str(date_val)
+    """
+    params = (start_date or date.min,)
+    with db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(query, params)
+        rows = cur.fetchall()
+        cur.close()
 
-        # Update cumulative advances and declines
-        cumulative_advanced += advanced
-        cumulative_declined += declined
-        cumulativeADLine = cumulative_advanced - cumulative_declined
+    if not rows:
+        if fmt != ROWS:
+            return columnar_response({field: [] for field in MARKET_PULSE_FIELDS}, MARKET_PULSE_TYPES, fmt)
+        return rows_response([])
 
-        # Compute daily rate of change for new highs and new lows.
-        if prev_newHighs is not None:
-            newHighRateOfChange = ((new_highs - prev_newHighs) / prev_newHighs * 100) if prev_newHighs != 0 else 0
-        else:
-            newHighRateOfChange = 0
+    # Work column-wise: one array per field instead of a dict per row
+    columns = list(zip(*rows))
+    if max_points is not None and len(rows) > max_points:
+        ordinals = [d.toordinal() for d in columns[0]]
+        keep = lttb_indices(ordinals, columns[7], max_points)
+        columns = [[column[i] for i in keep] for column in columns]
 
-        if prev_newLows is not None:
-            newLowRateOfChange = ((new_lows - prev_newLows) / prev_newLows * 100) if prev_newLows != 0 else 0
-        else:
-            newLowRateOfChange = 0
-
-        # Compute acceleration metric: difference today minus the previous difference.
-        if prev_newHighs is not None:
-            diff = new_highs - prev_newHighs
-            if prev_diff is not None:
-                acceleration = diff - prev_diff
-            else:
-                acceleration = 0
-            prev_diff = diff
-        else:
-            acceleration = 0
-
-        # Store the current values for use in the next iteration.
-        prev_newHighs = new_highs
-        prev_newLows = new_lows
-
-        record = {
-            "date": date_str,
-            "newHighs": new_highs,
-            "newLows": new_lows,
-            "advanced": advanced,
-            "declined": declined,
-            "unchanged": unchanged,
-            "adSpread": ad_spread,
-            "cumulativeADLine": cumulativeADLine,
-            "newHighRateOfChange": round(newHighRateOfChange, 2),
-            "newLowRateOfChange": round(newLowRateOfChange, 2),
-            "acceleration": round(acceleration, 2)
-        }
-        market_data.append(record)
-
-    # (Optional) You can apply additional filtering based on "time_range" if needed.
-
-    return jsonify(market_data)
\ No newline at end of file
+    dates = [d.isoformat() for d in columns[0]]
+    new_high_roc = np.round(np.asarray(columns[8], dtype=float), 2).tolist()
+    new_low_roc = np.round(np.asarray(columns[9], dtype=float), 2).tolist()
+    series = (dates, *columns[1:8], new_high_roc, new_low_roc, columns[10])
+    if fmt != ROWS:
+        return columnar_response(
+            {field: list(values) for field, values in zip(MARKET_PULSE_FIELDS, series)}, MARKET_PULSE_TYPES, fmt
+        )
+    market_data = [dict(zip(MARKET_PULSE_FIELDS, values)) for values in zip(*series)]
+    return rows_response(market_data)
@@ -1,76 +1,110 @@
 from flask import Blueprint, request, jsonify 
-from app.utils.db import get_db_connection
+import numpy as np
+from bisect import bisect_left
 from functools import lru_cache
-import time
+from app.utils.db import db_connection
+from app.services.stock_data import HistoricalStockService, history_cache
+from app.utils.columnar import ROWS, columnar_response, negotiate_format, rows_response, rows_to_columns
+from app.utils.downsample import lttb_indices
 from datetime import datetime, timedelta
 
 # Define a Blueprint for stock report routes
 stock_report_bp = Blueprint('stock_report', __name__)
 
-# Cache stock data for 1 hour to avoid hitting rate limits
-@lru_cache(maxsize=100)
-def get_cached_stock_history(symbol, timestamp, period):
-    try:
-        # Map periods to date ranges
-        period_mapping = {
-            "week": 7,
-            "month": 30,
-            "year": 365,
-            "5 years": 1825
-        }
-
-        if period not in period_mapping:
-            raise ValueError("Invalid period. Use 'week', 'month', 'year', or '5 years'.")
-
-        # Calculate the start date based on the period
-        days = period_mapping[period]
-        start_date = (datetime.now() - timedelta(days=days)).date()
-
-        # Query the database for historical data
-        conn = get_db_connection()
+# Packed column types for the chart series (float32 is plenty for prices rounded to cents)
+STOCK_HISTORY_TYPES = {"time": "str", "price": "float32", "high": "float32", "low": "float32"}
+
+def _downsample_rows(rows, points):
+    """
+    LTTB-downsample (date, closing_price, high, low) rows to `points` rows, always keeping the
+    lowest and highest close of the series and of its trailing 52 weeks.
+    """
+    dates = [row[0] for row in rows]
+    prices = np.asarray([row[1] for row in rows], dtype=float)
+    year_start = bisect_left(dates, dates[-1] - timedelta(days=365))
+    keep = {
+        int(np.nanargmax(prices)), int(np.nanargmin(prices)),
+        year_start + int(np.nanargmax(prices[year_start:])), year_start + int(np.nanargmin(prices[year_start:]))
+    }
+    indices = lttb_indices([d.toordinal() for d in dates], prices, points, keep=keep)
+    return [rows[i] for i in indices]
+
+# Map periods to date ranges
+PERIOD_DAYS = {
+    "week": 7,
+    "month": 30,
+    "year": 365,
+    "5 years": 1825
+}
+
+# Most symbols accepted by one /getStockHistoryBatch request
+BATCH_MAX_SYMBOLS = 100
+
+@lru_cache(maxsize=8192)
+def _time_label(date, label_format):
+    # Trading dates repeat across symbols and requests, so format each one once
+    return date.strftime(label_format)
+
+def _period_start_date(period):
+    if period not in PERIOD_DAYS:
+        raise ValueError("Invalid period. Use 'week', 'month', 'year', or '5 years'.")
+    # Calculate the start date based on the period
+    return (datetime.now() - timedelta(days=PERIOD_DAYS[period])).date()
+
+def _format_stock_history(symbol, period, rows, high_low, metadata, points=None):
+    """Turn one symbol's (date, closing_price, high, low) rows, 52-week range and metadata into its chart payload."""
+    if not rows:
+        raise ValueError("No historical data available")
+    if points is not None and len(rows) > points:
+        rows = _downsample_rows(rows, points)
+
+    # Format the time‑series data
+    result = []
+    label_format = "%b %d" if period in ("week", "month") else "%b %Y"  # "year" or "5 years"
+    for date, closing_price, high, low in rows:
+        result.append({
+            "time": _time_label(date, label_format), 
+            "price": round(float(closing_price), 2),
+            "high": round(float(high), 2),
+            "low": round(float(low), 2)
+        })
+
+    # Safely unpack the 52-week high/low
+    week52High = round(float(high_low[0]), 2) if high_low and high_low[0] is not None else None
+    week52Low  = round(float(high_low[1]), 2) if high_low and high_low[1] is not None else None
+
+    stock_info = {
+        "name": metadata[0] if metadata else symbol,
+        "currentPrice": result[-1]["price"],
+        "week52High": week52High,
+        "week52Low": week52Low
+    }
+
+    return {"data": result, "info": stock_info}
+
+def load_stock_history(symbol, period, points=None):
+    """
+    Build the chart series and summary info for a symbol from the database, optionally
+    downsampled to `points` points.
+    Raises on invalid periods or missing data so that failures are never cached.
+    """
+    start_date = _period_start_date(period)
+
+    # Query the database for historical data, 52-week range and metadata on one connection
+    with db_connection() as conn:
         cur = conn.cursor()
         cur.execute("""
-            SELECT date, closing_price, high_52week AS high, low_52week AS low
+            SELECT date, closing_price::float8, high_52week::float8 AS high, low_52week::float8 AS low
             FROM stock_data
             WHERE stock_symbol = %s AND date >= %s
             ORDER BY date ASC
         """, (symbol, start_date))
         rows = cur.fetchall()
 
-        # Also compute the 52-week high/low
-        one_year_ago = (datetime.now() - timedelta(days=365)).date()
-        cur.execute("""
-            SELECT
-              MAX(closing_price) AS high,
-              MIN(closing_price) AS low
-            FROM stock_data
-            WHERE stock_symbol = %s AND date >= %s
-        """, (symbol, one_year_ago))
-        high_low = cur.fetchone()
-
-        cur.close()
-        conn.close()
-
-        if not rows:
-            raise ValueError("No historical data available")
-
-        # Format the time‑series data
-        result = []
-        for date, closing_price, high, low in rows:
-            if period in ("week", "month"):
-                time_label = date.strftime("%b %d")
-            else:  # "year" or "5 years"
-                time_label = date.strftime("%b %Y")
-            result.append({
-                "time": time_label, 
-                "price": round(float(closing_price), 2),
-                "high": round(float(high), 2),
-                "low": round(float(low), 2)
-            })
+        # The same 52-week high/low /stocks/52week reports
+        high_low = HistoricalStockService.get_stored_52week_high_low(cur, symbol)
 
         # Fetch stock metadata
-        conn = get_db_connection()
-        cur = conn.cursor()
         cur.execute("""
             SELECT company_name, sector, industry
             FROM stocks2
@@ -78,21 +112,58 @@ def get_cached_stock_history(symbol, timestamp, period):
         """, (symbol,))
         metadata = cur.fetchone()
         cur.close()
-        conn.close()
 
-        # Safely unpack the 52-week high/low
-        week52High = round(float(high_low[0]), 2) if high_low and high_low[0] is not None else None
-        week52Low  = round(float(high_low[1]), 2) if high_low and high_low[1] is not None else None
+    return _format_stock_history(symbol, period, rows, high_low, metadata, points)
+
+def load_stock_histories(symbols, period, points=None):
+    """
+    load_stock_history for a list of symbols with at most four queries in total: one range query
+    for every series, the batched 52-week lookup and one metadata lookup.
+    Returns {symbol: payload or {"error": ...}}; a symbol that fails doesn't fail the others.
+    """
+    start_date = _period_start_date(period)
+
+    with db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT stock_symbol, date, closing_price::float8, high_52week::float8 AS high, low_52week::float8 AS low
+            FROM stock_data
+            WHERE stock_symbol = ANY(%s) AND date >= %s
+            ORDER BY stock_symbol, date ASC
+        """, (list(symbols), start_date))
+        series = {symbol: [] for symbol in symbols}
+        for symbol, *row in cur.fetchall():
+            series[symbol].append(tuple(row))
 
-        stock_info = {
-            "name": metadata[0] if metadata else symbol,
-            "currentPrice": result[-1]["price"],
-            "week52High": week52High,
-            "week52Low": week52Low
-        }
+        high_lows = HistoricalStockService.get_stored_52week_high_low_batch(cur, symbols)
 
-        return {"data": result, "info": stock_info}
+        cur.execute("""
+            SELECT stock_symbol, company_name, sector, industry
+            FROM stocks2
+            WHERE stock_symbol = ANY(%s)
+        """, (list(symbols),))
+        metadata = {row[0]: row[1:] for row in cur.fetchall()}
+        cur.close()
 
+    results = {}
+    for symbol in symbols:
+        try:
+            results[symbol] = _format_stock_history(
+                symbol, period, series[symbol], high_lows.get(symbol), metadata.get(symbol), points
+            )
+        except Exception as e:
+            results[symbol] = {"error": f"Error fetching data for {symbol}: {str(e)}"}
+    return results
+
+
+def get_cached_stock_history(symbol, period, points=None):
+    """
+    Stock history through the shared history cache, keyed on (symbol, period, points) and the
+    symbol's data version; the daily ingest invalidates a symbol when it writes new rows.
+    """
+    key = period if points is None else (period, points)
+    try:
+        return history_cache.get_or_load(symbol, key, lambda: load_stock_history(symbol, period, points))
     except Exception as e:
         return {"error": f"Error fetching data for {symbol}: {str(e)}"}
 
@@ -100,21 +171,63 @@ def get_cached_stock_history(symbol, timestamp, period):
 def get_stock_history():
     symbol = request.args.get('symbol', '').strip().upper()
     period = request.args.get('period', 'week')
+    points = request.args.get('points', type=int)
 
     if not symbol:
         return jsonify({"error": "Stock symbol is required"}), 400
+    if points is not None and points < 3:
+        return jsonify({"error": "points must be at least 3"}), 400
+    try:
+        fmt = negotiate_format(request)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
     try:
-        # Cache results using hourly timestamp
-        timestamp = int(time.time() / 3600)
-        result = get_cached_stock_history(symbol, timestamp, period)
+        result = get_cached_stock_history(symbol, period, points)
         if "error" in result:
             return jsonify({"error": result["error"]}), 400
-        return jsonify({
+        if fmt != ROWS:
+            return columnar_response(
+                rows_to_columns(result["data"], STOCK_HISTORY_TYPES), STOCK_HISTORY_TYPES, fmt,
+                meta={"symbol": symbol, "period": period, "stockInfo": result["info"]}
+            )
+        return rows_response({
             "symbol": symbol,
             "period": period,
             "data": result["data"],
             "stockInfo": result["info"]
         })
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
\ No newline at end of file
+        return jsonify({"error": str(e)}), 500
+
+@stock_report_bp.route('/getStockHistoryBatch', methods=['GET'])
+def get_stock_history_batch():
+    """
+    Chart series for a watchlist in one request: ?symbols=AAPL,MSFT,...&period=...&points=N.
+    Returns {"period", "results": {symbol: {"data", "stockInfo"} or {"error"}}}.
+    """
+    symbols = [s.strip().upper() for s in request.args.get('symbols', '').split(',') if s.strip()]
+    symbols = list(dict.fromkeys(symbols))
+    period = request.args.get('period', 'week')
+    points = request.args.get('points', type=int)
+
+    if not symbols:
+        return jsonify({"error": "At least one stock symbol is required"}), 400
+    if len(symbols) > BATCH_MAX_SYMBOLS:
+        return jsonify({"error": f"At most {BATCH_MAX_SYMBOLS} symbols per request"}), 400
+    if period not in PERIOD_DAYS:
+        return jsonify({"error": "Invalid period. Use 'week', 'month', 'year', or '5 years'."}), 400
+    if points is not None and points < 3:
+        return jsonify({"error": "points must be at least 3"}), 400
+
+    try:
+        histories = load_stock_histories(symbols, period, points)
+        results = {}
+        for symbol, result in histories.items():
+            if "error" in result:
+                results[symbol] = {"error": result["error"]}
+            else:
+                results[symbol] = {"data": result["data"], "stockInfo": result["info"]}
+        return jsonify({"period": period, "results": results})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
@@ -0,0 +1,39 @@
+from app.utils.async_db import async_db_connection
+from app.services.stock_service import (
+    LATEST_CLOSES_READY_QUERY, MOVEMENT_COUNTERS_FALLBACK_QUERY, MOVEMENT_COUNTERS_QUERY, StockService
+)
+
+
+class AsyncStockService:
+    """
+    asyncpg versions of the cheap, DB-only StockService reads for the async serving mode.
+    Same results and (result, error) returns as their StockService counterparts.
+    """
+
+    @staticmethod
+    async def get_stock_movement_counters():
+        try:
+            async with async_db_connection() as conn:
+                ready = await conn.fetchval(LATEST_CLOSES_READY_QUERY)
+                row = await conn.fetchrow(MOVEMENT_COUNTERS_QUERY if ready else MOVEMENT_COUNTERS_FALLBACK_QUERY)
+            return {"declined": row["declined"], "advanced": row["advanced"]}, None
+        except Exception as e:
+            return None, str(e)
+
+    @staticmethod
+    async def get_new_highs_lows(as_of=None):
+        try:
+            async with async_db_connection() as conn:
+                if as_of is None:
+                    as_of = await conn.fetchval("SELECT MAX(date) FROM market_pulse")
+                    if as_of is None:
+                        return None, "No market data available"
+                rows = await conn.fetch("""
+                    SELECT stock_symbol, new_high, new_low
+                    FROM stock_new_extremes
+                    WHERE date = $1
+                    ORDER BY stock_symbol
+                """, as_of)
+            return StockService.format_new_highs_lows(as_of, [tuple(row) for row in rows]), None
+        except Exception as e:
+            return None, str(e)
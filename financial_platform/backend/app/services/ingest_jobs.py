@@ -0,0 +1,60 @@
+from app.services.stock_data import HistoricalStockService
+from app.utils.jobs import get_job_runner
+
+
+class IngestJobs:
+    """
+    Submits the daily ingest and the backfills to the background JobRunner. Jobs are keyed on
+    their kind and parameters, so re-submitting the same work while it is queued or running
+    (in any worker process) returns the existing job. Every method returns (job, coalesced).
+    """
+
+    @staticmethod
+    def submit_ingest(symbols, trading_date=None):
+        symbols = list(dict.fromkeys(symbols))
+        trading_date = trading_date or HistoricalStockService.last_trading_session()
+        return get_job_runner().submit(
+            "ingest",
+            ("ingest", trading_date, tuple(sorted(symbols))),
+            lambda job: HistoricalStockService.insert_current_day_data_with_movement(
+                symbols, trading_date, on_done=job.report, should_stop=job.is_cancelled
+            ),
+            params={"date": trading_date.isoformat(), "symbols": symbols},
+            total=len(symbols),
+        )
+
+    @staticmethod
+    def submit_backfill_bars(symbols, start_date, end_date):
+        symbols = list(dict.fromkeys(symbols))
+
+        def run(job):
+            updated, failures = HistoricalStockService.backfill_bars(
+                symbols, start_date, end_date, on_done=job.report, should_stop=job.is_cancelled
+            )
+            return {"updated_rows": updated, "failed_symbols": failures}
+
+        return get_job_runner().submit(
+            "backfill_bars",
+            ("backfill_bars", start_date, end_date, tuple(sorted(symbols))),
+            run,
+            params={"start_date": start_date.isoformat(), "end_date": end_date.isoformat(), "symbols": symbols},
+            total=len(symbols),
+        )
+
+    @staticmethod
+    def submit_backfill_market_pulse(symbols, start_date, end_date):
+        symbols = list(dict.fromkeys(symbols))
+
+        def run(job):
+            # A single statement: nothing to report until it is done, and nothing to cancel midway
+            results = HistoricalStockService.backfill_market_pulse(symbols, start_date, end_date)
+            job.report(None)
+            return results
+
+        return get_job_runner().submit(
+            "backfill_market_pulse",
+            ("backfill_market_pulse", start_date, end_date, tuple(sorted(symbols))),
+            run,
+            params={"start_date": start_date.isoformat(), "end_date": end_date.isoformat(), "symbols": symbols},
+            total=1,
+        )
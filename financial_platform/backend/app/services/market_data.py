@@ -0,0 +1,289 @@
+import json
+import math
+import os
+import threading
+import time
+import zlib
+from datetime import date, timedelta
+import numpy as np
+import pandas as pd
+import yfinance as yf
+from app.utils.fetch import get_fetch_executor
+from app.utils.singleton import LazySingleton
+from app.config import Config
+
+HISTORY_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+
+
+class MarketDataProvider:
+    """
+    Source of quotes, daily bars and company metadata for the services.
+
+    The batched methods return a tuple (results, failures): dicts keyed by symbol holding the
+    value or the error message. By default they fan the per-symbol _quote/_history/_metadata
+    calls out through the shared fetch executor (rate limited, retried); a provider with real
+    batch endpoints overrides the batched methods instead. get_quote and get_symbol_history
+    serve one symbol for an interactive request: same limiter and retries, but run on the
+    caller's thread instead of queueing behind batch work, and they raise on failure.
+
+    - get_quotes(symbols): {symbol: {"name", "currentPrice", "marketCap", "peRatio", "week52High",
+      "week52Low", "dividendYield", "sector", "industry"}}, None where unknown
+    - get_history(symbols, start, end): {symbol: DataFrame of HISTORY_COLUMNS indexed by bar
+      date}, for start..end inclusive; start may be a date or a {symbol: date} dict
+    - get_metadata(symbols): {symbol: {"name", "sector", "industry"}}
+    - get_quote(symbol), get_symbol_history(symbol, start, end): one quote dict / DataFrame
+    """
+
+    name = None
+
+    def _quote(self, symbol):
+        raise NotImplementedError
+
+    def _history(self, symbol, start, end):
+        raise NotImplementedError
+
+    def _metadata(self, symbol):
+        raise NotImplementedError
+
+    def get_quotes(self, symbols):
+        return get_fetch_executor().map(self._quote, symbols)
+
+    def get_history(self, symbols, start, end, on_done=None, should_stop=None):
+        starts = start if isinstance(start, dict) else dict.fromkeys(symbols, start)
+        return get_fetch_executor().map(
+            lambda symbol: self._history(symbol, starts[symbol], end), symbols,
+            on_done=on_done, should_stop=should_stop,
+        )
+
+    def get_metadata(self, symbols):
+        return get_fetch_executor().map(self._metadata, symbols)
+
+    def get_quote(self, symbol):
+        return get_fetch_executor().call(self._quote, symbol)
+
+    def get_symbol_history(self, symbol, start, end):
+        return get_fetch_executor().call(lambda item: self._history(item, start, end), symbol)
+
+
+class YFinanceProvider(MarketDataProvider):
+    """Yahoo Finance through yfinance, one Ticker request per symbol."""
+
+    name = "yfinance"
+
+    def _info(self, symbol):
+        info = yf.Ticker(symbol).info
+        if not info or 'longName' not in info:
+            raise ValueError(f"No data found for symbol: {symbol}")
+        return info
+
+    def _quote(self, symbol):
+        info = self._info(symbol)
+        return {
+            "name": info.get('longName'),
+            "currentPrice": info.get('currentPrice') or info.get('regularMarketPrice'),
+            "marketCap": info.get('marketCap'),
+            "peRatio": info.get('trailingPE'),
+            "week52High": info.get('fiftyTwoWeekHigh'),
+            "week52Low": info.get('fiftyTwoWeekLow'),
+            "dividendYield": info.get('dividendYield'),
+            "sector": info.get('sector'),
+            "industry": info.get('industry'),
+        }
+
+    def _history(self, symbol, start, end):
+        # yfinance's end is exclusive
+        return yf.Ticker(symbol).history(start=start, end=end + timedelta(days=1), raise_errors=True)
+
+    def _metadata(self, symbol):
+        info = self._info(symbol)
+        return {"name": info.get('longName'), "sector": info.get('sector'), "industry": info.get('industry')}
+
+
+# Synthetic closes are a closed-form function of a per-symbol seed and the day number, so
+# any symbol at any date is reproducible; SYNTHETIC_CLOSE_SQL is the same formula for seeding
+# a database that has to agree with the provider (see testing/benchmark.py).
+SYNTHETIC_EPOCH = date(2000, 1, 1)
+SYNTHETIC_CLOSE_SQL = "50 + mod({seed}, 50) + 10 * sin({day} / 15.0 + {seed}) + 5 * sin({day} / 3.7 + 2 * {seed})"
+
+
+def synthetic_seed(symbol):
+    return zlib.crc32(symbol.encode('utf-8')) % 100000
+
+
+def synthetic_closes(seed, days):
+    return 50 + (seed % 50) + 10 * np.sin(days / 15.0 + seed) + 5 * np.sin(days / 3.7 + 2 * seed)
+
+
+class SyntheticProvider(MarketDataProvider):
+    """
+    Deterministic, offline data for any number of symbols: weekday bars from
+    synthetic_closes(), with `latency` seconds of simulated upstream delay per request.
+    """
+
+    name = "synthetic"
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+
+    def _wait(self):
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+    def bars(self, symbol, start, end):
+        seed = synthetic_seed(symbol)
+        index = pd.bdate_range(start, end)
+        days = np.array([(d.date() - SYNTHETIC_EPOCH).days for d in index], dtype=float)
+        close = synthetic_closes(seed, days).round(2)
+        return pd.DataFrame({
+            "Open": close - 0.5,
+            "High": close + 1,
+            "Low": close - 1,
+            "Close": close,
+            "Volume": 100000 + (seed * 7919 + days.astype(int)) % 50000,
+        }, index=index)
+
+    def _quote(self, symbol):
+        self._wait()
+        today = date.today()
+        bars = self.bars(symbol, today - timedelta(days=364), today)
+        price = float(bars['Close'].iloc[-1])
+        return {
+            "name": f"{symbol} Holdings",
+            "currentPrice": price,
+            "marketCap": int(price * 1e9),
+            "peRatio": 20.0,
+            "week52High": float(bars['High'].max()),
+            "week52Low": float(bars['Low'].min()),
+            "dividendYield": 0.01,
+            "sector": "Technology",
+            "industry": "Software",
+        }
+
+    def _history(self, symbol, start, end):
+        self._wait()
+        return self.bars(symbol, start, end)
+
+    def _metadata(self, symbol):
+        self._wait()
+        return {"name": f"{symbol} Holdings", "sector": "Technology", "industry": "Software"}
+
+
+class ReplayProvider(MarketDataProvider):
+    """
+    Serves quotes, bars and metadata from a JSON fixture file. With `record_from`, calls go to
+    that provider instead and whatever it returns is merged into the fixture, so a session
+    against the real upstream can be replayed offline later. Replaying a symbol (or bar range)
+    that was never recorded fails that symbol.
+    """
+
+    name = "replay"
+
+    def __init__(self, path, record_from=None):
+        self.path = path
+        self.record_from = record_from
+        self._lock = threading.Lock()
+        self._fixture = {"quotes": {}, "metadata": {}, "history": {}}
+        if os.path.exists(path):
+            with open(path) as f:
+                self._fixture.update(json.load(f))
+
+    def _save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._fixture, f)
+        os.replace(tmp_path, self.path)
+
+    def _record(self, section, values):
+        if not values:
+            return
+        with self._lock:
+            self._fixture[section].update(values)
+            self._save()
+
+    def _quote(self, symbol):
+        quote = self._fixture["quotes"].get(symbol)
+        if quote is None:
+            raise ValueError(f"No recorded quote for {symbol}")
+        return quote
+
+    def _metadata(self, symbol):
+        metadata = self._fixture["metadata"].get(symbol)
+        if metadata is None:
+            raise ValueError(f"No recorded metadata for {symbol}")
+        return metadata
+
+    def _history(self, symbol, start, end):
+        recorded = self._fixture["history"].get(symbol)
+        if recorded is None:
+            raise ValueError(f"No recorded history for {symbol}")
+        # Each bar is [iso date, open, high, low, close, volume]; NaN is stored as null
+        frame = pd.DataFrame(
+            [[math.nan if v is None else v for v in bar[1:]] for bar in recorded],
+            index=pd.DatetimeIndex([bar[0] for bar in recorded]), columns=HISTORY_COLUMNS,
+        )
+        return frame[(frame.index.date >= start) & (frame.index.date <= end)]
+
+    def get_quotes(self, symbols):
+        if self.record_from is None:
+            return super().get_quotes(symbols)
+        quotes, failures = self.record_from.get_quotes(symbols)
+        self._record("quotes", quotes)
+        return quotes, failures
+
+    def get_metadata(self, symbols):
+        if self.record_from is None:
+            return super().get_metadata(symbols)
+        metadata, failures = self.record_from.get_metadata(symbols)
+        self._record("metadata", metadata)
+        return metadata, failures
+
+    def get_history(self, symbols, start, end, on_done=None, should_stop=None):
+        if self.record_from is None:
+            return super().get_history(symbols, start, end, on_done=on_done, should_stop=should_stop)
+        histories, failures = self.record_from.get_history(
+            symbols, start, end, on_done=on_done, should_stop=should_stop
+        )
+        self._record_history(histories)
+        return histories, failures
+
+    def get_quote(self, symbol):
+        if self.record_from is None:
+            return super().get_quote(symbol)
+        quote = self.record_from.get_quote(symbol)
+        self._record("quotes", {symbol: quote})
+        return quote
+
+    def get_symbol_history(self, symbol, start, end):
+        if self.record_from is None:
+            return super().get_symbol_history(symbol, start, end)
+        frame = self.record_from.get_symbol_history(symbol, start, end)
+        self._record_history({symbol: frame})
+        return frame
+
+    def _record_history(self, histories):
+        recorded = {}
+        for symbol, frame in histories.items():
+            bars = {bar[0]: bar for bar in self._fixture["history"].get(symbol, [])}
+            for bar_time, row in frame[HISTORY_COLUMNS].iterrows():
+                day = bar_time.date().isoformat()
+                bars[day] = [day] + [None if pd.isna(v) else float(v) for v in row]
+            recorded[symbol] = [bars[day] for day in sorted(bars)]
+        self._record("history", recorded)
+
+
+def create_market_data_provider(config=Config):
+    """Build the provider named by config.MARKET_DATA_PROVIDER (yfinance, synthetic, replay or record)."""
+    kind = config.MARKET_DATA_PROVIDER
+    if kind == "yfinance":
+        return YFinanceProvider()
+    if kind == "synthetic":
+        return SyntheticProvider(latency=config.SYNTHETIC_LATENCY)
+    if kind in ("replay", "record"):
+        if not config.MARKET_DATA_FIXTURE:
+            raise ValueError(f"MARKET_DATA_FIXTURE is required for the {kind} market-data provider")
+        record_from = YFinanceProvider() if kind == "record" else None
+        return ReplayProvider(config.MARKET_DATA_FIXTURE, record_from=record_from)
+    raise ValueError(f"Unknown MARKET_DATA_PROVIDER: {kind}")
+
+
+get_market_data_provider = LazySingleton(create_market_data_provider).get
@@ -0,0 +1,105 @@
+import math
+from collections import deque
+from datetime import date, timedelta
+from psycopg2.extras import Json, execute_values
+
+
+class RollingExtremes:
+    """
+    Rolling 52‑week high/low for one symbol, kept as a pair of monotonic deques of (date, value).
+
+    push() is O(1) amortized and, bar for bar, gives the same result as
+    `High.rolling(window='365d', min_periods=1).max()` / `Low...min()` in pandas: the window
+    ending on day d holds the bars dated after d - 365 days.
+    """
+
+    WINDOW = timedelta(days=365)
+
+    def __init__(self, highs=(), lows=(), as_of=None):
+        self.highs = deque(highs)
+        self.lows = deque(lows)
+        self.as_of = as_of
+
+    def push(self, bar_date, high, low):
+        cutoff = bar_date - self.WINDOW
+        while self.highs and self.highs[0][0] <= cutoff:
+            self.highs.popleft()
+        while self.lows and self.lows[0][0] <= cutoff:
+            self.lows.popleft()
+
+        # Like pandas, missing values don't enter the window
+        if high is not None and not math.isnan(high):
+            while self.highs and self.highs[-1][1] <= high:
+                self.highs.pop()
+            self.highs.append((bar_date, high))
+        if low is not None and not math.isnan(low):
+            while self.lows and self.lows[-1][1] >= low:
+                self.lows.pop()
+            self.lows.append((bar_date, low))
+        self.as_of = bar_date
+
+    @property
+    def high(self):
+        return self.highs[0][1] if self.highs else None
+
+    @property
+    def low(self):
+        return self.lows[0][1] if self.lows else None
+
+    def push_frame(self, frame, until=None):
+        """Push the bars of a yfinance-style DataFrame dated after as_of (and up to `until`)."""
+        for bar_time, high, low in zip(frame.index, frame['High'], frame['Low']):
+            bar_date = bar_time.date()
+            if self.as_of is not None and bar_date <= self.as_of:
+                continue
+            if until is not None and bar_date > until:
+                break
+            self.push(bar_date, float(high), float(low))
+
+    @classmethod
+    def from_frame(cls, frame, until=None):
+        extremes = cls()
+        extremes.push_frame(frame, until)
+        return extremes
+
+    @staticmethod
+    def _dump(entries):
+        return Json([[d.isoformat(), value] for d, value in entries])
+
+    @staticmethod
+    def _load(entries):
+        return [(date.fromisoformat(d), value) for d, value in entries]
+
+    @classmethod
+    def load(cls, cur, symbols):
+        """Return {symbol: RollingExtremes} for the symbols that have persisted state."""
+        cur.execute("""
+            SELECT stock_symbol, as_of, high_deque, low_deque
+            FROM stock_extremes
+            WHERE stock_symbol = ANY(%s)
+        """, (list(symbols),))
+        return {
+            symbol: cls(cls._load(highs), cls._load(lows), as_of)
+            for symbol, as_of, highs, lows in cur.fetchall()
+        }
+
+    @classmethod
+    def save(cls, cur, states):
+        """Upsert {symbol: RollingExtremes} into stock_extremes, skipping older states (the caller commits)."""
+        if not states:
+            return
+        execute_values(cur, """
+            INSERT INTO stock_extremes (stock_symbol, as_of, high_52week, low_52week, high_deque, low_deque)
+            VALUES %s
+            ON CONFLICT (stock_symbol) DO UPDATE
+            SET as_of = EXCLUDED.as_of,
+                high_52week = EXCLUDED.high_52week,
+                low_52week = EXCLUDED.low_52week,
+                high_deque = EXCLUDED.high_deque,
+                low_deque = EXCLUDED.low_deque
+            -- Never roll a symbol back behind state a later ingest already saved
+            WHERE stock_extremes.as_of <= EXCLUDED.as_of
+        """, [
+            (symbol, state.as_of, state.high, state.low, cls._dump(state.highs), cls._dump(state.lows))
+            for symbol, state in states.items()
+        ])
@@ -1,18 +1,94 @@
-import yfinance as yf
 import pandas as pd
 from datetime import datetime, timedelta, date
-from app.utils.db import get_db_connection
+from zoneinfo import ZoneInfo
+from psycopg2.extras import execute_values
+from app.utils.db import db_connection
+from app.utils.jobs import JobCancelled
+from app.utils.partitions import ensure_stock_data_partitions
+from app.utils.cache import TTLCache, SQLiteCache, VersionedCache
+from app.services.rolling_extremes import RollingExtremes
+from app.services.market_data import get_market_data_provider
+from app.config import Config
+
+# Chart history served by /getStockHistory; entries are invalidated per symbol whenever
+# stock_data rows for that symbol are written.
+history_cache = VersionedCache(
+    TTLCache(max_entries=Config.HISTORY_CACHE_MAX_ENTRIES, ttl=Config.HISTORY_CACHE_TTL),
+    SQLiteCache(Config.HISTORY_CACHE_PATH, ttl=Config.HISTORY_CACHE_TTL) if Config.HISTORY_CACHE_PATH else None,
+)
+
+# Advisory lock namespace for the writers of market_pulse, stock_new_extremes and stock_extremes
+MARKET_PULSE_LOCK_KEY = "market_pulse_writes"
 
 class HistoricalStockService:
+    @staticmethod
+    def get_local_52week_high_low_batch(cur, symbols):
+        """
+        52-week high/low from the bars stored in stock_data, anchored at each symbol's latest bar,
+        in one grouped query. Rows ingested before OHLC was stored fall back to their closing price.
+        Returns {symbol: (high, low)}; symbols without rows are left out.
+        """
+        cur.execute("""
+            SELECT d.stock_symbol,
+                   MAX(COALESCE(d.high_price, d.closing_price)), MIN(COALESCE(d.low_price, d.closing_price))
+            FROM unnest(%s::varchar[]) AS s(stock_symbol)
+            CROSS JOIN LATERAL (
+                SELECT MAX(date) AS latest FROM stock_data WHERE stock_symbol = s.stock_symbol
+            ) l
+            JOIN stock_data d ON d.stock_symbol = s.stock_symbol AND d.date > l.latest - 365
+            GROUP BY d.stock_symbol
+        """, (list(symbols),))
+        return {symbol: (high, low) for symbol, high, low in cur.fetchall()}
+
+    @staticmethod
+    def get_stored_52week_high_low(cur, stock_symbol):
+        """
+        The 52-week high/low every endpoint reports for a tracked symbol: the rolling-extremes state
+        maintained by the daily ingest, or else the aggregate of the stored bars.
+        Returns (None, None) when neither has the symbol.
+        """
+        return HistoricalStockService.get_stored_52week_high_low_batch(cur, [stock_symbol]).get(
+            stock_symbol, (None, None)
+        )
+
+    @staticmethod
+    def get_stored_52week_high_low_batch(cur, symbols):
+        """
+        get_stored_52week_high_low for many symbols: one stock_extremes lookup, plus one grouped
+        stock_data aggregate for the symbols it doesn't cover.
+        Returns {symbol: (high, low)}; symbols without either are left out.
+        """
+        cur.execute("""
+            SELECT stock_symbol, high_52week, low_52week
+            FROM stock_extremes
+            WHERE stock_symbol = ANY(%s) AND high_52week IS NOT NULL AND low_52week IS NOT NULL
+        """, (list(symbols),))
+        high_lows = {symbol: (high, low) for symbol, high, low in cur.fetchall()}
+        missing = [symbol for symbol in symbols if symbol not in high_lows]
+        if missing:
+            local = HistoricalStockService.get_local_52week_high_low_batch(cur, missing)
+            high_lows.update(
+                (symbol, high_low) for symbol, high_low in local.items() if None not in high_low
+            )
+        return high_lows
+
     @staticmethod
     def get_52week_high_low(stock_symbol):
         """
         Retrieve the 52-week high and low prices for a given stock symbol.
-        (Used elsewhere; this version calculates from 1y of data.)
+        Answered locally through get_stored_52week_high_low (the same figures the chart endpoints
+        report); only symbols we don't track fall back to 1y of bars from the market-data provider.
         """
         try:
-            stock = yf.Ticker(stock_symbol)
-            data = stock.history(period="1y")
+            with db_connection() as conn:
+                cur = conn.cursor()
+                row = HistoricalStockService.get_stored_52week_high_low(cur, stock_symbol)
+                cur.close()
+            if row and row[0] is not None and row[1] is not None:
+                return row[0], row[1]
+
+            today = date.today()
+            data = get_market_data_provider().get_symbol_history(stock_symbol, today - timedelta(days=365), today)
             if data.empty:
                 raise ValueError(f"No historical data found for symbol: {stock_symbol}")
             high_52week = data['High'].max()
@@ -26,137 +102,220 @@ class HistoricalStockService:
         """
         Insert stock metadata into the stocks2 table.
         """
-        try:
-            stock = yf.Ticker(stock_symbol)
-            info = stock.info
-            company_name = info.get('longName', '')
-            sector = info.get('sector', '')
-            industry = info.get('industry', '')
-            
-            conn = get_db_connection()
-            cur = conn.cursor()
-            cur.execute('''
-                INSERT INTO stocks2 (stock_symbol, company_name, sector, industry)
-                VALUES (%s, %s, %s, %s)
-                ON CONFLICT (stock_symbol) DO NOTHING;
-            ''', (stock_symbol, company_name, sector, industry))
-            conn.commit()
-            cur.close()
-            conn.close()
-        except Exception as e:
-            raise Exception(f"Error inserting metadata for {stock_symbol}: {e}")
-        
+        _, failures = HistoricalStockService.insert_stock_metadata_batch([stock_symbol])
+        if failures:
+            raise Exception(f"Error inserting metadata for {stock_symbol}: {failures[stock_symbol]}")
+
     @staticmethod
-    def insert_current_day_data_with_movement(symbols):
+    def insert_stock_metadata_batch(symbols):
         """
-        For each provided stock symbol, fetch today's data, compute the rolling 52‑week high/low,
-        determine movement relative to yesterday, and insert today's row into stock_data.
-        Then, if at least one symbol has valid (i.e. trading day) data, aggregate the data and
-        insert/update the market_pulse table. Finally, if there are more than 365 valid weekday entries,
-        delete the oldest valid row.
+        Fetch metadata for all symbols from the market-data provider and insert it into the
+        stocks2 table in one statement.
+        Returns a tuple (inserted_symbols, failures) where failures maps symbol -> error message.
         """
-        today_date = date(2025, 4, 28)
+        metadata, failures = get_market_data_provider().get_metadata(symbols)
+        rows = {
+            symbol: (symbol, info['name'] or '', info['sector'] or '', info['industry'] or '')
+            for symbol, info in metadata.items()
+        }
+        if rows:
+            with db_connection() as conn:
+                cur = conn.cursor()
+                execute_values(cur, '''
+                    INSERT INTO stocks2 (stock_symbol, company_name, sector, industry)
+                    VALUES %s
+                    ON CONFLICT (stock_symbol) DO NOTHING;
+                ''', list(rows.values()))
+                conn.commit()
+                cur.close()
+        return list(rows), failures
 
-        total_new_highs = 0
-        total_new_lows = 0
-        total_advanced  = 0
-        total_declined  = 0
-        total_unchanged = 0
+    @staticmethod
+    def _fetch_histories(symbols, start_dates, end_date, on_done=None, should_stop=None):
+        """
+        Fetch daily bars from start_dates[symbol] through end_date for every symbol from the
+        market-data provider (rate limited and retried through the shared fetch executor).
+        on_done/should_stop are passed on for progress and cancellation.
+        Returns a tuple (histories, failures): symbol -> DataFrame and symbol -> error message.
+        """
+        return get_market_data_provider().get_history(
+            symbols, start_dates, end_date, on_done=on_done, should_stop=should_stop
+        )
+
+    @staticmethod
+    def lock_market_pulse_writes(cur, trading_date=None):
+        """
+        Serialize market_pulse writers across worker processes until the caller's transaction
+        ends. An ingest passes its trading date: ingests of the same date wait for each other,
+        other dates proceed. A range write (trading_date=None) waits for every ingest and blocks
+        new ones.
+        """
+        if trading_date is None:
+            cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (MARKET_PULSE_LOCK_KEY,))
+            return
+        cur.execute("SELECT pg_advisory_xact_lock_shared(hashtext(%s))", (MARKET_PULSE_LOCK_KEY,))
+        cur.execute(
+            "SELECT pg_advisory_xact_lock(hashtext(%s))",
+            (f"{MARKET_PULSE_LOCK_KEY}:{trading_date.isoformat()}",),
+        )
+
+    @staticmethod
+    def last_trading_session(now=None):
+        """
+        The most recent weekday whose session has closed in the market's timezone (exchange
+        holidays are not modelled; an ingest for one finds no bars and writes nothing).
+        """
+        market_tz = ZoneInfo(Config.MARKET_TIMEZONE)
+        now = now.astimezone(market_tz) if now is not None else datetime.now(market_tz)
+        session = now.date()
+        if now.hour < Config.MARKET_CLOSE_HOUR:
+            session -= timedelta(days=1)
+        while session.weekday() >= 5:
+            session -= timedelta(days=1)
+        return session
+
+    @staticmethod
+    def insert_current_day_data_with_movement(symbols, trading_date=None, on_done=None, should_stop=None):
+        """
+        For the provided stock symbols, fetch the bars since each symbol's last update through the
+        fetch executor, advance its persisted rolling 52‑week high/low state, determine movement
+        relative to each symbol's previous row, and bulk insert the trading date's rows into
+        stock_data. Then, if at least one symbol has valid (i.e. trading day) data, aggregate the
+        data and insert/update the market_pulse table (including its derived series) in the same
+        transaction. Finally, if there are more than 365 valid weekday entries, delete the oldest
+        valid row.
+
+        trading_date defaults to the last closed session. on_done(symbol, error) is called as each
+        symbol's fetch finishes; once should_stop() returns True the run raises JobCancelled
+        before anything is written.
+        """
+        today_date = trading_date or HistoricalStockService.last_trading_session()
+        symbols = list(dict.fromkeys(symbols))
 
-        valid_data_found = False  # Flag to track if today's data is available for any symbol
+        # Symbols with persisted rolling-extremes state only need the bars since their last update;
+        # the others (or a backdated run) fetch a full 52-week window.
+        with db_connection() as conn:
+            cur = conn.cursor()
+            persisted = RollingExtremes.load(cur, symbols)
+            cur.close()
+        states = {symbol: state for symbol, state in persisted.items() if state.as_of <= today_date}
+        newer_states = set(persisted) - set(states)
+        start_dates = {
+            symbol: min(states[symbol].as_of + timedelta(days=1), today_date) if symbol in states
+            else today_date - RollingExtremes.WINDOW
+            for symbol in symbols
+        }
 
+        histories, failures = HistoricalStockService._fetch_histories(
+            symbols, start_dates, today_date, on_done=on_done, should_stop=should_stop
+        )
+        if should_stop is not None and should_stop():
+            raise JobCancelled()
+        for symbol, error in failures.items():
+            print(f"Error fetching {symbol}: {error}")
+
+        # Today's (closing_price, 52wk_high, 52wk_low, open, high, low, volume) per symbol
+        todays_rows = {}
         for symbol in symbols:
+            data = histories.get(symbol)
+            if data is None or data.empty:
+                # No bars means no state to advance; a fresh RollingExtremes would have no as_of
+                continue
             try:
-                ticker = yf.Ticker(symbol)
-                data_full = ticker.history(period="1y")
-                if data_full.empty:
-                    print(f"No historical data for {symbol}, skipping...")
-                    continue
-
-                # Compute rolling 52‑week high/low
-                data_full['52wk_high'] = data_full['High'].rolling(window='365d', min_periods=1).max()
-                data_full['52wk_low'] = data_full['Low'].rolling(window='365d', min_periods=1).min()
+                # Advance the rolling 52‑week high/low with the new bars
+                state = states.setdefault(symbol, RollingExtremes())
+                state.push_frame(data, until=today_date)
 
-                mask = data_full.index.date == today_date
+                mask = data.index.date == today_date
                 if not mask.any():
                     print(f"No data for {symbol} on {today_date}, skipping...")
                     continue
 
-                valid_data_found = True  # At least one symbol provided valid data for today
-                current_row = data_full[mask].iloc[-1]
-                closing_price      = current_row['Close']
-                current_52wk_high  = current_row['52wk_high']
-                current_52wk_low   = current_row['52wk_low']
-
-                # Retrieve the previous row for this symbol
-                conn_prev = get_db_connection()
-                cur_prev = conn_prev.cursor()
-                cur_prev.execute("""
-                    SELECT closing_price, high_52week, low_52week
+                current_row = data[mask].iloc[-1]
+                todays_rows[symbol] = (
+                    float(current_row['Close']), state.high, state.low,
+                    float(current_row['Open']), float(current_row['High']), float(current_row['Low']),
+                    int(current_row['Volume']) if pd.notna(current_row['Volume']) else None
+                )
+            except Exception as e:
+                print(f"Error processing {symbol}: {e}")
+                states.pop(symbol, None)
+                continue
+
+        # Only update the database if at least one symbol has valid data
+        if not todays_rows:
+            print("No valid trading data found for today.")
+            return None
+
+        total_new_highs = 0
+        total_new_lows = 0
+        total_advanced  = 0
+        total_declined  = 0
+        total_unchanged = 0
+        new_extremes = []
+
+        with db_connection() as conn:
+            cur = conn.cursor()
+            # Another worker may be ingesting the same date
+            HistoricalStockService.lock_market_pulse_writes(cur, today_date)
+
+            # Rows for symbols without metadata would violate the stocks2 foreign key
+            cur.execute("SELECT stock_symbol FROM stocks2 WHERE stock_symbol = ANY(%s)", (list(states),))
+            known_symbols = {row[0] for row in cur.fetchall()}
+            for symbol in [s for s in todays_rows if s not in known_symbols]:
+                print(f"Error processing {symbol}: no stocks2 metadata, skipping...")
+                del todays_rows[symbol]
+            RollingExtremes.save(cur, {
+                s: state for s, state in states.items()
+                if s in known_symbols and s not in newer_states and state.as_of is not None
+            })
+
+            # Retrieve the previous row for every symbol in one index-backed query
+            cur.execute("""
+                SELECT s.stock_symbol, prev.closing_price, prev.high_52week, prev.low_52week, prev.date
+                FROM unnest(%s::varchar[]) AS s(stock_symbol)
+                CROSS JOIN LATERAL (
+                    SELECT closing_price, high_52week, low_52week, date
                     FROM stock_data
-                    WHERE stock_symbol = %s AND date < %s
+                    WHERE stock_symbol = s.stock_symbol AND date < %s
                     ORDER BY date DESC LIMIT 1
-                """, (symbol, today_date))
-                prev_row = cur_prev.fetchone()
-                cur_prev.close()
-                conn_prev.close()
-
-                is_advanced = False
-                is_declined = False
-                is_unchanged = False
-                is_new_high = False
-                is_new_low = False
-
-                if prev_row:
-                    prev_close, prev_52wk_high, prev_52wk_low = prev_row
+                ) prev
+            """, (list(todays_rows), today_date))
+            prev_rows = {row[0]: row[1:] for row in cur.fetchall()}
+
+            # Tally the aggregated values
+            for symbol, (closing_price, *_) in todays_rows.items():
+                prev_row = prev_rows.get(symbol)
+                if not prev_row:
+                    continue
+                prev_close, prev_52wk_high, prev_52wk_low, _ = prev_row
+                if prev_close is not None:
                     if closing_price > prev_close:
-                        is_advanced = True
-                    elif closing_price < prev_close:
-                        is_declined = True
-                    else:
-                        is_unchanged = True
-
-                    if closing_price > prev_52wk_high:
-                        is_new_high = True
-                    if closing_price < prev_52wk_low:
-                        is_new_low = True
-
-                # Insert today's data into stock_data
-                conn_ins = get_db_connection()
-                cur_ins = conn_ins.cursor()
-                cur_ins.execute("""
-                    INSERT INTO stock_data (stock_symbol, date, closing_price, high_52week, low_52week)
-                    VALUES (%s, %s, %s, %s, %s)
-                    ON CONFLICT (stock_symbol, date) DO NOTHING;
-                """, (symbol, today_date, closing_price, current_52wk_high, current_52wk_low))
-                conn_ins.commit()
-                cur_ins.close()
-                conn_ins.close()
-
-                # Tally the aggregated values
-                if prev_row:
-                    if is_new_high:
-                        total_new_highs += 1
-                    if is_new_low:
-                        total_new_lows += 1
-                    if is_advanced:
                         total_advanced += 1
-                    elif is_declined:
+                    elif closing_price < prev_close:
                         total_declined += 1
-                    elif is_unchanged:
+                    else:
                         total_unchanged += 1
+                new_high = prev_52wk_high is not None and closing_price > prev_52wk_high
+                new_low = prev_52wk_low is not None and closing_price < prev_52wk_low
+                total_new_highs += new_high
+                total_new_lows += new_low
+                if new_high or new_low:
+                    new_extremes.append((today_date, symbol, new_high, new_low))
 
-            except Exception as e:
-                print(f"Error processing {symbol}: {e}")
-                continue
+            # Insert today's data into stock_data (into its yearly partition, once that exists)
+            ensure_stock_data_partitions(cur, [today_date.year])
+            inserted = execute_values(cur, """
+                INSERT INTO stock_data (stock_symbol, date, closing_price, high_52week, low_52week,
+                                        open_price, high_price, low_price, volume)
+                VALUES %s
+                ON CONFLICT (stock_symbol, date) DO NOTHING
+                RETURNING stock_symbol, date, closing_price;
+            """, [(symbol, today_date) + values for symbol, values in todays_rows.items()], fetch=True)
+            HistoricalStockService.update_latest_closes(cur, inserted, prev_rows)
 
-        # Only update the market_pulse table if at least one symbol has valid data
-        if valid_data_found:
             ad_spread = total_advanced - total_declined
-
-            conn_mp = get_db_connection()
-            cur_mp = conn_mp.cursor()
-            cur_mp.execute("""
+            cur.execute("""
                 INSERT INTO market_pulse (date, new_highs, new_lows, advanced, declined, unchanged, ad_spread)
                 VALUES (%s, %s, %s, %s, %s, %s, %s)
                 ON CONFLICT (date) DO UPDATE
@@ -167,21 +326,27 @@ class HistoricalStockService:
                     unchanged = EXCLUDED.unchanged,
                     ad_spread = EXCLUDED.ad_spread;
             """, (today_date, total_new_highs, total_new_lows, total_advanced, total_declined, total_unchanged, ad_spread))
-            conn_mp.commit()
-            cur_mp.close()
-            conn_mp.close()
+            HistoricalStockService.refresh_market_pulse_metrics(cur, today_date)
+
+            # Record which symbols made the new highs/lows counted above
+            cur.execute("""
+                DELETE FROM stock_new_extremes WHERE date = %s AND stock_symbol = ANY(%s)
+            """, (today_date, list(todays_rows)))
+            if new_extremes:
+                execute_values(cur, """
+                    INSERT INTO stock_new_extremes (date, stock_symbol, new_high, new_low)
+                    VALUES %s
+                """, new_extremes, page_size=len(new_extremes))
 
             # Delete the oldest valid weekday row if there are more than 365 valid rows in market_pulse.
-            conn_cleanup = get_db_connection()
-            cur_cleanup = conn_cleanup.cursor()
             # Count only records from weekdays (i.e. excluding Saturday=6 and Sunday=0)
-            cur_cleanup.execute("""
+            cur.execute("""
                 SELECT COUNT(*) FROM market_pulse
                 WHERE EXTRACT(DOW FROM date) NOT IN (0, 6)
             """)
-            valid_count = cur_cleanup.fetchone()[0]
+            valid_count = cur.fetchone()[0]
             if valid_count > 365:
-                cur_cleanup.execute("""
+                cur.execute("""
                     DELETE FROM market_pulse
                     WHERE date = (
                         SELECT date FROM market_pulse
@@ -190,161 +355,292 @@ class HistoricalStockService:
                         LIMIT 1
                     )
                 """)
-                conn_cleanup.commit()
-            cur_cleanup.close()
-            conn_cleanup.close()
-
-            return {
-                "date": today_date.isoformat(),
-                "new_highs": total_new_highs,
-                "new_lows": total_new_lows,
-                "advanced": total_advanced,
-                "declined": total_declined,
-                "unchanged": total_unchanged,
-                "ad_spread": ad_spread
-            }
-        else:
-            print("No valid trading data found for today.")
-            return None
+
+            conn.commit()
+            cur.close()
+
+        # Chart histories for these symbols are out of date now
+        history_cache.invalidate(todays_rows)
+
+        return {
+            "date": today_date.isoformat(),
+            "new_highs": total_new_highs,
+            "new_lows": total_new_lows,
+            "advanced": total_advanced,
+            "declined": total_declined,
+            "unchanged": total_unchanged,
+            "ad_spread": ad_spread,
+            "failed_symbols": failures
+        }
+
+    @staticmethod
+    def rebuild_latest_closes(cur):
+        """
+        Rebuild the stock_latest_closes snapshot (each symbol's last two closes) from stock_data
+        with two index probes per symbol (the caller commits).
+        """
+        cur.execute("""
+            INSERT INTO stock_latest_closes (stock_symbol, last_date, last_close, prev_date, prev_close)
+            SELECT s.stock_symbol, last_row.date, last_row.closing_price, prev_row.date, prev_row.closing_price
+            FROM stocks2 s
+            CROSS JOIN LATERAL (
+                SELECT date, closing_price FROM stock_data
+                WHERE stock_symbol = s.stock_symbol
+                ORDER BY date DESC LIMIT 1
+            ) last_row
+            LEFT JOIN LATERAL (
+                SELECT date, closing_price FROM stock_data
+                WHERE stock_symbol = s.stock_symbol
+                ORDER BY date DESC OFFSET 1 LIMIT 1
+            ) prev_row ON TRUE
+            ON CONFLICT (stock_symbol) DO UPDATE
+            SET last_date = EXCLUDED.last_date,
+                last_close = EXCLUDED.last_close,
+                prev_date = EXCLUDED.prev_date,
+                prev_close = EXCLUDED.prev_close
+        """)
+
+    @staticmethod
+    def update_latest_closes(cur, inserted_rows, prev_rows):
+        """
+        Fold newly inserted (stock_symbol, date, closing_price) rows into the stock_latest_closes
+        snapshot, in the caller's transaction. prev_rows maps symbol -> its previous stock_data row
+        (closing_price, high_52week, low_52week, date) and seeds symbols new to the snapshot.
+        An empty snapshot has never been built, so it is rebuilt from stock_data instead.
+        """
+        if not inserted_rows:
+            return
+        cur.execute("SELECT EXISTS (SELECT 1 FROM stock_latest_closes)")
+        if not cur.fetchone()[0]:
+            HistoricalStockService.rebuild_latest_closes(cur)
+            return
+
+        values = []
+        for symbol, row_date, closing_price in inserted_rows:
+            prev_row = prev_rows.get(symbol)
+            values.append((
+                symbol, row_date, closing_price,
+                prev_row[3] if prev_row else None, prev_row[0] if prev_row else None
+            ))
+        # Rows newer than the snapshot shift last -> prev; rows between prev and last replace prev.
+        execute_values(cur, """
+            INSERT INTO stock_latest_closes AS s (stock_symbol, last_date, last_close, prev_date, prev_close)
+            VALUES %s
+            ON CONFLICT (stock_symbol) DO UPDATE
+            SET prev_date = CASE
+                    WHEN EXCLUDED.last_date > s.last_date THEN s.last_date
+                    WHEN EXCLUDED.last_date < s.last_date
+                         AND (s.prev_date IS NULL OR EXCLUDED.last_date > s.prev_date) THEN EXCLUDED.last_date
+                    ELSE s.prev_date END,
+                prev_close = CASE
+                    WHEN EXCLUDED.last_date > s.last_date THEN s.last_close
+                    WHEN EXCLUDED.last_date < s.last_date
+                         AND (s.prev_date IS NULL OR EXCLUDED.last_date > s.prev_date) THEN EXCLUDED.last_close
+                    ELSE s.prev_close END,
+                last_date = GREATEST(s.last_date, EXCLUDED.last_date),
+                last_close = CASE
+                    WHEN EXCLUDED.last_date >= s.last_date THEN EXCLUDED.last_close
+                    ELSE s.last_close END
+        """, values, template="(%s, %s::date, %s::numeric, %s::date, %s::numeric)")
 
     @staticmethod
-    def backfill_market_pulse(symbols):
+    def refresh_market_pulse_metrics(cur, from_date):
         """
-        Backfill the market_pulse table for all dates between 2024-04-06 and 2025-03-26
+        Recompute the derived market_pulse series for every row dated from_date onwards, in date
+        order, seeded from the rows before it (the caller commits):
+        - cumulative_ad_line: running sum of (advanced - declined)
+        - new_high_roc / new_low_roc: % change in new highs/lows versus the previous row (0 when
+          the previous count is 0 or there is no previous row)
+        - acceleration: today's change in new highs minus the previous row's change
+        Upserting the latest day only touches that row; backfilling a past date re-chains the rows
+        after it.
+        """
+        cur.execute("""
+            WITH window_rows AS (
+                SELECT
+                    date,
+                    new_highs,
+                    LAG(new_highs) OVER w AS prev_highs,
+                    LAG(new_highs, 2) OVER w AS prev2_highs,
+                    new_lows,
+                    LAG(new_lows) OVER w AS prev_lows,
+                    SUM(CASE WHEN date >= %(from_date)s THEN advanced - declined ELSE 0 END)
+                        OVER (w ROWS UNBOUNDED PRECEDING) AS ad_since
+                FROM market_pulse
+                -- The two rows before from_date seed the lagged values
+                WHERE date >= COALESCE((
+                    SELECT MIN(date) FROM (
+                        SELECT date FROM market_pulse WHERE date < %(from_date)s ORDER BY date DESC LIMIT 2
+                    ) seed_rows
+                ), %(from_date)s)
+                WINDOW w AS (ORDER BY date)
+            ),
+            base AS (
+                SELECT COALESCE((
+                    SELECT cumulative_ad_line FROM market_pulse
+                    WHERE date < %(from_date)s ORDER BY date DESC LIMIT 1
+                ), 0) AS cumulative_ad_line
+            )
+            UPDATE market_pulse m
+            SET cumulative_ad_line = base.cumulative_ad_line + r.ad_since,
+                new_high_roc = CASE WHEN r.prev_highs IS NULL OR r.prev_highs = 0 THEN 0
+                                    ELSE (r.new_highs - r.prev_highs)::float8 / r.prev_highs * 100 END,
+                new_low_roc = CASE WHEN r.prev_lows IS NULL OR r.prev_lows = 0 THEN 0
+                                   ELSE (r.new_lows - r.prev_lows)::float8 / r.prev_lows * 100 END,
+                acceleration = CASE WHEN r.prev2_highs IS NULL THEN 0
+                                    ELSE (r.new_highs - r.prev_highs) - (r.prev_highs - r.prev2_highs) END
+            FROM window_rows r, base
+            WHERE m.date = r.date AND r.date >= %(from_date)s
+        """, {"from_date": from_date})
+
+    @staticmethod
+    def backfill_bars(symbols, start_date, end_date, on_done=None, should_stop=None):
+        """
+        Fill open/high/low/volume on stock_data rows between start_date and end_date that were
+        ingested before full bars were stored. Existing closing prices and 52-week columns are left
+        untouched and no new rows are created. on_done/should_stop work as for the daily ingest.
+        Returns a tuple (updated_row_count, failures).
+        """
+        start_dates = {symbol: start_date for symbol in symbols}
+        histories, failures = HistoricalStockService._fetch_histories(
+            symbols, start_dates, end_date, on_done=on_done, should_stop=should_stop
+        )
+        if should_stop is not None and should_stop():
+            raise JobCancelled()
+
+        bars = []
+        for symbol, data in histories.items():
+            for bar_time, row in data.iterrows():
+                bars.append((
+                    symbol, bar_time.date(),
+                    float(row['Open']), float(row['High']), float(row['Low']),
+                    int(row['Volume']) if pd.notna(row['Volume']) else None
+                ))
+
+        updated = 0
+        if bars:
+            with db_connection() as conn:
+                cur = conn.cursor()
+                execute_values(cur, """
+                    UPDATE stock_data AS s
+                    SET open_price = v.open_price,
+                        high_price = v.high_price,
+                        low_price = v.low_price,
+                        volume = v.volume
+                    FROM (VALUES %s) AS v (stock_symbol, date, open_price, high_price, low_price, volume)
+                    WHERE s.stock_symbol = v.stock_symbol AND s.date = v.date
+                """, bars, template="(%s, %s::date, %s::numeric, %s::numeric, %s::numeric, %s::bigint)",
+                   page_size=len(bars))
+                updated = cur.rowcount
+                conn.commit()
+                cur.close()
+            history_cache.invalidate(histories)
+        return updated, failures
+
+    @staticmethod
+    def backfill_market_pulse(symbols, start_date, end_date):
+        """
+        Backfill the market_pulse table for all dates between start_date and end_date (inclusive)
         that exist in the database (i.e. valid trading days).
 
-        For each date and each symbol:
-        - Retrieve the stock_data row for that date.
-        - Retrieve the most recent stock_data row prior to that date.
-        - Determine if the symbol advanced, declined, or was unchanged based on the closing price.
-        - Determine if the symbol hit a new 52‑week high/low (by comparing the current closing price
-            to the previous record's high_52week/low_52week).
-        Then, aggregate these counts over all symbols and insert (or update) a record into market_pulse.
+        For each date and each symbol, the symbol's row on that date is compared with its most recent
+        earlier row (LAG over stock_data partitioned by symbol):
+        - Advanced, declined or unchanged based on the closing price.
+        - New 52‑week high/low when the closing price breaks the previous record's high_52week/low_52week.
+        The counts for every date are aggregated and upserted into market_pulse in a single statement,
+        which also rewrites the symbols' stock_new_extremes rows for the range; then the derived
+        series are re-chained from the first backfilled date.
 
         Returns:
         A dictionary mapping each processed date (as an ISO string) to its aggregated metrics.
         """
-        # Define the date range for backfilling.
-        start_date = '2025-04-25'
-        end_date = '2025-05-26'
-        
-        # Query the database for distinct dates in stock_data within the given range.
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute("""
-            SELECT DISTINCT date 
-            FROM stock_data
-            WHERE date BETWEEN %s AND %s
-            ORDER BY date ASC
-        """, (start_date, end_date))
-        date_rows = cur.fetchall()
-        cur.close()
-        conn.close()
-        
-        # Convert dates to Python date objects if necessary.
-        date_list = []
-        for row in date_rows:
-            dt = row[0]
-            if not isinstance(dt, date):
-                dt = datetime.strptime(dt, '%Y-%m-%d').date()
-            date_list.append(dt)
-        
-        results = {}
-        
-        # Process each valid date.
-        for d in date_list:
-            total_new_highs = 0
-            total_new_lows = 0
-            total_advanced  = 0
-            total_declined  = 0
-            total_unchanged = 0
-            
-            for symbol in symbols:
-                try:
-                    # Retrieve today's record for this symbol from stock_data.
-                    conn_curr = get_db_connection()
-                    cur_curr = conn_curr.cursor()
-                    cur_curr.execute("""
-                        SELECT closing_price, high_52week, low_52week
-                        FROM stock_data
-                        WHERE stock_symbol = %s AND date = %s
-                        LIMIT 1
-                    """, (symbol, d))
-                    current_row = cur_curr.fetchone()
-                    cur_curr.close()
-                    conn_curr.close()
-                    
-                    # If no record exists for this symbol on d, skip it.
-                    if not current_row:
-                        continue
-                    
-                    current_close, current_52wk_high, current_52wk_low = current_row
-                    
-                    # Retrieve the most recent record before date d for this symbol.
-                    conn_prev = get_db_connection()
-                    cur_prev = conn_prev.cursor()
-                    cur_prev.execute("""
-                        SELECT closing_price, high_52week, low_52week
-                        FROM stock_data
-                        WHERE stock_symbol = %s AND date < %s
-                        ORDER BY date DESC
-                        LIMIT 1
-                    """, (symbol, d))
-                    prev_row = cur_prev.fetchone()
-                    cur_prev.close()
-                    conn_prev.close()
-                    
-                    # If no previous record exists, skip comparison for this symbol.
-                    if not prev_row:
-                        continue
-                    
-                    prev_close, prev_52wk_high, prev_52wk_low = prev_row
-                    
-                    # Determine price movement.
-                    if current_close > prev_close:
-                        total_advanced += 1
-                    elif current_close < prev_close:
-                        total_declined += 1
-                    else:
-                        total_unchanged += 1
-                    
-                    # Determine if a new high/low occurred by comparing closing price with previous 52‑week values.
-                    if current_close > prev_52wk_high:
-                        total_new_highs += 1
-                    if current_close < prev_52wk_low:
-                        total_new_lows += 1
-                        
-                except Exception as e:
-                    print(f"Error processing {symbol} on {d}: {e}")
-                    continue
-            
-            ad_spread = total_advanced - total_declined
-            
-            # Insert or update the market_pulse record for date d.
-            conn_mp = get_db_connection()
-            cur_mp = conn_mp.cursor()
-            cur_mp.execute("""
+        with db_connection() as conn:
+            cur = conn.cursor()
+            HistoricalStockService.lock_market_pulse_writes(cur)
+            cur.execute("""
+                DELETE FROM stock_new_extremes
+                WHERE stock_symbol = ANY(%(symbols)s) AND date BETWEEN %(start_date)s AND %(end_date)s
+            """, {"symbols": list(symbols), "start_date": start_date, "end_date": end_date})
+            cur.execute("""
+                WITH trading_days AS (
+                    SELECT DISTINCT date
+                    FROM stock_data
+                    WHERE date BETWEEN %(start_date)s AND %(end_date)s
+                ),
+                moves AS (
+                    SELECT
+                        stock_symbol,
+                        date,
+                        closing_price,
+                        LAG(closing_price) OVER w AS prev_close,
+                        LAG(high_52week) OVER w AS prev_52wk_high,
+                        LAG(low_52week) OVER w AS prev_52wk_low
+                    FROM stock_data
+                    WHERE stock_symbol = ANY(%(symbols)s) AND date <= %(end_date)s
+                    WINDOW w AS (PARTITION BY stock_symbol ORDER BY date)
+                ),
+                daily_counts AS (
+                    SELECT
+                        date,
+                        COUNT(*) FILTER (WHERE closing_price > prev_52wk_high) AS new_highs,
+                        COUNT(*) FILTER (WHERE closing_price < prev_52wk_low) AS new_lows,
+                        COUNT(*) FILTER (WHERE closing_price > prev_close) AS advanced,
+                        COUNT(*) FILTER (WHERE closing_price < prev_close) AS declined,
+                        COUNT(*) FILTER (WHERE closing_price = prev_close) AS unchanged
+                    FROM moves
+                    WHERE date >= %(start_date)s
+                      -- Symbols without a previous record (or without prices) are not compared
+                      AND closing_price IS NOT NULL
+                      AND prev_close IS NOT NULL
+                    GROUP BY date
+                ),
+                new_extremes AS (
+                    INSERT INTO stock_new_extremes (date, stock_symbol, new_high, new_low)
+                    SELECT
+                        date,
+                        stock_symbol,
+                        COALESCE(closing_price > prev_52wk_high, FALSE),
+                        COALESCE(closing_price < prev_52wk_low, FALSE)
+                    FROM moves
+                    WHERE date >= %(start_date)s
+                      AND prev_close IS NOT NULL
+                      AND (closing_price > prev_52wk_high OR closing_price < prev_52wk_low)
+                )
                 INSERT INTO market_pulse (date, new_highs, new_lows, advanced, declined, unchanged, ad_spread)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
+                SELECT
+                    d.date,
+                    COALESCE(c.new_highs, 0),
+                    COALESCE(c.new_lows, 0),
+                    COALESCE(c.advanced, 0),
+                    COALESCE(c.declined, 0),
+                    COALESCE(c.unchanged, 0),
+                    COALESCE(c.advanced, 0) - COALESCE(c.declined, 0)
+                FROM trading_days d
+                LEFT JOIN daily_counts c ON c.date = d.date
                 ON CONFLICT (date) DO UPDATE
                 SET new_highs = EXCLUDED.new_highs,
                     new_lows = EXCLUDED.new_lows,
                     advanced = EXCLUDED.advanced,
                     declined = EXCLUDED.declined,
                     unchanged = EXCLUDED.unchanged,
-                    ad_spread = EXCLUDED.ad_spread;
-            """, (d, total_new_highs, total_new_lows, total_advanced, total_declined, total_unchanged, ad_spread))
-            conn_mp.commit()
-            cur_mp.close()
-            conn_mp.close()
-            
+                    ad_spread = EXCLUDED.ad_spread
+                RETURNING date, new_highs, new_lows, advanced, declined, unchanged, ad_spread;
+            """, {"symbols": list(symbols), "start_date": start_date, "end_date": end_date})
+            rows = cur.fetchall()
+            if rows:
+                HistoricalStockService.refresh_market_pulse_metrics(cur, min(row[0] for row in rows))
+            conn.commit()
+            cur.close()
+
+        results = {}
+        for d, new_highs, new_lows, advanced, declined, unchanged, ad_spread in sorted(rows):
             results[str(d)] = {
-                "new_highs": total_new_highs,
-                "new_lows": total_new_lows,
-                "advanced": total_advanced,
-                "declined": total_declined,
-                "unchanged": total_unchanged,
+                "new_highs": new_highs,
+                "new_lows": new_lows,
+                "advanced": advanced,
+                "declined": declined,
+                "unchanged": unchanged,
                 "ad_spread": ad_spread
             }
-        
-        return results
\ No newline at end of file
+
+        return results
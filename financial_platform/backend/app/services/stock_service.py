@@ -1,102 +1,159 @@
-import yfinance as yf
-from app.utils.db import get_db_connection
+from psycopg2.extras import execute_values
+from app.utils.db import db_connection
+from app.utils.cache import TTLCache
+from app.services.market_data import get_market_data_provider
+from app.config import Config
+
+quote_cache = TTLCache(
+    max_entries=Config.QUOTE_CACHE_MAX_ENTRIES,
+    ttl=Config.QUOTE_CACHE_TTL,
+    stale_ttl=Config.QUOTE_CACHE_STALE_TTL,
+)
+
+# Movement counters (shared with app.services.async_stock_service; no parameters, so the
+# SQL works for both psycopg2 and asyncpg)
+LATEST_CLOSES_READY_QUERY = "SELECT EXISTS (SELECT 1 FROM stock_latest_closes)"
+MOVEMENT_COUNTERS_QUERY = """
+    SELECT
+    SUM(CASE WHEN (last_close - prev_close) < 0 THEN 1 ELSE 0 END) AS declined,
+    SUM(CASE WHEN (last_close - prev_close) >= 0 THEN 1 ELSE 0 END) AS advanced
+    FROM stock_latest_closes
+    WHERE prev_date IS NOT NULL
+"""
+MOVEMENT_COUNTERS_FALLBACK_QUERY = """
+    SELECT
+    SUM(CASE WHEN (l1.closing_price - l2.closing_price) < 0 THEN 1 ELSE 0 END) AS declined,
+    SUM(CASE WHEN (l1.closing_price - l2.closing_price) >= 0 THEN 1 ELSE 0 END) AS advanced
+    FROM stocks2 s
+    CROSS JOIN LATERAL (
+        SELECT closing_price FROM stock_data
+        WHERE stock_symbol = s.stock_symbol
+        ORDER BY date DESC LIMIT 1
+    ) l1
+    CROSS JOIN LATERAL (
+        SELECT closing_price FROM stock_data
+        WHERE stock_symbol = s.stock_symbol
+        ORDER BY date DESC OFFSET 1 LIMIT 1
+    ) l2
+"""
+
 class StockService:
+    @staticmethod
+    def _fetch_stock_info(symbol):
+        # Fetched inline rather than through the fetch pool, which ingest and backfill jobs fill
+        quote = get_market_data_provider().get_quote(symbol)
+        return {
+            "name": quote["name"],
+            "currentPrice": quote["currentPrice"],
+            "marketCap": quote["marketCap"],
+            "peRatio": quote["peRatio"],
+            "week52High": quote["week52High"],
+            "week52Low": quote["week52Low"]
+        }
+
     @staticmethod
     def get_stock_info(symbol):
+        """
+        Quote data for a symbol, served through the shared quote cache: concurrent requests for
+        the same symbol share one upstream call and stale entries are refreshed in the background.
+        """
         try:
-            stock = yf.Ticker(symbol)
-            info = stock.info
-            if not info or 'longName' not in info:
-                raise ValueError(f"No data found for symbol: {symbol}")
-            stock_data = {
-                "name": info.get('longName'),
-                "currentPrice": info.get('currentPrice') or info.get('regularMarketPrice'),
-                "marketCap": info.get('marketCap'),
-                "peRatio": info.get('trailingPE'),
-                "week52High": info.get('fiftyTwoWeekHigh'),
-                "week52Low": info.get('fiftyTwoWeekLow')
-            }
+            stock_data = quote_cache.get_or_load(symbol, lambda: StockService._fetch_stock_info(symbol))
             return stock_data, None
         except Exception as e:
             return None, str(e)
     @staticmethod
     def add_stocks(symbols):
+        """
+        Fetch quote data for every symbol from the market-data provider and upsert the
+        successful ones into the stocks table.
+        Returns a tuple ({"added": [...], "failed": {symbol: error}}, error).
+        """
         try:
-            conn = get_db_connection()
-            cur = conn.cursor()
-            added_symbols = []
-            for symbol in symbols:
-                stock = yf.Ticker(symbol)
-                stock_info = stock.info
-                stock_data = (
-                    stock_info.get("symbol", symbol),
-                    stock_info.get("longName"),
-                    stock_info.get("sector"),
-                    stock_info.get("industry"),
-                    stock_info.get("marketCap"),
-                    stock_info.get("currentPrice"),
-                    stock_info.get("trailingPE"),
-                    stock_info.get("dividendYield"),
+            quotes, failures = get_market_data_provider().get_quotes(symbols)
+            stock_rows = {
+                symbol: (
+                    symbol, quote["name"], quote["sector"], quote["industry"], quote["marketCap"],
+                    quote["currentPrice"], quote["peRatio"], quote["dividendYield"],
                 )
-                cur.execute("""
-                    INSERT INTO stocks (symbol, name, sector, industry, market_cap, price, pe_ratio, dividend_yield)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                    ON CONFLICT (symbol) DO UPDATE
-                    SET price = EXCLUDED.price,
-                        market_cap = EXCLUDED.market_cap,
-                        pe_ratio = EXCLUDED.pe_ratio,
-                        dividend_yield = EXCLUDED.dividend_yield,
-                        last_updated = CURRENT_TIMESTAMP
-                """, stock_data)
-                added_symbols.append(symbol)
-            conn.commit()
-            cur.close()
-            conn.close()
-            return added_symbols, None
+                for symbol, quote in quotes.items()
+            }
+            if stock_rows:
+                with db_connection() as conn:
+                    cur = conn.cursor()
+                    execute_values(cur, """
+                        INSERT INTO stocks (symbol, name, sector, industry, market_cap, price, pe_ratio, dividend_yield)
+                        VALUES %s
+                        ON CONFLICT (symbol) DO UPDATE
+                        SET price = EXCLUDED.price,
+                            market_cap = EXCLUDED.market_cap,
+                            pe_ratio = EXCLUDED.pe_ratio,
+                            dividend_yield = EXCLUDED.dividend_yield,
+                            last_updated = CURRENT_TIMESTAMP
+                    """, list(stock_rows.values()))
+                    conn.commit()
+                    cur.close()
+            return {"added": list(stock_rows), "failed": failures}, None
         except Exception as e:
-            if conn:
-                conn.rollback()
-                cur.close()
-                conn.close()
+            # Uncommitted inserts are rolled back when the connection goes back to the pool
             return None, str(e)
     @staticmethod
     def get_stock_movement_counters():
         """
         Returns the count of stocks that have advanced and declined based on their latest prices.
+        Read from the stock_latest_closes snapshot maintained by the daily ingest, which makes this
+        an O(#symbols) aggregate; until that snapshot has been built, falls back to index probes
+        for each symbol's last two rows.
         Returns: tuple (declined_count, advanced_count)
         """
         try:
-            conn = get_db_connection()
-            cur = conn.cursor()
-            query = """
-            WITH latest_prices AS (
-            SELECT
-                stock_symbol,
-                closing_price,
-                date,
-                ROW_NUMBER() OVER(PARTITION BY stock_symbol ORDER BY date DESC) AS rn
-            FROM stock_data
-            ),
-            filtered_prices AS (
-            SELECT * FROM latest_prices WHERE rn IN (1, 2)
-            )
-            SELECT
-            SUM(CASE WHEN (l1.closing_price - l2.closing_price) < 0 THEN 1 ELSE 0 END) AS declined,
-            SUM(CASE WHEN (l1.closing_price - l2.closing_price) >= 0 THEN 1 ELSE 0 END) AS advanced
-            FROM filtered_prices l1
-            JOIN filtered_prices l2
-            ON l1.stock_symbol = l2.stock_symbol
-            WHERE l1.rn = 1 AND l2.rn = 2;
-
-            """
-            cur.execute(query)
-            declined_counter, advanced_counter = cur.fetchone() or (0, 0)
-            cur.close()
-            conn.close()
+            with db_connection() as conn:
+                cur = conn.cursor()
+                cur.execute(LATEST_CLOSES_READY_QUERY)
+                if cur.fetchone()[0]:
+                    cur.execute(MOVEMENT_COUNTERS_QUERY)
+                else:
+                    cur.execute(MOVEMENT_COUNTERS_FALLBACK_QUERY)
+                declined_counter, advanced_counter = cur.fetchone() or (0, 0)
+                cur.close()
             return {"declined": declined_counter, "advanced": advanced_counter}, None
         except Exception as e:
-            if 'cur' in locals():
+            return None, str(e)
+
+    @staticmethod
+    def get_new_highs_lows(as_of=None):
+        """
+        Returns the symbols that made a new 52-week high or low on `as_of` (default: the latest
+        market_pulse date), read from the stock_new_extremes rows written by the daily ingest.
+        Returns: tuple (data, error)
+        """
+        try:
+            with db_connection() as conn:
+                cur = conn.cursor()
+                if as_of is None:
+                    cur.execute("SELECT MAX(date) FROM market_pulse")
+                    as_of = cur.fetchone()[0]
+                    if as_of is None:
+                        return None, "No market data available"
+                cur.execute("""
+                    SELECT stock_symbol, new_high, new_low
+                    FROM stock_new_extremes
+                    WHERE date = %s
+                    ORDER BY stock_symbol
+                """, (as_of,))
+                rows = cur.fetchall()
                 cur.close()
-            if 'conn' in locals():
-                conn.close()
-            return None, str(e)
\ No newline at end of file
+            return StockService.format_new_highs_lows(as_of, rows), None
+        except Exception as e:
+            return None, str(e)
+
+    @staticmethod
+    def format_new_highs_lows(as_of, rows):
+        """Shape (stock_symbol, new_high, new_low) rows for a date into the new-highs-lows payload."""
+        new_highs = [symbol for symbol, new_high, _ in rows if new_high]
+        new_lows = [symbol for symbol, _, new_low in rows if new_low]
+        return {
+            "date": as_of.isoformat(),
+            "new_highs": {"count": len(new_highs), "symbols": new_highs},
+            "new_lows": {"count": len(new_lows), "symbols": new_lows}
+        }
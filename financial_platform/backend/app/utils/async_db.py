@@ -0,0 +1,51 @@
+from contextlib import asynccontextmanager
+from app.config import Config
+
+# asyncpg is only needed for the async serving mode (requirements-async.txt)
+try:
+    import asyncpg
+except ImportError:  # pragma: no cover - depends on the install
+    asyncpg = None
+
+_async_pool = None
+
+
+async def init_async_pool(config=Config):
+    """Create the asyncpg pool used by async handlers. Called when the async app starts serving."""
+    global _async_pool
+    if asyncpg is None:
+        raise RuntimeError("The async serving mode needs asyncpg (pip install -r requirements-async.txt)")
+    if _async_pool is None:
+        _async_pool = await asyncpg.create_pool(
+            config.DATABASE_URL,
+            min_size=config.ASYNC_DB_POOL_MIN_CONN,
+            max_size=config.ASYNC_DB_POOL_MAX_CONN,
+        )
+    return _async_pool
+
+
+async def close_async_pool():
+    global _async_pool
+    if _async_pool is not None:
+        await _async_pool.close()
+        _async_pool = None
+
+
+def get_async_pool_stats():
+    if _async_pool is None:
+        return None
+    return {
+        "min_size": _async_pool.get_min_size(),
+        "max_size": _async_pool.get_max_size(),
+        "size": _async_pool.get_size(),
+        "idle": _async_pool.get_idle_size(),
+    }
+
+
+@asynccontextmanager
+async def async_db_connection():
+    """Borrow a connection from the asyncpg pool for the duration of an `async with` block."""
+    if _async_pool is None:
+        raise RuntimeError("Async connection pool is not initialized")
+    async with _async_pool.acquire() as conn:
+        yield conn
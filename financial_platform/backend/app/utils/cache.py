@@ -0,0 +1,241 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class _Flight:
+    """One in-progress load that concurrent callers for the same key wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class TTLCache:
+    """
+    Bounded, thread-safe read-through cache.
+
+    - Entries are fresh for `ttl` seconds, then served stale for up to `stale_ttl` more
+      seconds while a single background load refreshes them (stale-while-revalidate).
+    - At most `max_entries` are kept; the least recently used entry is evicted first.
+    - Concurrent misses for the same key are coalesced into one call to the loader
+      (single-flight); loader errors are raised to every waiter and never cached.
+    """
+
+    def __init__(self, max_entries, ttl, stale_ttl=0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._entries = OrderedDict()  # key -> (value, loaded_at)
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+        self._hits = 0
+        self._misses = 0
+        self._stale = 0
+        self._coalesced = 0
+        self._loads = 0
+        self._load_errors = 0
+        self._evictions = 0
+
+    def get_or_load(self, key, loader):
+        """Return the cached value for key, calling loader() to fill or refresh it as needed."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, loaded_at = entry
+                age = now - loaded_at
+                if age < self.ttl:
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return value
+                if age < self.ttl + self.stale_ttl:
+                    self._entries.move_to_end(key)
+                    self._stale += 1
+                    if key not in self._inflight:
+                        flight = self._inflight[key] = _Flight()
+                        threading.Thread(target=self._load, args=(key, loader, flight), daemon=True).start()
+                    return value
+
+            self._misses += 1
+            flight = self._inflight.get(key)
+            if flight is None:
+                flight = self._inflight[key] = _Flight()
+                leader = True
+            else:
+                self._coalesced += 1
+                leader = False
+
+        if leader:
+            self._load(key, loader, flight)
+        else:
+            flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.value
+
+    def _load(self, key, loader, flight):
+        try:
+            flight.value = loader()
+        except Exception as e:
+            flight.error = e
+        with self._lock:
+            self._loads += 1
+            if flight.error is None:
+                self._entries[key] = (flight.value, time.monotonic())
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self._evictions += 1
+            else:
+                self._load_errors += 1
+            del self._inflight[key]
+        flight.done.set()
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self._hits,
+                "misses": self._misses,
+                "stale": self._stale,
+                "coalesced": self._coalesced,
+                "loads": self._loads,
+                "load_errors": self._load_errors,
+                "evictions": self._evictions,
+            }
+
+
+class SQLiteCache:
+    """
+    Cross-process cache tier backed by a local SQLite file, shared by every worker on the host.
+    Values are stored as JSON and expire after `ttl` seconds. Also holds per-namespace data
+    versions so that an invalidation in one process is seen by all of them.
+    """
+
+    PURGE_EVERY = 500
+
+    def __init__(self, path, ttl):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._hits = 0
+        self._misses = 0
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value TEXT, expires_at REAL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS versions (name TEXT PRIMARY KEY, version INTEGER NOT NULL)")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._conn().execute(
+            "SELECT value FROM entries WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        with self._lock:
+            if row is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+        return json.loads(row[0]) if row is not None else None
+
+    def set(self, key, value):
+        conn = self._conn()
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO entries (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, json.dumps(value), now + self.ttl)
+        )
+        with self._lock:
+            self._writes += 1
+            purge = self._writes % self.PURGE_EVERY == 0
+        if purge:
+            conn.execute("DELETE FROM entries WHERE expires_at <= ?", (now,))
+
+    def get_version(self, name):
+        row = self._conn().execute("SELECT version FROM versions WHERE name = ?", (name,)).fetchone()
+        return row[0] if row is not None else 0
+
+    def bump_versions(self, names):
+        conn = self._conn()
+        conn.executemany("""
+            INSERT INTO versions (name, version) VALUES (?, 1)
+            ON CONFLICT (name) DO UPDATE SET version = version + 1
+        """, [(name,) for name in names])
+
+    def stats(self):
+        with self._lock:
+            return {"path": self.path, "hits": self._hits, "misses": self._misses, "writes": self._writes}
+
+
+class VersionedCache:
+    """
+    Two-tier read-through cache for values derived from database rows.
+
+    Keys are (namespace, key) plus the namespace's current data version, so invalidate()
+    only has to bump the version: older entries become unreachable and age out of both
+    tiers. Lookups try the in-process TTLCache, then the optional shared tier, then the
+    loader. Failed loads are never cached.
+    """
+
+    def __init__(self, memory, shared=None):
+        self.memory = memory
+        self.shared = shared
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def version(self, namespace):
+        if self.shared is not None:
+            return self.shared.get_version(namespace)
+        with self._lock:
+            return self._versions.get(namespace, 0)
+
+    def get_or_load(self, namespace, key, loader):
+        full_key = (namespace, key, self.version(namespace))
+
+        def load():
+            if self.shared is None:
+                return loader()
+            shared_key = json.dumps(full_key)
+            value = self.shared.get(shared_key)
+            if value is None:
+                value = loader()
+                self.shared.set(shared_key, value)
+            return value
+
+        return self.memory.get_or_load(full_key, load)
+
+    def invalidate(self, namespaces):
+        namespaces = list(namespaces)
+        if self.shared is not None:
+            self.shared.bump_versions(namespaces)
+        else:
+            with self._lock:
+                for namespace in namespaces:
+                    self._versions[namespace] = self._versions.get(namespace, 0) + 1
+
+    def stats(self):
+        return {
+            "memory": self.memory.stats(),
+            "shared": self.shared.stats() if self.shared is not None else None,
+        }
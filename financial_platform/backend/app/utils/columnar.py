@@ -0,0 +1,117 @@
+import json
+import struct
+import numpy as np
+from flask import Response, jsonify
+
+# Response formats for the chart endpoints, picked with ?format= or the Accept header:
+#   json     - today's array of row objects (default)
+#   columnar - JSON with one array per field under "columns"
+#   binary   - packed little-endian column buffers behind a small JSON header:
+#
+#     magic      4 bytes   b"FPC1"
+#     header_len uint32    length of the header, padded with spaces to a multiple of 8
+#     header     JSON      {"version", "length", "meta", "columns": [{"name", "type",
+#                           "offset", "byte_length", ...}]}
+#     body       buffers   one per column; offsets are relative to the start of the body
+#                          and 8-byte aligned, so typed-array views can be made in place
+#
+#   Column types: float32/float64 (null = NaN), int32 (null = the column's "null" value),
+#   date (int32 days since 1970-01-01), str (uint16/uint32 codes into the column's "values").
+
+ROWS = "json"
+COLUMNAR = "columnar"
+PACKED = "binary"
+
+COLUMNAR_MIMETYPE = "application/vnd.financial-platform.columnar+json"
+PACKED_MIMETYPE = "application/vnd.financial-platform.packed-columns"
+PACKED_MAGIC = b"FPC1"
+PACKED_VERSION = 1
+INT32_NULL = -2 ** 31
+
+_DTYPES = {"float32": "<f4", "float64": "<f8", "int32": "<i4"}
+
+
+def negotiate_format(req):
+    """Return ROWS, COLUMNAR or PACKED for a request; raises ValueError for an unknown ?format=."""
+    fmt = req.args.get("format")
+    if fmt:
+        fmt = fmt.lower()
+        if fmt not in (ROWS, COLUMNAR, PACKED):
+            raise ValueError("Invalid format. Use 'json', 'columnar' or 'binary'.")
+        return fmt
+    best = req.accept_mimetypes.best_match(
+        ["application/json", COLUMNAR_MIMETYPE, PACKED_MIMETYPE], default="application/json"
+    )
+    return {COLUMNAR_MIMETYPE: COLUMNAR, PACKED_MIMETYPE: PACKED}.get(best, ROWS)
+
+
+def rows_to_columns(rows, fields):
+    """Transpose a list of row dicts into {field: [values]}."""
+    return {field: [row[field] for row in rows] for field in fields}
+
+
+def _pack_column(values, kind):
+    info = {}
+    if kind == "date":
+        array = np.asarray(values, dtype="datetime64[D]").astype("<i4")
+    elif kind == "str":
+        index = {}
+        codes = [index.setdefault(value, len(index)) for value in values]
+        info["values"] = list(index)
+        info["index_type"] = "uint16" if len(index) <= 0xFFFF else "uint32"
+        array = np.asarray(codes, dtype="<u2" if info["index_type"] == "uint16" else "<u4")
+    elif kind == "int32":
+        if any(value is None for value in values):
+            info["null"] = INT32_NULL
+            values = [INT32_NULL if value is None else value for value in values]
+        array = np.asarray(values, dtype="<i4")
+    else:
+        # numpy turns None into NaN for float dtypes
+        array = np.asarray(values, dtype=_DTYPES[kind])
+    return array.tobytes(), info
+
+
+def pack_columns(columns, types, meta=None):
+    """Encode {name: values} as the packed binary format described above."""
+    length = len(next(iter(columns.values()))) if columns else 0
+    header_columns = []
+    buffers = []
+    offset = 0
+    for name, values in columns.items():
+        data, info = _pack_column(values, types[name])
+        data += b"\0" * (-len(data) % 8)
+        header_columns.append({"name": name, "type": types[name], "offset": offset,
+                               "byte_length": len(data), **info})
+        buffers.append(data)
+        offset += len(data)
+
+    header = json.dumps({
+        "version": PACKED_VERSION,
+        "length": length,
+        "meta": meta or {},
+        "columns": header_columns
+    }, separators=(",", ":")).encode("utf-8")
+    header += b" " * (-len(header) % 8)
+    return PACKED_MAGIC + struct.pack("<I", len(header)) + header + b"".join(buffers)
+
+
+def rows_response(payload):
+    """The default ROWS response, marked as varying on Accept like the other formats."""
+    response = jsonify(payload)
+    response.vary.add("Accept")
+    return response
+
+
+def columnar_response(columns, types, fmt, meta=None):
+    """
+    Build the COLUMNAR or PACKED response for {name: values}. `types` maps every column to a
+    packed column type; `meta` holds the endpoint's non-series fields.
+    """
+    if fmt == PACKED:
+        response = Response(pack_columns(columns, types, meta), mimetype=PACKED_MIMETYPE)
+    else:
+        length = len(next(iter(columns.values()))) if columns else 0
+        response = jsonify({**(meta or {}), "length": length, "columns": columns})
+        response.mimetype = COLUMNAR_MIMETYPE
+    response.vary.add("Accept")
+    return response
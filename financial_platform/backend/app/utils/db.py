@@ -1,62 +1,170 @@
+import threading
+import time
+from contextlib import contextmanager
+
 import psycopg2
-import os
+from psycopg2 import pool as pg_pool
 from app.config import Config
 
-def get_db_connection():
-    return psycopg2.connect(Config.DATABASE_URL)
-
-def init_db():
-    conn = get_db_connection()
-    cur = conn.cursor()
-    
-    # Create users table (if not exists)
-    cur.execute('''
-    CREATE TABLE IF NOT EXISTS users (
-        id SERIAL PRIMARY KEY,
-        username VARCHAR(50) UNIQUE NOT NULL,
-        email VARCHAR(100) UNIQUE NOT NULL,
-        password_hash VARCHAR(100) NOT NULL,
-        created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
-        last_login TIMESTAMP WITH TIME ZONE
-    )
-    ''')
-    
-    # Create stocks2 table (for stock metadata)
-    cur.execute('''
-    CREATE TABLE IF NOT EXISTS stocks2 (
-        stock_symbol VARCHAR(10) PRIMARY KEY,
-        company_name VARCHAR(255),
-        sector VARCHAR(100),
-        industry VARCHAR(100)
-    )
-    ''')
-    
-    # Create stock_data table (for historical daily data)
-    cur.execute('''
-    CREATE TABLE IF NOT EXISTS stock_data (
-        stock_symbol VARCHAR(10),
-        date DATE,
-        closing_price DECIMAL(10, 2),
-        high_52week DECIMAL(10, 2),
-        low_52week DECIMAL(10, 2),
-        PRIMARY KEY (stock_symbol, date),
-        FOREIGN KEY (stock_symbol) REFERENCES stocks2(stock_symbol)
-    )
-    ''')
-    
-    # Create market_pulse table (aggregated market data)
-    cur.execute('''
-    CREATE TABLE IF NOT EXISTS market_pulse (
-        date DATE PRIMARY KEY,
-        new_highs INTEGER,
-        new_lows INTEGER,
-        advanced INTEGER,
-        declined INTEGER,
-        unchanged INTEGER,
-        ad_spread INTEGER
-    )
-    ''')
-    
-    conn.commit()
-    cur.close()
-    conn.close()
+
+class ConnectionPool:
+    """
+    Thread-safe wrapper around psycopg2's ThreadedConnectionPool.
+
+    Callers block (up to `timeout` seconds) when every connection is checked out
+    instead of failing immediately, idle connections are pinged before being handed
+    out again, and acquire counters are kept for get_pool_stats().
+    """
+
+    def __init__(self, dsn, minconn, maxconn, timeout, healthcheck_interval):
+        self._pool = pg_pool.ThreadedConnectionPool(minconn, maxconn, dsn)
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        self._last_used = {}
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.healthcheck_interval = healthcheck_interval
+
+        self._in_use = 0
+        self._waiting = 0
+        self._acquired = 0
+        self._timeouts = 0
+        self._discarded = 0
+        self._acquire_seconds_total = 0.0
+        self._acquire_seconds_max = 0.0
+
+    def getconn(self):
+        start = time.perf_counter()
+        with self._lock:
+            self._waiting += 1
+        got_slot = self._slots.acquire(timeout=self.timeout)
+        with self._lock:
+            self._waiting -= 1
+            if not got_slot:
+                self._timeouts += 1
+        if not got_slot:
+            raise pg_pool.PoolError(f"Timed out after {self.timeout}s waiting for a database connection")
+
+        try:
+            conn = self._checkout()
+        except Exception:
+            self._slots.release()
+            raise
+
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._in_use += 1
+            self._acquired += 1
+            self._acquire_seconds_total += elapsed
+            self._acquire_seconds_max = max(self._acquire_seconds_max, elapsed)
+        return conn
+
+    def putconn(self, conn):
+        discard = bool(conn.closed)
+        with self._lock:
+            self._in_use -= 1
+            self._last_used[id(conn)] = time.monotonic()
+            if discard:
+                self._discarded += 1
+                self._last_used.pop(id(conn), None)
+        try:
+            # ThreadedConnectionPool rolls back anything left uncommitted.
+            self._pool.putconn(conn, close=discard)
+        finally:
+            self._slots.release()
+
+    def _checkout(self):
+        # Every idle connection may have been dropped at once (a database restart, say), so keep
+        # discarding until one passes; once the idle ones are gone the pool opens a fresh
+        # connection, which passes without a ping. maxconn + 1 attempts covers that case.
+        attempts = self.maxconn + 1
+        for _ in range(attempts):
+            conn = self._pool.getconn()
+            if self._is_healthy(conn):
+                return conn
+            with self._lock:
+                self._discarded += 1
+                self._last_used.pop(id(conn), None)
+            self._pool.putconn(conn, close=True)
+        raise pg_pool.PoolError(f"No healthy database connection after {attempts} attempts")
+
+    def _is_healthy(self, conn):
+        if conn.closed:
+            return False
+        last_used = self._last_used.get(id(conn))
+        if last_used is None or time.monotonic() - last_used < self.healthcheck_interval:
+            return True
+        # The connection sat idle long enough that the server (or a proxy) may have dropped it.
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def stats(self):
+        with self._lock:
+            acquired = self._acquired
+            return {
+                "max_size": self.maxconn,
+                "in_use": self._in_use,
+                "waiting": self._waiting,
+                "acquired": acquired,
+                "timeouts": self._timeouts,
+                "discarded": self._discarded,
+                "acquire_ms_avg": round(self._acquire_seconds_total / acquired * 1000, 3) if acquired else 0.0,
+                "acquire_ms_max": round(self._acquire_seconds_max * 1000, 3),
+            }
+
+    def closeall(self):
+        self._pool.closeall()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def init_pool(config=Config):
+    """
+    Create the process-wide connection pool from the given config class.
+    Called from create_app(); safe to call more than once.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool(
+                config.DATABASE_URL,
+                minconn=config.DB_POOL_MIN_CONN,
+                maxconn=config.DB_POOL_MAX_CONN,
+                timeout=config.DB_POOL_TIMEOUT,
+                healthcheck_interval=config.DB_POOL_HEALTHCHECK_INTERVAL,
+            )
+    return _pool
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+
+
+def get_pool_stats():
+    return _pool.stats() if _pool is not None else None
+
+
+@contextmanager
+def db_connection():
+    """
+    Borrow a pooled connection for the duration of a `with` block.
+    Work that is not committed inside the block is rolled back when the connection is returned.
+    """
+    pool = _pool or init_pool()
+    conn = pool.getconn()
+    try:
+        yield conn
+    finally:
+        pool.putconn(conn)
+
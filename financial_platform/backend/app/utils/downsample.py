@@ -0,0 +1,50 @@
+import numpy as np
+
+
+def lttb_indices(x, y, threshold, keep=()):
+    """
+    Largest-Triangle-Three-Buckets: pick `threshold` indices of the series (x, y) that keep its
+    visual shape. The first and last points are always kept; every bucket in between contributes
+    the point forming the largest triangle with the previously kept point and the next bucket's
+    average. Indices in `keep` (e.g. extremes) replace the nearest chosen point if LTTB dropped
+    them. Returns a sorted numpy array of indices (all of them if threshold >= len(y)).
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    every = (n - 2) / (threshold - 2)
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0] = 0
+    a = 0
+    for i in range(threshold - 2):
+        start = int(np.floor(i * every)) + 1
+        end = int(np.floor((i + 1) * every)) + 1
+        next_start = end
+        next_end = min(int(np.floor((i + 2) * every)) + 1, n)
+        if next_start >= next_end:
+            avg_x, avg_y = x[n - 1], y[n - 1]
+        else:
+            avg_x = x[next_start:next_end].mean()
+            avg_y = y[next_start:next_end].mean()
+
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(area))
+        indices[i + 1] = a
+    indices[-1] = n - 1
+
+    for index in keep:
+        if index in indices:
+            continue
+        position = int(np.searchsorted(indices, index))
+        # Swap out the closer interior neighbour; the endpoints always stay
+        candidates = [p for p in (position - 1, position) if 0 < p < threshold - 1 and indices[p] not in keep]
+        if candidates:
+            nearest = min(candidates, key=lambda p: abs(indices[p] - index))
+            indices[nearest] = index
+    return indices
@@ -0,0 +1,179 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from app.utils.singleton import LazySingleton
+
+
+class RateLimitError(Exception):
+    """Raised by a market-data provider when the upstream throttles us (HTTP 429)."""
+
+
+def is_retryable(error):
+    """
+    Throttling and network hiccups are worth retrying; anything else (unknown symbol,
+    malformed payload, ...) fails the symbol straight away.
+    """
+    if isinstance(error, (RateLimitError, ConnectionError, TimeoutError)):
+        return True
+    # yfinance raises YFRateLimitError; other providers tend to mention the status code
+    message = str(error)
+    return "RateLimit" in type(error).__name__ or "429" in message or "Too Many Requests" in message
+
+
+class TokenBucket:
+    """
+    Blocking token bucket: `rate` tokens per second with bursts of up to `capacity`.
+    Priority callers are served first: while one is waiting, the others hold back.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self._priority_waiting = 0
+
+    def acquire(self, priority=False):
+        if self.rate <= 0:
+            return
+        with self._lock:
+            self._priority_waiting += priority
+        try:
+            while True:
+                with self._lock:
+                    now = time.monotonic()
+                    self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                    self._updated = now
+                    if priority or not self._priority_waiting:
+                        if self._tokens >= 1:
+                            self._tokens -= 1
+                            return
+                        wait = (1 - self._tokens) / self.rate
+                    else:
+                        wait = 1 / self.rate
+                time.sleep(wait)
+        finally:
+            with self._lock:
+                self._priority_waiting -= priority
+
+
+class FetchExecutor:
+    """
+    Shared worker pool for per-symbol market-data requests.
+
+    Every attempt takes a token from the rate limiter first, retryable failures back off
+    exponentially with full jitter, and map() reports which items ultimately failed.
+    call() runs a single request on the caller's thread and ahead of the pool's requests in
+    the limiter, so an interactive lookup never waits in the pool's queue behind a bulk job.
+    """
+
+    def __init__(self, max_workers, rate_per_second, burst, max_retries, backoff_base, backoff_max):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="fetch")
+        self._bucket = TokenBucket(rate_per_second, burst)
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self._lock = threading.Lock()
+        self._attempts = 0
+        self._retries = 0
+        self._succeeded = 0
+        self._failed = 0
+
+    def _backoff(self, attempt):
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _call(self, fn, item, priority=False):
+        attempt = 0
+        while True:
+            self._bucket.acquire(priority)
+            with self._lock:
+                self._attempts += 1
+            try:
+                return fn(item)
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                with self._lock:
+                    self._retries += 1
+                time.sleep(self._backoff(attempt))
+                attempt += 1
+
+    def call(self, fn, item):
+        """Run fn(item) on the calling thread, rate limited and retried. Raises the last attempt's error."""
+        try:
+            result = self._call(fn, item, priority=True)
+        except Exception:
+            with self._lock:
+                self._failed += 1
+            raise
+        with self._lock:
+            self._succeeded += 1
+        return result
+
+    def map(self, fn, items, on_done=None, should_stop=None):
+        """
+        Run fn(item) for every item concurrently.
+        Returns a tuple (results, failures): dicts keyed by item holding the return value or
+        the error message of the last attempt.
+
+        on_done(item, error) is called as each item finishes (error is None on success). Once
+        should_stop() returns True, items that haven't started yet are dropped and reported
+        as failures with the message "cancelled".
+        """
+        futures = {item: self._executor.submit(self._call, fn, item) for item in dict.fromkeys(items)}
+        if on_done is not None or should_stop is not None:
+            items_by_future = {future: item for item, future in futures.items()}
+            for future in as_completed(items_by_future):
+                if future.cancelled():
+                    continue
+                if on_done is not None:
+                    error = future.exception()
+                    on_done(items_by_future[future], str(error) if error is not None else None)
+                if should_stop is not None and should_stop():
+                    for pending in items_by_future:
+                        pending.cancel()
+
+        results = {}
+        failures = {}
+        for item, future in futures.items():
+            if future.cancelled():
+                failures[item] = "cancelled"
+                continue
+            try:
+                results[item] = future.result()
+            except Exception as e:
+                failures[item] = str(e)
+
+        with self._lock:
+            self._succeeded += len(results)
+            self._failed += len(failures)
+        return results, failures
+
+    def stats(self):
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "attempts": self._attempts,
+                "retries": self._retries,
+                "succeeded": self._succeeded,
+                "failed": self._failed,
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+_fetch_executor = LazySingleton(lambda config: FetchExecutor(
+    max_workers=config.FETCH_MAX_WORKERS,
+    rate_per_second=config.FETCH_RATE_PER_SECOND,
+    burst=config.FETCH_BURST,
+    max_retries=config.FETCH_MAX_RETRIES,
+    backoff_base=config.FETCH_BACKOFF_BASE,
+    backoff_max=config.FETCH_BACKOFF_MAX,
+))
+get_fetch_executor = _fetch_executor.get
+get_fetch_stats = _fetch_executor.stats
@@ -0,0 +1,351 @@
+import hashlib
+import json
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from psycopg2.extras import Json, execute_values
+from app.utils.db import db_connection
+from app.utils.singleton import LazySingleton
+
+
+class JobCancelled(Exception):
+    """Raised by a job function that noticed job.is_cancelled() and stopped early."""
+
+
+ACTIVE_STATUSES = ("queued", "running")
+
+JOB_COLUMNS = (
+    "id, kind, job_key, status, params, total, done, failed, result, error, cancel_requested, "
+    "created_at, started_at, finished_at"
+)
+
+# A queued or running job whose process stopped heartbeating (crashed, killed, redeployed) reads
+# as failed, without any write on the read path
+STALE = (
+    "status IN ('queued', 'running') "
+    "AND heartbeat_at < now() - make_interval(secs => %(stale_after)s)"
+)
+
+SELECT_JOBS = f"""
+    SELECT id, kind, job_key,
+           CASE WHEN {STALE} THEN 'failed' ELSE status END,
+           params, total, done, failed, result,
+           CASE WHEN {STALE} THEN %(stale_error)s ELSE error END,
+           cancel_requested, created_at, started_at, finished_at
+    FROM jobs
+"""
+
+STALE_ERROR = "The worker running this job stopped responding"
+
+
+def job_key(key):
+    """Fixed-size digest of a job's coalescing key (any JSON-able value; dates become ISO strings)."""
+    return hashlib.sha1(json.dumps(key, default=str).encode("utf-8")).hexdigest()
+
+
+class Job:
+    """
+    One unit of background work. The function it runs gets the Job and reports progress
+    with report(item, error), and should check is_cancelled() between steps.
+    """
+
+    def __init__(self, kind, key, params, total):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.key = key
+        self.params = params
+        self.status = "queued"
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self.result = None
+        self.error = None
+        self.created_at = None
+        self.started_at = None
+        self.finished_at = None
+        self.future = None
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_row(cls, row):
+        """A read-only snapshot of a jobs row selected with JOB_COLUMNS (or SELECT_JOBS)."""
+        (job_id, kind, key, status, params, total, done, failed, result, error, cancel_requested,
+         created_at, started_at, finished_at) = row
+        job = cls(kind, key, params, total)
+        job.id = job_id
+        job.status = status
+        job.done = done
+        job.failed = failed
+        job.result = result
+        job.error = error
+        job.created_at = created_at
+        job.started_at = started_at
+        job.finished_at = finished_at
+        if cancel_requested:
+            job._cancel.set()
+        return job
+
+    def report(self, item, error=None):
+        with self._lock:
+            self.done += 1
+            if error is not None:
+                self.failed += 1
+
+    def progress(self):
+        with self._lock:
+            return self.done, self.failed
+
+    def is_cancelled(self):
+        return self._cancel.is_set()
+
+    @property
+    def finished(self):
+        return self.status not in ACTIVE_STATUSES
+
+    def to_dict(self):
+        done, failed = self.progress()
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "params": self.params,
+            "progress": {"total": self.total, "done": done, "failed": failed},
+            "cancel_requested": self.is_cancelled(),
+            "error": self.error,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+class JobRunner:
+    """
+    Worker pool for long-running work (ingest, backfills) that shouldn't run inside an HTTP
+    request. Jobs run on the submitting process's threads, but their state lives in the jobs
+    table, so every worker process sees the same jobs:
+
+    - Submitting a job whose key matches a queued or running job (in any process) returns
+      that job instead of starting a duplicate; a partial unique index on the key decides.
+    - Lookups, listing and cancellation work from any process. Queued jobs are cancelled
+      outright; running ones are asked to stop and end as "cancelled" if their function
+      raises JobCancelled. A cancel sent to another process is picked up at its next heartbeat.
+    - Every `heartbeat_interval` seconds a background thread writes the progress of this
+      process's jobs and refreshes their heartbeat. A job without a heartbeat for
+      `stale_after` seconds is reported as failed and no longer blocks its key.
+    - Finished jobs are kept for lookups, oldest dropped first beyond `history`.
+    """
+
+    def __init__(self, max_workers, history, heartbeat_interval, stale_after):
+        self.max_workers = max_workers
+        self.history = history
+        self.heartbeat_interval = heartbeat_interval
+        self.stale_after = stale_after
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._local = {}
+        self._lock = threading.Lock()
+        self._heartbeat = None
+        self._coalesced = 0
+
+    def _query_params(self, **params):
+        return dict(params, stale_after=self.stale_after, stale_error=STALE_ERROR)
+
+    def submit(self, kind, key, fn, params=None, total=None):
+        """
+        Run fn(job) in the background. Returns (job, coalesced) where coalesced tells whether
+        an already queued or running job with the same key was returned instead.
+        """
+        job = Job(kind, job_key(key), params or {}, total)
+        with db_connection() as conn:
+            cur = conn.cursor()
+            # Release keys held by jobs whose process is gone
+            cur.execute(
+                f"UPDATE jobs SET status = 'failed', error = %(stale_error)s, finished_at = now() WHERE {STALE}",
+                self._query_params(),
+            )
+            # The no-op update makes RETURNING hand back the active job when the key is taken
+            cur.execute(f"""
+                INSERT INTO jobs (id, kind, job_key, status, params, total)
+                VALUES (%s, %s, %s, 'queued', %s, %s)
+                ON CONFLICT (job_key) WHERE status IN ('queued', 'running')
+                DO UPDATE SET job_key = EXCLUDED.job_key
+                RETURNING {JOB_COLUMNS}
+            """, (job.id, kind, job.key, Json(job.params), total))
+            row = cur.fetchone()
+            conn.commit()
+            cur.close()
+
+        if row[0] != job.id:
+            with self._lock:
+                self._coalesced += 1
+            return Job.from_row(row), True
+
+        job.created_at = row[11]
+        with self._lock:
+            self._local[job.id] = job
+            self._start_heartbeat()
+            job.future = self._executor.submit(self._run, job, fn)
+        return job, False
+
+    def _run(self, job, fn):
+        with db_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("""
+                UPDATE jobs SET status = 'running', started_at = now(), heartbeat_at = now()
+                WHERE id = %s AND status = 'queued'
+                RETURNING started_at
+            """, (job.id,))
+            row = cur.fetchone()
+            conn.commit()
+            cur.close()
+        if row is None:
+            # Cancelled (possibly from another process) before it started
+            self._forget(job)
+            return
+        job.status = "running"
+        job.started_at = row[0]
+        try:
+            result = fn(job)
+            status, error = "succeeded", None
+        except JobCancelled:
+            result, status, error = None, "cancelled", None
+        except Exception as e:
+            print(f"Job {job.id} ({job.kind}) failed: {e}")
+            result, status, error = None, "failed", str(e)
+        self._finish(job, status, result, error)
+
+    def _finish(self, job, status, result=None, error=None):
+        done, failed = job.progress()
+        try:
+            with db_connection() as conn:
+                cur = conn.cursor()
+                cur.execute("""
+                    UPDATE jobs
+                    SET status = %s, result = %s, error = %s, done = %s, failed = %s, finished_at = now()
+                    WHERE id = %s
+                """, (status, Json(result) if result is not None else None, error, done, failed, job.id))
+                cur.execute("""
+                    DELETE FROM jobs WHERE id IN (
+                        SELECT id FROM jobs WHERE finished_at IS NOT NULL
+                        ORDER BY created_at DESC OFFSET %s
+                    )
+                """, (self.history,))
+                conn.commit()
+                cur.close()
+        except Exception as e:
+            # Without heartbeats the job reads as failed once it goes stale
+            print(f"Error recording the end of job {job.id}: {e}")
+        job.status = status
+        self._forget(job)
+
+    def _forget(self, job):
+        with self._lock:
+            self._local.pop(job.id, None)
+
+    def _start_heartbeat(self):
+        if self._heartbeat is None:
+            self._heartbeat = threading.Thread(target=self._beat, name="job-heartbeat", daemon=True)
+            self._heartbeat.start()
+
+    def _beat(self):
+        while True:
+            time.sleep(self.heartbeat_interval)
+            with self._lock:
+                jobs = list(self._local.values())
+            if not jobs:
+                continue
+            try:
+                with db_connection() as conn:
+                    cur = conn.cursor()
+                    rows = execute_values(cur, """
+                        UPDATE jobs SET done = v.done, failed = v.failed, heartbeat_at = now()
+                        FROM (VALUES %s) AS v (id, done, failed)
+                        WHERE jobs.id = v.id AND jobs.status IN ('queued', 'running')
+                        RETURNING jobs.id, jobs.cancel_requested
+                    """, [(job.id,) + job.progress() for job in jobs], fetch=True)
+                    conn.commit()
+                    cur.close()
+            except Exception as e:
+                print(f"Error writing job heartbeats: {e}")
+                continue
+            # Pass on cancellations requested through other processes
+            cancelled = {job_id for job_id, cancel_requested in rows if cancel_requested}
+            for job in jobs:
+                if job.id in cancelled:
+                    self._cancel_local(job)
+
+    def _cancel_local(self, job):
+        job._cancel.set()
+        if job.future is not None and job.future.cancel():
+            # Still queued here: it will never start
+            self._forget(job)
+
+    def get(self, job_id):
+        with db_connection() as conn:
+            cur = conn.cursor()
+            cur.execute(SELECT_JOBS + "WHERE id = %(id)s", self._query_params(id=job_id))
+            row = cur.fetchone()
+            cur.close()
+        if row is None:
+            return None
+        job = Job.from_row(row)
+        with self._lock:
+            local = self._local.get(job_id)
+        if local is not None and not job.finished:
+            # Running here: report live progress rather than the last heartbeat's
+            job.done, job.failed = local.progress()
+        return job
+
+    def list(self):
+        with db_connection() as conn:
+            cur = conn.cursor()
+            cur.execute(SELECT_JOBS + "ORDER BY created_at", self._query_params())
+            rows = cur.fetchall()
+            cur.close()
+        return [Job.from_row(row) for row in rows]
+
+    def cancel(self, job_id):
+        """Ask a job to stop. Returns the job, or None if the id is unknown."""
+        with db_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("""
+                UPDATE jobs
+                SET cancel_requested = TRUE,
+                    status = CASE WHEN status = 'queued' THEN 'cancelled' ELSE status END,
+                    finished_at = CASE WHEN status = 'queued' THEN now() ELSE finished_at END
+                WHERE id = %s AND status IN ('queued', 'running')
+            """, (job_id,))
+            conn.commit()
+            cur.close()
+        with self._lock:
+            local = self._local.get(job_id)
+        if local is not None:
+            self._cancel_local(local)
+        return self.get(job_id)
+
+    def stats(self):
+        with db_connection() as conn:
+            cur = conn.cursor()
+            cur.execute(f"""
+                SELECT CASE WHEN {STALE} THEN 'failed' ELSE status END, COUNT(*) FROM jobs GROUP BY 1
+            """, self._query_params())
+            statuses = dict(cur.fetchall())
+            cur.close()
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "jobs": statuses,
+                "active": len(self._local),
+                "coalesced": self._coalesced,
+            }
+
+
+_job_runner = LazySingleton(lambda config: JobRunner(
+    max_workers=config.JOB_MAX_WORKERS,
+    history=config.JOB_HISTORY_MAX,
+    heartbeat_interval=config.JOB_HEARTBEAT_INTERVAL,
+    stale_after=config.JOB_STALE_AFTER,
+))
+get_job_runner = _job_runner.get
+get_job_stats = _job_runner.stats
@@ -0,0 +1,277 @@
+import sys
+from datetime import date
+
+import psycopg2
+from app.config import Config
+from app.utils.partitions import create_partitioned_stock_data, ensure_stock_data_partitions
+
+# Versioned schema migrations. Each entry runs once, in its own transaction together with the
+# schema_version row that records it, so a failed migration leaves nothing half-applied.
+# Add new entries at the end with the next version number; never edit one that has shipped.
+#
+# create_app() only reads the current version (one primary-key lookup, no DDL) and applies
+# pending migrations under an advisory lock, so when several workers start at once one of them
+# migrates and the rest wait and then see an up-to-date schema. Deployments that prefer to
+# migrate ahead of time set DB_AUTO_MIGRATE=false and run `python -m app.utils.migrations`.
+
+SCHEMA_LOCK_KEY = "schema_migrations"
+
+
+def _initial_schema(cur):
+    # Tables that init_db used to create on every start. IF NOT EXISTS keeps this a no-op on
+    # databases that were set up before migrations existed.
+    cur.execute('''
+    CREATE TABLE IF NOT EXISTS users (
+        id SERIAL PRIMARY KEY,
+        username VARCHAR(50) UNIQUE NOT NULL,
+        email VARCHAR(100) UNIQUE NOT NULL,
+        password_hash VARCHAR(100) NOT NULL,
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+        last_login TIMESTAMP WITH TIME ZONE
+    )
+    ''')
+
+    cur.execute('''
+    CREATE TABLE IF NOT EXISTS stocks2 (
+        stock_symbol VARCHAR(10) PRIMARY KEY,
+        company_name VARCHAR(255),
+        sector VARCHAR(100),
+        industry VARCHAR(100)
+    )
+    ''')
+
+    # stock_data is partitioned by year (see app.utils.partitions). Existing unpartitioned
+    # tables keep working; `python -m app.utils.partitions migrate` converts them.
+    cur.execute("SELECT to_regclass('stock_data')")
+    if cur.fetchone()[0] is None:
+        create_partitioned_stock_data(cur)
+    this_year = date.today().year
+    ensure_stock_data_partitions(cur, [this_year - 1, this_year, this_year + 1])
+
+    # Tables created before full daily bars were stored only have closing_price
+    cur.execute('''
+    ALTER TABLE stock_data
+        ADD COLUMN IF NOT EXISTS open_price DECIMAL(10, 2),
+        ADD COLUMN IF NOT EXISTS high_price DECIMAL(10, 2),
+        ADD COLUMN IF NOT EXISTS low_price DECIMAL(10, 2),
+        ADD COLUMN IF NOT EXISTS volume BIGINT
+    ''')
+
+    cur.execute('''
+    CREATE TABLE IF NOT EXISTS market_pulse (
+        date DATE PRIMARY KEY,
+        new_highs INTEGER,
+        new_lows INTEGER,
+        advanced INTEGER,
+        declined INTEGER,
+        unchanged INTEGER,
+        ad_spread INTEGER,
+        cumulative_ad_line INTEGER,
+        new_high_roc DOUBLE PRECISION,
+        new_low_roc DOUBLE PRECISION,
+        acceleration INTEGER
+    )
+    ''')
+
+    # Derived series materialized at ingest time (see HistoricalStockService.refresh_market_pulse_metrics)
+    cur.execute('''
+    ALTER TABLE market_pulse
+        ADD COLUMN IF NOT EXISTS cumulative_ad_line INTEGER,
+        ADD COLUMN IF NOT EXISTS new_high_roc DOUBLE PRECISION,
+        ADD COLUMN IF NOT EXISTS new_low_roc DOUBLE PRECISION,
+        ADD COLUMN IF NOT EXISTS acceleration INTEGER
+    ''')
+
+    # Each symbol's last two closes, for the movement counters
+    cur.execute('''
+    CREATE TABLE IF NOT EXISTS stock_latest_closes (
+        stock_symbol VARCHAR(10) PRIMARY KEY,
+        last_date DATE NOT NULL,
+        last_close DECIMAL(10, 2),
+        prev_date DATE,
+        prev_close DECIMAL(10, 2),
+        FOREIGN KEY (stock_symbol) REFERENCES stocks2(stock_symbol)
+    )
+    ''')
+
+    # Symbols that made a new 52-week high/low on each date
+    cur.execute('''
+    CREATE TABLE IF NOT EXISTS stock_new_extremes (
+        date DATE,
+        stock_symbol VARCHAR(10),
+        new_high BOOLEAN NOT NULL DEFAULT FALSE,
+        new_low BOOLEAN NOT NULL DEFAULT FALSE,
+        PRIMARY KEY (date, stock_symbol),
+        FOREIGN KEY (stock_symbol) REFERENCES stocks2(stock_symbol)
+    )
+    ''')
+
+    # Rolling 52-week high/low state per symbol
+    cur.execute('''
+    CREATE TABLE IF NOT EXISTS stock_extremes (
+        stock_symbol VARCHAR(10) PRIMARY KEY,
+        as_of DATE NOT NULL,
+        high_52week DOUBLE PRECISION,
+        low_52week DOUBLE PRECISION,
+        high_deque JSONB NOT NULL,
+        low_deque JSONB NOT NULL,
+        FOREIGN KEY (stock_symbol) REFERENCES stocks2(stock_symbol)
+    )
+    ''')
+
+
+def _stocks_table(cur):
+    # Quote snapshot written by StockService.add_stocks
+    cur.execute('''
+    CREATE TABLE IF NOT EXISTS stocks (
+        symbol VARCHAR(10) PRIMARY KEY,
+        name VARCHAR(255),
+        sector VARCHAR(100),
+        industry VARCHAR(100),
+        market_cap BIGINT,
+        price DECIMAL(12, 2),
+        pe_ratio DOUBLE PRECISION,
+        dividend_yield DOUBLE PRECISION,
+        last_updated TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+
+
+def _fill_market_pulse_metrics(cur):
+    # market_pulse rows written before the derived series were materialized have them NULL; an
+    # ingest after them would seed its cumulative A/D line from 0, so chain them once here.
+    from app.services.stock_data import HistoricalStockService
+
+    cur.execute("SELECT MIN(date) FROM market_pulse WHERE cumulative_ad_line IS NULL")
+    from_date = cur.fetchone()[0]
+    if from_date is not None:
+        HistoricalStockService.refresh_market_pulse_metrics(cur, from_date)
+
+
+def _jobs_table(cur):
+    # Background job state shared by every worker process (see app.utils.jobs.JobRunner)
+    cur.execute('''
+    CREATE TABLE IF NOT EXISTS jobs (
+        id VARCHAR(32) PRIMARY KEY,
+        kind VARCHAR(50) NOT NULL,
+        job_key CHAR(40) NOT NULL,
+        status VARCHAR(20) NOT NULL,
+        params JSONB NOT NULL,
+        total INTEGER,
+        done INTEGER NOT NULL DEFAULT 0,
+        failed INTEGER NOT NULL DEFAULT 0,
+        result JSONB,
+        error TEXT,
+        cancel_requested BOOLEAN NOT NULL DEFAULT FALSE,
+        created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        started_at TIMESTAMP WITH TIME ZONE,
+        finished_at TIMESTAMP WITH TIME ZONE,
+        heartbeat_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+    # At most one queued or running job per key: submissions coalesce on this index
+    cur.execute('''
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_active_key ON jobs (job_key)
+    WHERE status IN ('queued', 'running')
+    ''')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_jobs_created_at ON jobs (created_at)')
+
+
+MIGRATIONS = [
+    (1, "initial schema", _initial_schema),
+    (2, "stocks table for add_stocks", _stocks_table),
+    (3, "fill derived market_pulse columns", _fill_market_pulse_metrics),
+    (4, "jobs table for the background job runner", _jobs_table),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn):
+    """Return the highest applied migration version (0 for a database without schema_version)."""
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT version FROM schema_version ORDER BY version DESC LIMIT 1")
+        row = cur.fetchone()
+        version = row[0] if row else 0
+    except psycopg2.errors.UndefinedTable:
+        version = 0
+    finally:
+        cur.close()
+    conn.rollback()
+    return version
+
+
+def migrate(conn):
+    """
+    Apply every pending migration, holding a session advisory lock so only one process
+    migrates at a time. Returns the list of versions applied (empty if already current).
+    """
+    cur = conn.cursor()
+    cur.execute("SELECT pg_advisory_lock(hashtext(%s))", (SCHEMA_LOCK_KEY,))
+    conn.commit()
+    try:
+        cur.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+        )
+        ''')
+        conn.commit()
+
+        # Another process may have migrated while we waited for the lock
+        current = get_schema_version(conn)
+        applied = []
+        for version, description, apply in MIGRATIONS:
+            if version <= current:
+                continue
+            print(f"Applying migration {version}: {description}")
+            try:
+                apply(cur)
+                cur.execute(
+                    "INSERT INTO schema_version (version, description) VALUES (%s, %s)",
+                    (version, description),
+                )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            applied.append(version)
+        return applied
+    finally:
+        cur.execute("SELECT pg_advisory_unlock(hashtext(%s))", (SCHEMA_LOCK_KEY,))
+        conn.commit()
+        cur.close()
+
+
+def ensure_schema(conn, auto_migrate=None):
+    """
+    Startup check used by create_app(): one schema_version lookup when the schema is current.
+    Otherwise migrates (DB_AUTO_MIGRATE) or raises so the worker doesn't serve an old schema.
+    """
+    if get_schema_version(conn) >= LATEST_VERSION:
+        return []
+    if auto_migrate is None:
+        auto_migrate = Config.DB_AUTO_MIGRATE
+    if not auto_migrate:
+        raise RuntimeError(
+            f"Database schema is behind (latest is {LATEST_VERSION}); run `python -m app.utils.migrations`"
+        )
+    return migrate(conn)
+
+
+if __name__ == '__main__':
+    # python -m app.utils.migrations [status]
+    from app.utils.db import db_connection
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "upgrade"
+    with db_connection() as conn:
+        if command == "status":
+            print(f"Schema version {get_schema_version(conn)} (latest {LATEST_VERSION})")
+        elif command == "upgrade":
+            applied = migrate(conn)
+            print(f"Applied migrations: {', '.join(map(str, applied))}" if applied else "Schema is up to date")
+        else:
+            print("usage: python -m app.utils.migrations [upgrade | status]")
+            sys.exit(2)
@@ -0,0 +1,74 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from app.utils.singleton import LazySingleton
+
+
+class ExecutorSaturated(Exception):
+    """Raised when too many blocking calls are already queued; the caller should answer 503."""
+
+
+class BlockingExecutor:
+    """
+    Runs blocking calls (yfinance, psycopg2-backed services) for async handlers.
+
+    At most `max_workers` calls run at once on a dedicated thread pool; up to `max_pending`
+    more wait as cheap coroutines, and anything beyond that is rejected straight away
+    instead of growing an unbounded queue.
+    """
+
+    def __init__(self, max_workers, max_pending):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="blocking")
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+
+    async def run(self, fn, *args, **kwargs):
+        with self._lock:
+            if self._in_flight >= self.max_workers + self.max_pending:
+                self._rejected += 1
+                raise ExecutorSaturated("Too many upstream requests in flight, try again shortly")
+            self._in_flight += 1
+        failed = False
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, partial(fn, *args, **kwargs))
+        except Exception:
+            failed = True
+            raise
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+                self._completed += 1
+                self._failed += failed
+
+    def stats(self):
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "in_flight": self._in_flight,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+_blocking_executor = LazySingleton(
+    lambda config: BlockingExecutor(config.ASYNC_BLOCKING_WORKERS, config.ASYNC_MAX_PENDING)
+)
+get_blocking_executor = _blocking_executor.get
+get_blocking_stats = _blocking_executor.stats
+
+
+async def run_blocking(fn, *args, **kwargs):
+    """Await fn(*args, **kwargs) on the process-wide BlockingExecutor."""
+    return await get_blocking_executor().run(fn, *args, **kwargs)
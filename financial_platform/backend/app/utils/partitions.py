@@ -0,0 +1,157 @@
+import sys
+from datetime import date
+
+# stock_data is range-partitioned by year: stock_data_y<YYYY> holds [YYYY-01-01, YYYY+1-01-01)
+# and stock_data_default catches anything without a yearly partition yet. The primary key
+# covers (closing_price, high_52week, low_52week) so history and breadth reads can be
+# index-only scans, and a BRIN index on date keeps cross-symbol date-range scans cheap.
+# Pruning a year of history is a partition drop (drop_stock_data_partitions_before).
+
+STOCK_DATA_COLUMNS = (
+    "stock_symbol, date, closing_price, high_52week, low_52week, open_price, high_price, low_price, volume"
+)
+
+
+def create_partitioned_stock_data(cur):
+    """Create the partitioned stock_data table with its default partition and indexes."""
+    cur.execute('''
+    CREATE TABLE stock_data (
+        stock_symbol VARCHAR(10),
+        date DATE,
+        closing_price DECIMAL(10, 2),
+        high_52week DECIMAL(10, 2),
+        low_52week DECIMAL(10, 2),
+        open_price DECIMAL(10, 2),
+        high_price DECIMAL(10, 2),
+        low_price DECIMAL(10, 2),
+        volume BIGINT,
+        PRIMARY KEY (stock_symbol, date) INCLUDE (closing_price, high_52week, low_52week),
+        FOREIGN KEY (stock_symbol) REFERENCES stocks2(stock_symbol)
+    ) PARTITION BY RANGE (date)
+    ''')
+    cur.execute("CREATE TABLE stock_data_default PARTITION OF stock_data DEFAULT")
+    cur.execute("CREATE INDEX stock_data_date_brin ON stock_data USING BRIN (date)")
+
+
+def is_stock_data_partitioned(cur):
+    cur.execute("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass('stock_data')")
+    row = cur.fetchone()
+    return bool(row and row[0])
+
+
+def _yearly_partitions(cur):
+    cur.execute("""
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'stock_data'::regclass AND c.relname ~ '^stock_data_y[0-9]{4}$'
+    """)
+    return {int(row[0][-4:]): row[0] for row in cur.fetchall()}
+
+
+def ensure_stock_data_partitions(cur, years):
+    """
+    Make sure stock_data has a partition for every year in `years`, moving any rows for those
+    years out of the default partition first. No-op for an unpartitioned stock_data. Runs in
+    the caller's transaction (the caller commits).
+    """
+    years = sorted(set(years))
+    if not years or not is_stock_data_partitioned(cur):
+        return []
+    existing = _yearly_partitions(cur)
+    if all(year in existing for year in years):
+        return []
+
+    # Serialize with other processes creating partitions, then look again
+    cur.execute("SELECT pg_advisory_xact_lock(hashtext('stock_data_partitions'))")
+    existing = _yearly_partitions(cur)
+    created = []
+    for year in years:
+        if year in existing:
+            continue
+        name = f"stock_data_y{year}"
+        start, end = date(year, 1, 1), date(year + 1, 1, 1)
+        cur.execute(f"CREATE TABLE {name} (LIKE stock_data INCLUDING DEFAULTS)")
+        cur.execute(f"""
+            WITH moved AS (
+                DELETE FROM stock_data_default WHERE date >= %s AND date < %s
+                RETURNING {STOCK_DATA_COLUMNS}
+            )
+            INSERT INTO {name} ({STOCK_DATA_COLUMNS}) SELECT {STOCK_DATA_COLUMNS} FROM moved
+        """, (start, end))
+        cur.execute(f"ALTER TABLE stock_data ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)", (start, end))
+        created.append(name)
+    return created
+
+
+def drop_stock_data_partitions_before(cur, year):
+    """
+    Drop every yearly partition (and default-partition rows) older than `year`.
+    Returns the dropped partition names; the caller commits.
+    """
+    if not is_stock_data_partitioned(cur):
+        raise RuntimeError("stock_data is not partitioned; run `python -m app.utils.partitions migrate` first")
+    dropped = []
+    for partition_year, name in sorted(_yearly_partitions(cur).items()):
+        if partition_year < year:
+            cur.execute(f"ALTER TABLE stock_data DETACH PARTITION {name}")
+            cur.execute(f"DROP TABLE {name}")
+            dropped.append(name)
+    cur.execute("DELETE FROM stock_data_default WHERE date < %s", (date(year, 1, 1),))
+    return dropped
+
+
+def migrate_stock_data_to_partitions(conn):
+    """
+    Convert an unpartitioned stock_data table in place: rename it, create the partitioned
+    table with a partition per year present, copy the rows and drop the old table, all in
+    one transaction. Holds an exclusive lock on stock_data for the copy, so run it in a
+    maintenance window. Returns the number of rows copied (None if already partitioned).
+    """
+    cur = conn.cursor()
+    if is_stock_data_partitioned(cur):
+        cur.close()
+        return None
+
+    cur.execute("LOCK TABLE stock_data IN ACCESS EXCLUSIVE MODE")
+    cur.execute("ALTER TABLE stock_data RENAME TO stock_data_legacy")
+    cur.execute("ALTER INDEX IF EXISTS stock_data_pkey RENAME TO stock_data_legacy_pkey")
+    create_partitioned_stock_data(cur)
+
+    cur.execute("SELECT DISTINCT EXTRACT(YEAR FROM date)::int FROM stock_data_legacy WHERE date IS NOT NULL")
+    years = [row[0] for row in cur.fetchall()]
+    this_year = date.today().year
+    ensure_stock_data_partitions(cur, years + [this_year - 1, this_year, this_year + 1])
+
+    cur.execute(f"""
+        INSERT INTO stock_data ({STOCK_DATA_COLUMNS})
+        SELECT {STOCK_DATA_COLUMNS} FROM stock_data_legacy
+    """)
+    copied = cur.rowcount
+    cur.execute("DROP TABLE stock_data_legacy")
+    conn.commit()
+    cur.execute("ANALYZE stock_data")
+    conn.commit()
+    cur.close()
+    return copied
+
+
+if __name__ == '__main__':
+    # python -m app.utils.partitions migrate | prune <year>
+    from app.utils.db import db_connection
+
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    if command == "migrate":
+        with db_connection() as conn:
+            copied = migrate_stock_data_to_partitions(conn)
+        print("stock_data is already partitioned" if copied is None else f"Copied {copied} rows into partitioned stock_data")
+    elif command == "prune" and len(sys.argv) == 3:
+        with db_connection() as conn:
+            cur = conn.cursor()
+            dropped = drop_stock_data_partitions_before(cur, int(sys.argv[2]))
+            conn.commit()
+            cur.close()
+        print(f"Dropped partitions: {', '.join(dropped) or 'none'}")
+    else:
+        print("usage: python -m app.utils.partitions migrate | prune <year>")
+        sys.exit(2)
@@ -0,0 +1,68 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import bcrypt
+from app.utils.offload import ExecutorSaturated
+from app.utils.singleton import LazySingleton
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt on its own small thread pool so a burst of logins can only ever keep
+    `max_workers` cores busy hashing; the request threads wait on the result while the rest
+    of the app keeps its CPU. bcrypt releases the GIL while hashing, so the pool really runs
+    in parallel. Calls beyond `max_pending` queued hashes raise ExecutorSaturated.
+    """
+
+    def __init__(self, max_workers, max_pending, rounds):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.rounds = rounds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bcrypt")
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._hashed = 0
+        self._verified = 0
+        self._rejected = 0
+
+    def _submit(self, fn, *args):
+        with self._lock:
+            if self._in_flight >= self.max_workers + self.max_pending:
+                self._rejected += 1
+                raise ExecutorSaturated("Too many logins in progress, try again shortly")
+            self._in_flight += 1
+        try:
+            return self._executor.submit(fn, *args).result()
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def hash(self, password):
+        password_hash = self._submit(bcrypt.hashpw, password.encode('utf-8'), bcrypt.gensalt(self.rounds))
+        with self._lock:
+            self._hashed += 1
+        return password_hash.decode('utf-8')
+
+    def verify(self, stored_hash, password):
+        matched = self._submit(bcrypt.checkpw, password.encode('utf-8'), stored_hash.encode('utf-8'))
+        with self._lock:
+            self._verified += 1
+        return matched
+
+    def stats(self):
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "rounds": self.rounds,
+                "in_flight": self._in_flight,
+                "hashed": self._hashed,
+                "verified": self._verified,
+                "rejected": self._rejected,
+            }
+
+
+_password_hasher = LazySingleton(
+    lambda config: PasswordHasher(config.BCRYPT_WORKERS, config.BCRYPT_MAX_PENDING, config.BCRYPT_ROUNDS)
+)
+get_password_hasher = _password_hasher.get
+get_password_stats = _password_hasher.stats
@@ -0,0 +1,100 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from app.config import Config
+from app.utils.singleton import LazySingleton
+
+
+class KeyedRateLimiter:
+    """
+    Non-blocking token buckets, one per key: `rate` tokens per second with bursts of up to
+    `capacity`. Buckets live in an LRU table of at most `max_keys` entries, so memory stays
+    bounded no matter how many distinct keys show up; an evicted key simply starts again
+    with a full bucket. Every check is O(1).
+    """
+
+    def __init__(self, rate, capacity, max_keys):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # key -> (tokens, updated)
+        self._lock = threading.Lock()
+        self._allowed = 0
+        self._rejected = 0
+        self._evictions = 0
+
+    def acquire(self, key):
+        """Take a token for key. Returns 0 if allowed, otherwise the seconds until one is available."""
+        if self.rate <= 0:
+            return 0
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (float(self.capacity), now))
+            tokens = min(self.capacity, tokens + (now - updated) * self.rate)
+            if tokens >= 1:
+                tokens -= 1
+                retry_after = 0
+                self._allowed += 1
+            else:
+                retry_after = (1 - tokens) / self.rate
+                self._rejected += 1
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+                self._evictions += 1
+        return retry_after
+
+    def stats(self):
+        with self._lock:
+            return {
+                "rate_per_second": self.rate,
+                "burst": self.capacity,
+                "max_keys": self.max_keys,
+                "keys": len(self._buckets),
+                "allowed": self._allowed,
+                "rejected": self._rejected,
+                "evictions": self._evictions,
+            }
+
+
+class AuthRateLimiter:
+    """
+    Throttles login/register attempts per client IP and per username, so a credential
+    stuffing run or a client stuck in a retry loop is turned away before it reaches bcrypt.
+    """
+
+    def __init__(self, ip_limiter, username_limiter):
+        self.ip_limiter = ip_limiter
+        self.username_limiter = username_limiter
+
+    def check(self, ip, username=None):
+        """Returns None if the attempt may proceed, otherwise the whole seconds to put in Retry-After."""
+        retry_after = self.ip_limiter.acquire(ip)
+        if not retry_after and username:
+            retry_after = self.username_limiter.acquire(username.lower())
+        return max(1, math.ceil(retry_after)) if retry_after else None
+
+    def stats(self):
+        return {"per_ip": self.ip_limiter.stats(), "per_username": self.username_limiter.stats()}
+
+
+def create_auth_rate_limiter(config=Config):
+    """Build the AuthRateLimiter described by config.AUTH_RATE_LIMIT_*."""
+    return AuthRateLimiter(
+        KeyedRateLimiter(
+            config.AUTH_RATE_LIMIT_IP_PER_MINUTE / 60,
+            config.AUTH_RATE_LIMIT_IP_BURST,
+            config.AUTH_RATE_LIMIT_MAX_KEYS,
+        ),
+        KeyedRateLimiter(
+            config.AUTH_RATE_LIMIT_USERNAME_PER_MINUTE / 60,
+            config.AUTH_RATE_LIMIT_USERNAME_BURST,
+            config.AUTH_RATE_LIMIT_MAX_KEYS,
+        ),
+    )
+
+
+_auth_rate_limiter = LazySingleton(create_auth_rate_limiter)
+get_auth_rate_limiter = _auth_rate_limiter.get
+get_auth_rate_limit_stats = _auth_rate_limiter.stats
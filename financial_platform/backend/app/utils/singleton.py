@@ -0,0 +1,25 @@
+import threading
+from app.config import Config
+
+
+class LazySingleton:
+    """
+    A process-wide object built from a config class on first use. get(config) creates it with
+    factory(config) the first time (later calls return the same object whatever config they
+    pass), and stats() returns its stats(), or None while it hasn't been created.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._instance = None
+        self._lock = threading.Lock()
+
+    def get(self, config=Config):
+        with self._lock:
+            if self._instance is None:
+                self._instance = self._factory(config)
+        return self._instance
+
+    def stats(self):
+        instance = self._instance
+        return instance.stats() if instance is not None else None
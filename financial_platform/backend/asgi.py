@@ -0,0 +1,5 @@
+from app.async_app import create_asgi_app
+
+# Async serving mode: uvicorn asgi:app (or hypercorn asgi:app)
+# Needs the extra dependencies in requirements-async.txt; run.py keeps serving the sync app.
+app = create_asgi_app()
@@ -0,0 +1,62 @@
+import asyncio
+import time
+from flask import Flask
+from app.async_app import wsgi_to_asgi
+
+# Checks that the async serving mode runs sync Flask requests in parallel: a handful of
+# concurrent requests to a route that blocks for DELAY seconds should take about DELAY in total,
+# not DELAY per request. Needs requirements-async.txt but no database.
+# Run from the backend directory: python -m testing.async_concurrency
+
+DELAY = 0.3
+REQUESTS = 5
+
+
+def slow_app():
+    app = Flask(__name__)
+
+    @app.route("/slow")
+    def slow():
+        time.sleep(DELAY)
+        return "ok"
+
+    return app
+
+
+async def request(asgi_app, path):
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "",
+        "query_string": b"", "headers": [], "client": ("127.0.0.1", 0), "server": ("127.0.0.1", 80),
+    }
+    messages = [{"type": "http.request", "body": b"", "more_body": False}]
+    status = None
+
+    async def receive():
+        if messages:
+            return messages.pop()
+        # Nothing more to send; block like a connection that stays open until the response is done
+        await asyncio.Event().wait()
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await asgi_app(scope, receive, send)
+    return status
+
+
+async def main():
+    asgi_app = wsgi_to_asgi(slow_app())
+    start = time.perf_counter()
+    statuses = await asyncio.gather(*[request(asgi_app, "/slow") for _ in range(REQUESTS)])
+    elapsed = time.perf_counter() - start
+
+    print(f"{REQUESTS} concurrent requests to a {DELAY}s sync route took {elapsed:.2f}s, statuses {statuses}")
+    assert statuses == [200] * REQUESTS, "some requests failed"
+    assert elapsed < 2 * DELAY, "sync requests did not overlap"
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
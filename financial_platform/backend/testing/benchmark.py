@@ -0,0 +1,331 @@
+import argparse
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone
+
+# Benchmarks for the ingest, backfill and hot read paths against a local Postgres seeded with
+# synthetic data. Each scale (symbols x years of daily bars) is seeded from scratch and every
+# operation reports wall time (min/median/max over --repeat runs), the number of SQL statements
+# it executed and its peak Python heap (tracemalloc, measured in a separate run).
+#
+# THE TARGET DATABASE IS WIPED (stock tables truncated). Point it at a scratch database:
+#
+#   python -m testing.benchmark --database-url postgresql://localhost/bench --output before.json
+#   python -m testing.benchmark --database-url ... --scales 100x1,1000x5 --output after.json
+#   python -m testing.benchmark compare before.json after.json
+#
+# Market data comes from the synthetic provider (app.services.market_data.SyntheticProvider),
+# and the database is seeded with the same closed-form prices, so runs are deterministic,
+# offline and unthrottled.
+
+DEFAULT_SCALES = "100x1,1000x1,5000x1,100x5,1000x5,5000x5"
+
+def _previous_weekday(day):
+    day -= timedelta(days=1)
+    while day.weekday() >= 5:
+        day -= timedelta(days=1)
+    return day
+
+
+# Last trading session of the synthetic history, which the ingest benchmark writes. Read paths
+# select ranges relative to today, so the history has to end close to it.
+END_DATE = _previous_weekday(date.today())
+
+
+def symbol_name(index):
+    return f"B{index:04d}"
+
+
+_queries = 0
+_queries_lock = threading.Lock()
+
+
+def _install_query_counter(pool):
+    """Make every connection handed out by the app's pool count the statements its cursors run."""
+    import psycopg2.extensions
+
+    class CountingCursor(psycopg2.extensions.cursor):
+        def execute(self, query, vars=None):
+            global _queries
+            with _queries_lock:
+                _queries += 1
+            return super().execute(query, vars)
+
+        def executemany(self, query, vars_list):
+            global _queries
+            vars_list = list(vars_list)
+            with _queries_lock:
+                _queries += len(vars_list)
+            return super().executemany(query, vars_list)
+
+    getconn = pool.getconn
+
+    def counting_getconn():
+        conn = getconn()
+        conn.cursor_factory = CountingCursor
+        return conn
+
+    pool.getconn = counting_getconn
+
+
+@contextmanager
+def _admin_cursor():
+    from app.utils.db import db_connection
+    with db_connection() as conn:
+        cur = conn.cursor()
+        yield cur
+        conn.commit()
+        cur.close()
+
+
+def seed(symbols, years):
+    """
+    Replace all stock data with `symbols` synthetic symbols of weekday bars covering `years`
+    years up to two sessions before END_DATE, then bring the derived tables (market_pulse,
+    stock_new_extremes, stock_latest_closes, rolling extremes) up to date with an untimed
+    ingest of the session before END_DATE.
+    """
+    from app.services.stock_data import HistoricalStockService
+    from app.services.market_data import SYNTHETIC_CLOSE_SQL, SYNTHETIC_EPOCH, synthetic_seed
+    from app.utils.partitions import ensure_stock_data_partitions
+
+    all_symbols = [symbol_name(i) for i in range(symbols)]
+    warmup_date = _previous_weekday(END_DATE)
+    last_seeded = _previous_weekday(warmup_date)
+    first_date = END_DATE - timedelta(days=365 * years)
+    day = "(d.day - %(epoch)s::date)"
+    price = SYNTHETIC_CLOSE_SQL.format(seed="s.seed", day=day)
+    with _admin_cursor() as cur:
+        cur.execute("TRUNCATE stocks2, market_pulse CASCADE")
+        cur.execute("""
+            INSERT INTO stocks2 (stock_symbol, company_name, sector, industry)
+            SELECT symbol, symbol || ' Holdings', 'Technology', 'Software' FROM unnest(%s::varchar[]) AS symbol
+        """, (all_symbols,))
+        ensure_stock_data_partitions(cur, range(first_date.year, END_DATE.year + 1))
+        cur.execute(f"""
+            WITH bars AS MATERIALIZED (
+                SELECT s.symbol, d.day,
+                       round(({price})::numeric, 2) AS close,
+                       100000 + mod(s.seed * 7919 + {day}, 50000) AS volume
+                FROM unnest(%(symbols)s::varchar[], %(seeds)s::int[]) AS s(symbol, seed)
+                CROSS JOIN LATERAL (
+                    SELECT day::date FROM generate_series(%(first)s::date, %(last)s::date, '1 day') AS day
+                    WHERE extract(isodow FROM day) < 6
+                ) d
+            )
+            INSERT INTO stock_data (stock_symbol, date, closing_price, high_52week, low_52week,
+                                    open_price, high_price, low_price, volume)
+            SELECT symbol, day, close,
+                   MAX(close) OVER w + 1, MIN(close) OVER w - 1,
+                   close - 0.5, close + 1, close - 1, volume
+            FROM bars
+            WINDOW w AS (PARTITION BY symbol ORDER BY day RANGE BETWEEN '364 days' PRECEDING AND CURRENT ROW)
+        """, {
+            "symbols": all_symbols, "seeds": [synthetic_seed(symbol) for symbol in all_symbols],
+            "epoch": SYNTHETIC_EPOCH, "first": first_date, "last": last_seeded,
+        })
+        cur.execute("ANALYZE stock_data")
+
+    HistoricalStockService.backfill_market_pulse(all_symbols, first_date, last_seeded)
+    HistoricalStockService.insert_current_day_data_with_movement(all_symbols, trading_date=warmup_date)
+    with _admin_cursor() as cur:
+        cur.execute("DROP TABLE IF EXISTS benchmark_stock_extremes")
+        cur.execute("CREATE TABLE benchmark_stock_extremes AS SELECT * FROM stock_extremes")
+        cur.execute("ANALYZE")
+    return all_symbols, first_date, warmup_date
+
+
+def _reset_ingest(trading_date):
+    """Undo an ingest of trading_date so it can be timed again from the same starting point."""
+    from app.services.stock_data import HistoricalStockService
+    with _admin_cursor() as cur:
+        cur.execute("DELETE FROM stock_data WHERE date = %s", (trading_date,))
+        cur.execute("DELETE FROM stock_new_extremes WHERE date = %s", (trading_date,))
+        cur.execute("DELETE FROM market_pulse WHERE date = %s", (trading_date,))
+        cur.execute("TRUNCATE stock_extremes")
+        cur.execute("INSERT INTO stock_extremes SELECT * FROM benchmark_stock_extremes")
+        HistoricalStockService.rebuild_latest_closes(cur)
+
+
+def operations(client, symbols, first_date, last_date):
+    """(name, setup, run) for every benchmarked operation; setup runs untimed before each run."""
+    from app.services.stock_data import HistoricalStockService, history_cache
+    from app.services.stock_service import StockService
+    from app.routes.stock_report import get_cached_stock_history
+
+    def check(result):
+        value, error = result
+        if error:
+            raise RuntimeError(error)
+        return value
+
+    def get(path):
+        response = client.get(path)
+        if response.status_code != 200:
+            raise RuntimeError(f"GET {path} -> {response.status_code}: {response.get_data(as_text=True)[:200]}")
+        return response
+
+    def history(symbol):
+        result = get_cached_stock_history(symbol, "year")
+        if "error" in result:
+            raise RuntimeError(result["error"])
+        return result
+
+    def clear_history_cache():
+        history_cache.memory.clear()
+
+    symbol = symbols[len(symbols) // 2]
+    return [
+        ("insert_current_day_data_with_movement", lambda: _reset_ingest(END_DATE),
+         lambda: HistoricalStockService.insert_current_day_data_with_movement(symbols, trading_date=END_DATE)),
+        ("backfill_market_pulse", None,
+         lambda: HistoricalStockService.backfill_market_pulse(symbols, first_date, last_date)),
+        ("get_stock_movement_counters", None,
+         lambda: check(StockService.get_stock_movement_counters())),
+        ("get_cached_stock_history (cold)", clear_history_cache, lambda: history(symbol)),
+        ("get_cached_stock_history (warm)", lambda: history(symbol), lambda: history(symbol)),
+        ("get_market_pulse_data (1Y)", None,
+         lambda: get("/api/stock/api/market-pulse?range=1Y")),
+        ("get_market_pulse_data (ALL)", None,
+         lambda: get("/api/stock/api/market-pulse?range=ALL")),
+    ]
+
+
+def measure(setup, run, repeat):
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+
+    # Query count and peak heap from one more run, kept apart from the timings
+    if setup:
+        setup()
+    queries_before = _queries
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "wall_ms": {
+            "min": round(min(times) * 1000, 3),
+            "median": round(statistics.median(times) * 1000, 3),
+            "max": round(max(times) * 1000, 3),
+        },
+        "queries": _queries - queries_before,
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+
+def parse_scales(text):
+    scales = []
+    for part in text.split(","):
+        symbols, years = part.lower().split("x")
+        scales.append((int(symbols), int(years)))
+    return scales
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def run_benchmarks(args):
+    # Config is read at import time, so the environment has to be set up before importing app
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ["HISTORY_CACHE_PATH"] = ""
+    os.environ["FETCH_RATE_PER_SECOND"] = "0"
+    os.environ["FETCH_BACKOFF_BASE"] = "0"
+    os.environ["MARKET_DATA_PROVIDER"] = "synthetic"
+    os.environ["SYNTHETIC_LATENCY"] = str(args.latency)
+
+    from app import create_app
+    from app.utils.db import db_connection, init_pool
+    app = create_app()
+    client = app.test_client()
+    _install_query_counter(init_pool())
+
+    with db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SHOW server_version")
+        server_version = cur.fetchone()[0]
+        cur.close()
+
+    results = []
+    for symbols, years in parse_scales(args.scales):
+        scale = f"{symbols}x{years}y"
+        print(f"Seeding {scale}...", file=sys.stderr)
+        start = time.perf_counter()
+        all_symbols, first_date, last_date = seed(symbols, years)
+        print(f"Seeded {scale} in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+        for name, setup, run in operations(client, all_symbols, first_date, last_date):
+            result = measure(setup, run, args.repeat)
+            results.append({"scale": scale, "symbols": symbols, "years": years, "operation": name, **result})
+            print(f"{scale:>9}  {name:<40} {result['wall_ms']['median']:>10.1f} ms  "
+                  f"{result['queries']:>5} queries  {result['peak_kb']:>10.1f} KiB", file=sys.stderr)
+
+    report = {
+        "revision": _git_revision(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "postgres": server_version,
+        "end_date": END_DATE.isoformat(),
+        "provider_latency": args.latency,
+        "repeat": args.repeat,
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {len(results)} results to {args.output}", file=sys.stderr)
+
+
+def compare(base_path, new_path):
+    """Print the median wall time, query count and peak memory of two reports side by side."""
+    with open(base_path) as f:
+        base = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    base_results = {(r["scale"], r["operation"]): r for r in base["results"]}
+    print(f"{base.get('revision')} -> {new.get('revision')}")
+    print(f"{'scale':>9}  {'operation':<40} {'median ms':>21} {'ratio':>6} {'queries':>13} {'peak KiB':>23}")
+    for r in new["results"]:
+        b = base_results.get((r["scale"], r["operation"]))
+        if b is None:
+            continue
+        old_ms, new_ms = b["wall_ms"]["median"], r["wall_ms"]["median"]
+        ratio = new_ms / old_ms if old_ms else math.inf
+        print(f"{r['scale']:>9}  {r['operation']:<40} {old_ms:>10.1f} {new_ms:>10.1f} {ratio:>6.2f} "
+              f"{b['queries']:>6} {r['queries']:>6} {b['peak_kb']:>11.1f} {r['peak_kb']:>11.1f}")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 4 and sys.argv[1] == "compare":
+        compare(sys.argv[2], sys.argv[3])
+        sys.exit(0)
+
+    parser = argparse.ArgumentParser(description="Benchmark ingest, backfill and read paths on synthetic data.")
+    parser.add_argument("--database-url", default=os.environ.get("BENCHMARK_DATABASE_URL"),
+                        help="scratch database to seed (its stock tables are wiped); default $BENCHMARK_DATABASE_URL")
+    parser.add_argument("--scales", default=DEFAULT_SCALES, help=f"symbols x years (default {DEFAULT_SCALES})")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per operation")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="simulated upstream latency per symbol request, in seconds")
+    parser.add_argument("--output", default="benchmark.json", help="JSON report path")
+    args = parser.parse_args()
+    if not args.database_url:
+        parser.error("--database-url or BENCHMARK_DATABASE_URL is required (the database is wiped)")
+    run_benchmarks(args)
@@ -0,0 +1,60 @@
+import random
+import threading
+import time
+from app.utils.fetch import FetchExecutor, RateLimitError
+
+# Local stand-in for yfinance: injects latency and 429-style throttling so the
+# fetch executor can be exercised without touching the network.
+# Run from the backend directory: python -m testing.fake_provider
+
+
+class FakeProvider:
+    def __init__(self, latency=0.05, jitter=0.02, throttle_rate=0.2, bad_symbols=(), seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.throttle_rate = throttle_rate
+        self.bad_symbols = set(bad_symbols)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.throttled = 0
+
+    def _request(self, symbol):
+        with self._lock:
+            self.calls += 1
+            delay = max(0.0, self._random.gauss(self.latency, self.jitter))
+            throttle = self._random.random() < self.throttle_rate
+            if throttle:
+                self.throttled += 1
+        time.sleep(delay)
+        if throttle:
+            raise RateLimitError(f"429 Too Many Requests for {symbol}")
+        if symbol in self.bad_symbols:
+            raise ValueError(f"No data found for symbol: {symbol}")
+
+    def info(self, symbol):
+        self._request(symbol)
+        return {
+            "symbol": symbol,
+            "longName": f"{symbol} Holdings",
+            "sector": "Technology",
+            "industry": "Software",
+            "currentPrice": 100.0,
+        }
+
+
+if __name__ == '__main__':
+    provider = FakeProvider(latency=0.1, throttle_rate=0.3, bad_symbols={"BAD1", "BAD2"}, seed=42)
+    executor = FetchExecutor(max_workers=16, rate_per_second=50, burst=10,
+                             max_retries=4, backoff_base=0.05, backoff_max=1.0)
+    symbols = [f"SYM{i}" for i in range(200)] + ["BAD1", "BAD2"]
+
+    start = time.perf_counter()
+    results, failures = executor.map(provider.info, symbols)
+    elapsed = time.perf_counter() - start
+
+    print(f"fetched {len(results)} symbols in {elapsed:.2f}s "
+          f"({provider.calls} upstream calls, {provider.throttled} throttled)")
+    print("failed:", failures)
+    print("executor:", executor.stats())
+    executor.shutdown()
@@ -0,0 +1,34 @@
+import os
+import pytest
+
+# Run from the backend directory: python -m pytest tests
+#
+# The utility tests need nothing but the packages in requirements-dev.txt. Tests that touch
+# Postgres use the `db` fixture and are skipped unless TEST_DATABASE_URL points at a scratch
+# database (its tables are written to).
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+
+# app.config reads the environment at import time, so this has to happen before any app import.
+# Tests never talk to the real market-data upstream or share the on-disk history cache.
+if TEST_DATABASE_URL:
+    os.environ["DATABASE_URL"] = TEST_DATABASE_URL
+os.environ["MARKET_DATA_PROVIDER"] = "synthetic"
+os.environ["SYNTHETIC_LATENCY"] = "0"
+os.environ["FETCH_RATE_PER_SECOND"] = "0"
+os.environ["HISTORY_CACHE_PATH"] = ""
+
+
+@pytest.fixture(scope="session")
+def db():
+    """The app's connection pool on TEST_DATABASE_URL, migrated to the latest schema."""
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    from app.config import Config
+    from app.utils.db import close_pool, db_connection, init_pool
+    from app.utils.migrations import migrate
+
+    init_pool(Config)
+    with db_connection() as conn:
+        migrate(conn)
+    yield db_connection
+    close_pool()
@@ -0,0 +1,80 @@
+import json
+from datetime import date, timedelta
+import pytest
+from psycopg2.extras import execute_values
+
+SYMBOL = "ZZTEST"
+
+
+@pytest.fixture
+def client(db):
+    from app import create_app
+
+    with db() as conn:
+        cur = conn.cursor()
+        _delete_symbol(cur)
+        cur.execute("INSERT INTO stocks2 (stock_symbol, company_name, sector, industry) VALUES (%s, %s, %s, %s)",
+                    (SYMBOL, "Test Corp", "Technology", "Software"))
+        # 200 daily bars ending yesterday; the high and low are bars 150 and 20
+        today = date.today()
+        rows = []
+        for i in range(200):
+            close = 100.0 + i % 7
+            high, low = close + 1, close - 1
+            if i == 150:
+                high = 180.0
+            if i == 20:
+                low = 40.0
+            rows.append((SYMBOL, today - timedelta(days=200 - i), close, close, high, low, 1000, high, low))
+        execute_values(cur, """
+            INSERT INTO stock_data (stock_symbol, date, closing_price, open_price, high_price, low_price, volume,
+                                    high_52week, low_52week)
+            VALUES %s
+        """, rows)
+        conn.commit()
+        cur.close()
+
+    yield create_app().test_client()
+
+    with db() as conn:
+        cur = conn.cursor()
+        _delete_symbol(cur)
+        conn.commit()
+        cur.close()
+
+
+def _delete_symbol(cur):
+    for table in ("stock_extremes", "stock_data", "stocks2"):
+        cur.execute(f"DELETE FROM {table} WHERE stock_symbol = %s", (SYMBOL,))
+
+
+def _reported_high_lows(client):
+    from app.services.stock_data import history_cache
+
+    history_cache.invalidate([SYMBOL])
+    week52 = json.loads(client.get(f"/api/stock/stocks/52week/{SYMBOL}").data)
+    single = json.loads(client.get(f"/api/stock_report/getStockHistory?symbol={SYMBOL}&period=month").data)
+    batch = json.loads(client.get(f"/api/stock_report/getStockHistoryBatch?symbols={SYMBOL}&period=month").data)
+    return [
+        (round(week52["high_52week"], 2), round(week52["low_52week"], 2)),
+        (single["stockInfo"]["week52High"], single["stockInfo"]["week52Low"]),
+        (batch["results"][SYMBOL]["stockInfo"]["week52High"], batch["results"][SYMBOL]["stockInfo"]["week52Low"]),
+    ]
+
+
+def test_endpoints_agree_on_the_stored_bars(client):
+    assert _reported_high_lows(client) == [(180.0, 40.0)] * 3
+
+
+def test_endpoints_agree_on_the_rolling_extremes_state(client, db):
+    # The ingest's rolling state is authoritative once it exists, even where it differs from the
+    # aggregate of the stored bars
+    with db() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            INSERT INTO stock_extremes (stock_symbol, as_of, high_52week, low_52week, high_deque, low_deque)
+            VALUES (%s, %s, %s, %s, '[]', '[]')
+        """, (SYMBOL, date.today(), 190.5, 35.25))
+        conn.commit()
+        cur.close()
+    assert _reported_high_lows(client) == [(190.5, 35.25)] * 3
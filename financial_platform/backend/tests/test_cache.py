@@ -0,0 +1,148 @@
+import threading
+import time
+import pytest
+from app.utils.cache import SQLiteCache, TTLCache, VersionedCache
+
+
+class Loader:
+    """Loader returning value, value + 1, ... and counting its calls; optionally blocks until released."""
+
+    def __init__(self, value=0, gate=None):
+        self.value = value
+        self.gate = gate
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            self.calls += 1
+            value = self.value + self.calls - 1
+        if self.gate is not None:
+            self.gate.wait(5)
+        return value
+
+
+def test_hit_after_load():
+    cache = TTLCache(max_entries=10, ttl=60)
+    loader = Loader(value=7)
+    assert cache.get_or_load("a", loader) == 7
+    assert cache.get_or_load("a", loader) == 7
+    assert loader.calls == 1
+    assert cache.stats()["hits"] == 1
+
+
+def test_concurrent_misses_share_one_load():
+    cache = TTLCache(max_entries=10, ttl=60)
+    gate = threading.Event()
+    loader = Loader(value=1, gate=gate)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_load("a", loader))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    # Let every thread reach the cache before the single load completes
+    deadline = time.monotonic() + 5
+    while cache.stats()["coalesced"] < 7 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    gate.set()
+    for thread in threads:
+        thread.join()
+    assert results == [1] * 8
+    assert loader.calls == 1
+    assert cache.stats()["coalesced"] == 7
+
+
+def test_load_errors_reach_every_waiter_and_are_not_cached():
+    cache = TTLCache(max_entries=10, ttl=60)
+    gate = threading.Event()
+    calls = []
+
+    def failing():
+        calls.append(1)
+        gate.wait(5)
+        raise ValueError("upstream down")
+
+    errors = []
+
+    def get():
+        try:
+            cache.get_or_load("a", failing)
+        except ValueError as e:
+            errors.append(str(e))
+
+    threads = [threading.Thread(target=get) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + 5
+    while cache.stats()["coalesced"] < 3 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    gate.set()
+    for thread in threads:
+        thread.join()
+    assert errors == ["upstream down"] * 4
+    assert len(calls) == 1
+    assert cache.get_or_load("a", Loader(value=3)) == 3
+
+
+def test_stale_entry_is_served_while_one_refresh_runs():
+    cache = TTLCache(max_entries=10, ttl=0.05, stale_ttl=60)
+    gate = threading.Event()
+    loader = Loader(value=1, gate=gate)
+    gate.set()
+    assert cache.get_or_load("a", loader) == 1
+    time.sleep(0.06)
+
+    gate.clear()
+    # Stale: the old value comes back at once and only one background refresh starts
+    assert cache.get_or_load("a", loader) == 1
+    assert cache.get_or_load("a", loader) == 1
+    gate.set()
+    deadline = time.monotonic() + 5
+    while cache.stats()["loads"] < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert loader.calls == 2
+    assert cache.get_or_load("a", loader) == 2
+    assert cache.stats()["stale"] == 2
+
+
+def test_expired_entry_past_stale_window_is_reloaded():
+    cache = TTLCache(max_entries=10, ttl=0.02, stale_ttl=0.02)
+    loader = Loader(value=1)
+    assert cache.get_or_load("a", loader) == 1
+    time.sleep(0.05)
+    assert cache.get_or_load("a", loader) == 2
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(max_entries=2, ttl=60)
+    cache.get_or_load("a", Loader(value=1))
+    cache.get_or_load("b", Loader(value=2))
+    cache.get_or_load("a", Loader(value=99))  # hit: "a" becomes most recent
+    cache.get_or_load("c", Loader(value=3))   # evicts "b"
+    assert cache.get_or_load("a", Loader(value=99)) == 1
+    assert cache.get_or_load("b", Loader(value=4)) == 4
+    assert cache.stats()["evictions"] == 2
+
+
+def test_versioned_cache_invalidation_reloads_only_that_namespace():
+    cache = VersionedCache(TTLCache(max_entries=10, ttl=60))
+    aapl, msft = Loader(value=10), Loader(value=20)
+    assert cache.get_or_load("AAPL", "1M", aapl) == 10
+    assert cache.get_or_load("MSFT", "1M", msft) == 20
+    cache.invalidate(["AAPL"])
+    assert cache.get_or_load("AAPL", "1M", aapl) == 11
+    assert cache.get_or_load("MSFT", "1M", msft) == 20
+
+
+@pytest.mark.parametrize("value", [{"points": [1, 2]}, [1, "x"]])
+def test_versioned_cache_shares_values_and_invalidations_across_processes(tmp_path, value):
+    path = str(tmp_path / "cache.sqlite3")
+    # Two workers: separate memory tiers over the same SQLite file
+    first = VersionedCache(TTLCache(max_entries=10, ttl=60), SQLiteCache(path, ttl=60))
+    second = VersionedCache(TTLCache(max_entries=10, ttl=60), SQLiteCache(path, ttl=60))
+
+    assert first.get_or_load("AAPL", "1M", lambda: value) == value
+    # Filled from the shared tier, without calling the loader
+    assert second.get_or_load("AAPL", "1M", lambda: pytest.fail("loader called")) == value
+
+    first.invalidate(["AAPL"])
+    assert second.get_or_load("AAPL", "1M", lambda: "fresh") == "fresh"
@@ -0,0 +1,68 @@
+import json
+import struct
+from datetime import date
+import numpy as np
+from app.utils.columnar import INT32_NULL, PACKED_MAGIC, pack_columns
+
+_ARRAY_TYPES = {"float32": "<f4", "float64": "<f8", "int32": "<i4", "date": "<i4"}
+
+
+def unpack_columns(payload):
+    """Decode the packed format the way a client would: header, then typed views over the body."""
+    assert payload[:4] == PACKED_MAGIC
+    (header_len,) = struct.unpack("<I", payload[4:8])
+    assert header_len % 8 == 0
+    header = json.loads(payload[8:8 + header_len])
+    body = payload[8 + header_len:]
+    columns = {}
+    for column in header["columns"]:
+        assert column["offset"] % 8 == 0
+        kind = column["type"]
+        dtype = {"uint16": "<u2", "uint32": "<u4"}[column["index_type"]] if kind == "str" else _ARRAY_TYPES[kind]
+        raw = body[column["offset"]:column["offset"] + column["byte_length"]]
+        array = np.frombuffer(raw, dtype=dtype)[:header["length"]]
+        if kind == "str":
+            columns[column["name"]] = [column["values"][code] for code in array]
+        elif kind == "date":
+            columns[column["name"]] = [date.fromordinal(date(1970, 1, 1).toordinal() + int(d)) for d in array]
+        elif kind == "int32" and "null" in column:
+            columns[column["name"]] = [None if v == column["null"] else int(v) for v in array]
+        else:
+            columns[column["name"]] = array.tolist()
+    return header, columns
+
+
+def test_round_trip():
+    columns = {
+        "date": [date(2024, 1, 2), date(2024, 1, 3), date(2024, 1, 4)],
+        "close": [101.25, None, 99.5],
+        "price32": [1.5, 2.5, None],
+        "volume": [1000, None, 3000],
+        "count": [1, 2, 3],
+        "symbol": ["AAPL", "MSFT", "AAPL"],
+    }
+    types = {"date": "date", "close": "float64", "price32": "float32", "volume": "int32",
+             "count": "int32", "symbol": "str"}
+    header, decoded = unpack_columns(pack_columns(columns, types, meta={"symbol": "AAPL"}))
+
+    assert header["version"] == 1 and header["length"] == 3 and header["meta"] == {"symbol": "AAPL"}
+    assert [c["name"] for c in header["columns"]] == list(columns)
+    assert decoded["date"] == columns["date"]
+    assert decoded["close"][0] == 101.25 and np.isnan(decoded["close"][1]) and decoded["close"][2] == 99.5
+    assert decoded["price32"][:2] == [1.5, 2.5] and np.isnan(decoded["price32"][2])
+    assert decoded["volume"] == [1000, None, 3000]
+    assert decoded["count"] == [1, 2, 3]
+    assert "null" not in header["columns"][4]
+    assert decoded["symbol"] == ["AAPL", "MSFT", "AAPL"]
+    assert header["columns"][5]["values"] == ["AAPL", "MSFT"]
+
+
+def test_int32_null_sentinel():
+    header, decoded = unpack_columns(pack_columns({"v": [None, 5]}, {"v": "int32"}))
+    assert header["columns"][0]["null"] == INT32_NULL
+    assert decoded["v"] == [None, 5]
+
+
+def test_empty_columns():
+    header, decoded = unpack_columns(pack_columns({"close": []}, {"close": "float64"}))
+    assert header["length"] == 0 and decoded == {"close": []}
@@ -0,0 +1,51 @@
+import pytest
+from psycopg2 import pool as pg_pool
+from app.utils.db import ConnectionPool
+
+
+@pytest.fixture
+def pool(db):
+    from app.config import Config
+
+    # healthcheck_interval=0: every connection coming back out of the pool is pinged
+    pool = ConnectionPool(Config.DATABASE_URL, minconn=3, maxconn=3, timeout=1, healthcheck_interval=0)
+    yield pool
+    pool.closeall()
+
+
+def _check_out_and_return_all(pool):
+    conns = [pool.getconn() for _ in range(pool.maxconn)]
+    pids = [conn.get_backend_pid() for conn in conns]
+    for conn in conns:
+        pool.putconn(conn)
+    return pids
+
+
+def test_checkout_skips_every_dropped_idle_connection(pool, db):
+    pids = _check_out_and_return_all(pool)
+    # Drop every idle connection server-side, as a database restart would
+    with db() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT pg_terminate_backend(pid) FROM unnest(%s::int[]) AS pid", (pids,))
+        conn.commit()
+        cur.close()
+
+    conn = pool.getconn()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1")
+            assert cur.fetchone() == (1,)
+        assert conn.get_backend_pid() not in pids
+    finally:
+        pool.putconn(conn)
+    assert pool.stats()["discarded"] == len(pids)
+
+
+def test_checkout_gives_up_after_bounded_attempts(pool, monkeypatch):
+    monkeypatch.setattr(pool, "_is_healthy", lambda conn: False)
+    with pytest.raises(pg_pool.PoolError, match="No healthy database connection"):
+        pool.getconn()
+    # The slot is handed back, so later checkouts still work
+    monkeypatch.undo()
+    pool.putconn(pool.getconn())
+    assert pool.stats()["in_use"] == 0
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+from app.utils.downsample import lttb_indices
+
+
+def series(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return np.arange(n), np.cumsum(rng.normal(size=n))
+
+
+@pytest.mark.parametrize("threshold", [2, 10, 11])
+def test_short_series_or_tiny_threshold_keep_everything(threshold):
+    x, y = series(10)
+    assert list(lttb_indices(x, y, threshold)) == list(range(10))
+
+
+@pytest.mark.parametrize("n, threshold", [(100, 3), (365, 50), (1000, 97)])
+def test_picks_threshold_sorted_unique_indices_with_both_endpoints(n, threshold):
+    x, y = series(n)
+    indices = lttb_indices(x, y, threshold)
+    assert len(indices) == threshold
+    assert indices[0] == 0 and indices[-1] == n - 1
+    assert (np.diff(indices) > 0).all()
+
+
+def test_one_point_per_bucket():
+    x, y = series(1000)
+    threshold = 52
+    indices = lttb_indices(x, y, threshold)
+    every = (1000 - 2) / (threshold - 2)
+    for i, index in enumerate(indices[1:-1]):
+        assert int(np.floor(i * every)) + 1 <= index < int(np.floor((i + 1) * every)) + 1
+
+
+def test_keeps_spike():
+    x = np.arange(200)
+    y = np.zeros(200)
+    y[123] = 100.0
+    assert 123 in lttb_indices(x, y, 20)
+
+
+def test_keep_restores_dropped_extremes():
+    x, y = series(500, seed=3)
+    threshold = 20
+    plain = lttb_indices(x, y, threshold)
+    dropped = [i for i in range(1, 499) if i not in plain][:2]
+    indices = lttb_indices(x, y, threshold, keep=dropped)
+    assert len(indices) == threshold
+    assert indices[0] == 0 and indices[-1] == 499
+    assert (np.diff(indices) > 0).all()
+    for index in dropped:
+        assert index in indices
+
+
+def test_keep_of_already_chosen_index_changes_nothing():
+    x, y = series(300)
+    plain = lttb_indices(x, y, 30)
+    assert list(lttb_indices(x, y, 30, keep=[int(plain[5])])) == list(plain)
@@ -0,0 +1,92 @@
+import threading
+import time
+import pytest
+from app.utils.jobs import JobCancelled, JobRunner, job_key
+
+
+def test_job_key_is_stable_and_fixed_size():
+    key = ("ingest", "2024-01-02", ("AAPL", "MSFT"))
+    assert job_key(key) == job_key(("ingest", "2024-01-02", ("AAPL", "MSFT")))
+    assert job_key(key) != job_key(("ingest", "2024-01-03", ("AAPL", "MSFT")))
+    assert len(job_key(key)) == 40
+
+
+@pytest.fixture
+def runner(db):
+    with db() as conn:
+        cur = conn.cursor()
+        cur.execute("DELETE FROM jobs")
+        conn.commit()
+        cur.close()
+    return JobRunner(max_workers=1, history=50, heartbeat_interval=0.1, stale_after=30)
+
+
+def wait_until_finished(runner, job_id, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = runner.get(job_id)
+        if job.finished:
+            return job
+        time.sleep(0.02)
+    pytest.fail(f"job {job_id} did not finish")
+
+
+def test_same_key_coalesces_onto_the_active_job(runner):
+    release = threading.Event()
+    first, coalesced = runner.submit("test", ("k", 1), lambda job: release.wait(5) and "done")
+    assert not coalesced
+    again, coalesced = runner.submit("test", ("k", 1), lambda job: pytest.fail("duplicate ran"))
+    assert coalesced and again.id == first.id
+    release.set()
+    assert wait_until_finished(runner, first.id).result == "done"
+
+    # Once it has finished, the same key starts a new job
+    later, coalesced = runner.submit("test", ("k", 1), lambda job: "again")
+    assert not coalesced and later.id != first.id
+    assert wait_until_finished(runner, later.id).result == "again"
+
+
+def test_cancel_running_job(runner):
+    started = threading.Event()
+
+    def work(job):
+        started.set()
+        while not job.is_cancelled():
+            job.report("item")
+            time.sleep(0.01)
+        raise JobCancelled()
+
+    job, _ = runner.submit("test", ("running",), work, total=100)
+    assert started.wait(5)
+    assert runner.cancel(job.id).to_dict()["cancel_requested"]
+    finished = wait_until_finished(runner, job.id)
+    assert finished.status == "cancelled"
+    assert finished.done > 0
+
+
+def test_cancel_queued_job_never_runs_it(runner):
+    release = threading.Event()
+    ran = []
+    blocker, _ = runner.submit("test", ("blocker",), lambda job: release.wait(5))
+    queued, _ = runner.submit("test", ("queued",), lambda job: ran.append(job.id))
+    assert runner.get(queued.id).status == "queued"
+    assert runner.cancel(queued.id).status == "cancelled"
+    release.set()
+    wait_until_finished(runner, blocker.id)
+    time.sleep(0.1)
+    assert ran == []
+    assert runner.get(queued.id).status == "cancelled"
+
+
+def test_failures_are_recorded(runner):
+    def boom(job):
+        raise RuntimeError("boom")
+
+    job, _ = runner.submit("test", ("boom",), boom)
+    finished = wait_until_finished(runner, job.id)
+    assert finished.status == "failed" and finished.error == "boom"
+
+
+def test_unknown_job(runner):
+    assert runner.get("nope") is None
+    assert runner.cancel("nope") is None
@@ -0,0 +1,60 @@
+import pytest
+from app.utils import ratelimit
+from app.utils.ratelimit import AuthRateLimiter, KeyedRateLimiter
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Replace time.monotonic in app.utils.ratelimit with a clock the test advances."""
+    now = [1000.0]
+    monkeypatch.setattr(ratelimit.time, "monotonic", lambda: now[0])
+
+    def advance(seconds):
+        now[0] += seconds
+
+    return advance
+
+
+def test_burst_then_retry_after(clock):
+    limiter = KeyedRateLimiter(rate=2, capacity=3, max_keys=10)
+    assert [limiter.acquire("ip") for _ in range(3)] == [0, 0, 0]
+    assert limiter.acquire("ip") == pytest.approx(0.5)
+    clock(0.5)
+    assert limiter.acquire("ip") == 0
+    assert limiter.stats()["rejected"] == 1
+
+
+def test_keys_have_separate_buckets(clock):
+    limiter = KeyedRateLimiter(rate=1, capacity=1, max_keys=10)
+    assert limiter.acquire("a") == 0
+    assert limiter.acquire("a") > 0
+    assert limiter.acquire("b") == 0
+
+
+def test_least_recently_used_key_is_evicted(clock):
+    limiter = KeyedRateLimiter(rate=1, capacity=1, max_keys=2)
+    limiter.acquire("a")
+    limiter.acquire("b")
+    assert limiter.acquire("a") > 0  # "a" is now the most recently used
+    limiter.acquire("c")             # evicts "b"
+    stats = limiter.stats()
+    assert stats["keys"] == 2 and stats["evictions"] == 1
+    # "b" starts over with a full bucket; "a" is still throttled
+    assert limiter.acquire("b") == 0
+    assert limiter.acquire("c") > 0
+
+
+def test_zero_rate_disables_limiting(clock):
+    limiter = KeyedRateLimiter(rate=0, capacity=1, max_keys=10)
+    assert all(limiter.acquire("ip") == 0 for _ in range(100))
+
+
+def test_auth_limiter_checks_ip_then_case_insensitive_username(clock):
+    limiter = AuthRateLimiter(
+        KeyedRateLimiter(rate=1, capacity=10, max_keys=10),
+        KeyedRateLimiter(rate=0.1, capacity=1, max_keys=10),
+    )
+    assert limiter.check("1.2.3.4", "Alice") is None
+    # Rounded up to whole seconds for Retry-After
+    assert limiter.check("5.6.7.8", "alice") == 10
+    assert limiter.check("5.6.7.8") is None
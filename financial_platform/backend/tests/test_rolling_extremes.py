@@ -0,0 +1,74 @@
+from datetime import date
+import numpy as np
+import pandas as pd
+from app.services.rolling_extremes import RollingExtremes
+
+
+def frame(start, periods, seed=0, gaps=False, nans=False):
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range(start, periods=periods)
+    if gaps:
+        # Drop a few stretches, like holidays or missing data
+        index = index[(np.arange(periods) % 37) > 2]
+    close = 100 + np.cumsum(rng.normal(size=len(index)))
+    high = close + rng.uniform(0, 2, size=len(index))
+    low = close - rng.uniform(0, 2, size=len(index))
+    if nans:
+        high[::17] = np.nan
+        low[::23] = np.nan
+    return pd.DataFrame({"High": high, "Low": low, "Close": close}, index=index)
+
+
+def pandas_extremes(data):
+    return (
+        data["High"].rolling(window="365D", min_periods=1).max(),
+        data["Low"].rolling(window="365D", min_periods=1).min(),
+    )
+
+
+def nan_to_none(value):
+    # An empty window is NaN in pandas and None here
+    return None if np.isnan(value) else value
+
+
+def test_matches_pandas_rolling_window_bar_for_bar():
+    for seed, gaps, nans in [(0, False, False), (1, True, False), (2, True, True)]:
+        data = frame("2022-01-03", 800, seed=seed, gaps=gaps, nans=nans)
+        expected_high, expected_low = pandas_extremes(data)
+        state = RollingExtremes()
+        for bar_time, high, low in zip(data.index, data["High"], data["Low"]):
+            state.push(bar_time.date(), float(high), float(low))
+            assert state.high == nan_to_none(expected_high[bar_time])
+            assert state.low == nan_to_none(expected_low[bar_time])
+
+
+def test_deques_stay_monotonic_and_inside_the_window():
+    data = frame("2022-01-03", 600, seed=4)
+    state = RollingExtremes.from_frame(data)
+    highs = [value for _, value in state.highs]
+    lows = [value for _, value in state.lows]
+    assert highs == sorted(highs, reverse=True)
+    assert lows == sorted(lows)
+    oldest = state.as_of - RollingExtremes.WINDOW
+    assert all(d > oldest for d, _ in state.highs)
+    assert all(d > oldest for d, _ in state.lows)
+
+
+def test_incremental_pushes_match_a_full_rebuild():
+    data = frame("2022-01-03", 700, seed=5)
+    split = date(2023, 6, 30)
+    state = RollingExtremes.from_frame(data, until=split)
+    assert state.as_of <= split
+    # A later run only pushes bars after as_of; earlier bars in the frame are skipped
+    state.push_frame(data)
+    full = RollingExtremes.from_frame(data)
+    assert state.as_of == full.as_of
+    assert list(state.highs) == list(full.highs)
+    assert list(state.lows) == list(full.lows)
+
+
+def test_empty_state():
+    state = RollingExtremes()
+    assert state.high is None and state.low is None and state.as_of is None
+    state.push_frame(frame("2024-01-01", 5).iloc[0:0])
+    assert state.as_of is None